@@ -1,6 +1,38 @@
 # agent1_requirements_analyzer.py
 
 import json
+import logging
+from concurrency_utils import run_ordered
+from cortex_batching import BatchCompleter, build_batch_complete_sql, demultiplex
+from document_chunking import Chunk, chunk_document
+from instrumentation import log, metrics
+from pipeline_checkpoints import checkpoint_key
+from schema_pruning import estimate_tokens
+from text_similarity import normalize_text, shingles, jaccard, conflicting_terms, MinHasher, LSHIndex
+
+class UseCase(str):
+    """
+    A use case string that remembers where in the requirements document it came from.
+    `sources` is a list of {"chunk": int, "sections": [{"title": str, "lines": [first, last]}]}.
+    Being a str, it flows through the rest of the pipeline unchanged.
+    """
+
+    def __new__(cls, text, sources=None):
+        use_case = super().__new__(cls, text)
+        use_case.sources = list(sources or [])
+        return use_case
+
+    def __reduce__(self):
+        return (UseCase, (str(self), self.sources))
+
+    @property
+    def section_titles(self):
+        titles = []
+        for source in self.sources:
+            for section in source["sections"]:
+                if section["title"] not in titles:
+                    titles.append(section["title"])
+        return titles
 
 class Agent1RequirementsAnalyzer:
     """
@@ -8,13 +40,41 @@ class Agent1RequirementsAnalyzer:
     using a Snowflake Cortex LLM function (conceptual).
     """
 
-    def __init__(self, snowflake_connection_params=None):
+    def __init__(self, snowflake_connection_params=None, model_name="llama3.1-70b", response_cache=None,
+                 chunk_token_budget=None, max_concurrency=4, dedup_similarity_threshold=0.8, batch_size=None,
+                 max_batch_retries=2, checkpoints=None):
         """
         Initializes the agent.
         snowflake_connection_params: dict, (Conceptual) parameters to connect to Snowflake.
                                          In a real scenario, this would be used by a Snowflake connector.
+        model_name: str, Cortex model used for SNOWFLAKE.CORTEX.COMPLETE.
+        response_cache: LLMResponseCache, Optional persistent cache of LLM responses keyed by prompt and model.
+                        Re-analyzing an unchanged document is then served from the cache without calling the LLM.
+        chunk_token_budget: int, Enables map-reduce analysis for documents larger than this many (estimated)
+                            tokens: the document is split on headings into chunks of at most this size,
+                            chunks are analyzed concurrently and the use cases merged. None analyzes every
+                            document with a single prompt.
+        max_concurrency: int, Maximum number of chunk analyses running at once.
+        dedup_similarity_threshold: float, Token Jaccard similarity above which use cases from different
+                                    chunks are treated as duplicates when merging.
+        batch_size: int, If greater than 1, chunk prompts are sent up to this many per Cortex COMPLETE statement
+                    (one VALUES row per prompt) instead of one statement per prompt.
+        max_batch_retries: int, How often prompts whose batched response was missing or malformed are resubmitted.
+        checkpoints: PipelineCheckpointStore, Optional store of analysis results keyed by the document's content
+                     (and, for chunked analysis, by each chunk's content). An unchanged document is not analyzed
+                     again; for an edited one only the chunks holding changed sections are, since chunk
+                     boundaries are then content-defined (see chunk_document's stable_boundaries).
         """
         self.snowflake_connection_params = snowflake_connection_params
+        self.model_name = model_name
+        self.response_cache = response_cache
+        self.chunk_token_budget = chunk_token_budget
+        self.max_concurrency = max(1, int(max_concurrency or 1))
+        self.dedup_similarity_threshold = dedup_similarity_threshold
+        self.batch_size = batch_size
+        self.max_batch_retries = max_batch_retries
+        self.checkpoints = checkpoints
+        self.last_chunk_stats = None
         # In a real implementation, you might initialize a Snowflake connection object here.
         print("Agent 1 (Requirements Analyzer) initialized.")
 
@@ -36,6 +96,29 @@ Requirements Document:
 {requirements_document_text}
 ---END DOCUMENT---
 
+JSON List of Use Cases:"""
+        return prompt
+
+    def _construct_chunk_prompt(self, chunk, total_chunks):
+        """
+        Constructs the prompt for one chunk of a large requirements document.
+        """
+        section_titles = ", ".join(title for title, _ in chunk.sections)
+        prompt = f"""Analyze the following excerpt (part {chunk.index + 1} of {total_chunks}) of a software requirements document.
+It covers these sections: {section_titles}.
+Identify the key functionalities, data entities, and relationships in this excerpt that need to be tested
+from a database perspective, and generate a list of distinct, high-level use cases or questions
+that describe *what* to test in the Snowflake database. Only cover what this excerpt describes.
+
+Focus on aspects like data integrity, correctness of calculations, relationships between entities,
+and coverage of core features mentioned. Do not generate SQL queries, only natural language use cases.
+Present the output as a JSON list of strings, where each string is a use case.
+
+Requirements Document Excerpt:
+---BEGIN EXCERPT---
+{chunk.text}
+---END EXCERPT---
+
 JSON List of Use Cases:"""
         return prompt
 
@@ -43,10 +126,10 @@ JSON List of Use Cases:"""
         """
         (Conceptual) Simulates a call to Snowflake Cortex LLM function SNOWFLAKE.CORTEX.COMPLETE.
         In a real scenario, this would involve executing a SQL query like:
-        SELECT SNOWFLAKE.CORTEX.COMPLETE('llama3.1-70b', '{prompt_escaped}');
+        SELECT SNOWFLAKE.CORTEX.COMPLETE('{self.model_name}', '{prompt_escaped}');
         """
-        print("\n--- Simulating Snowflake Cortex LLM Call (Agent 1) ---")
-        print(f"Prompt sent to LLM (first 200 chars):\n{prompt[:200]}...")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Agent 1: Simulated Cortex COMPLETE call, prompt (first 200 chars):\n%s...", prompt[:200])
         
         # Simulated LLM response (JSON list of strings)
         # This would be the actual output from the LLM in a real scenario.
@@ -64,16 +147,29 @@ JSON List of Use Cases:"""
             "Verify that searching for customers by name or email returns correct and complete results."
         ]
         simulated_json_response = json.dumps(simulated_response_content)
-        print(f"Simulated LLM JSON Response:\n{simulated_json_response}")
-        print("--- End of Simulated LLM Call ---\n")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Agent 1: Simulated LLM JSON response:\n%s", simulated_json_response)
         return simulated_json_response
 
-    def analyze_requirements(self, requirements_document_text):
+    def _call_snowflake_cortex_llm_batch(self, prompts):
+        """
+        (Conceptual) Simulates one SNOWFLAKE.CORTEX.TRY_COMPLETE statement over a VALUES row per prompt
+        (see build_batch_complete_sql). Returns one response per prompt, None where the row came back NULL.
+        """
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Agent 1: Simulated batched Cortex COMPLETE call for %d prompts:\n%s...", len(prompts),
+                      build_batch_complete_sql(self.model_name, prompts)[:400])
+        # In a real implementation: cursor.execute(sql); rows = cursor.fetchall()
+        rows = [(index, self._call_snowflake_cortex_llm(prompt)) for index, prompt in enumerate(prompts)]
+        return demultiplex(rows, len(prompts))
+
+    def analyze_requirements(self, requirements_document_text, bypass_cache=False):
         """
         Analyzes the requirements document and generates high-level use cases.
 
         Args:
             requirements_document_text (str): The content of the requirements document.
+            bypass_cache (bool): If True, always call the LLM; the fresh response still refreshes the cache.
 
         Returns:
             list: A list of strings, where each string is a high-level use case, or None if an error occurs.
@@ -82,15 +178,107 @@ JSON List of Use Cases:"""
             print("Error: Requirements document text cannot be empty.")
             return None
 
-        prompt = self._construct_llm_prompt(requirements_document_text)
-        
+        document_key = None
+        if self.checkpoints is not None:
+            document_key = self._checkpoint_key("document", self.chunk_token_budget, self.dedup_similarity_threshold,
+                                                requirements_document_text)
+            stored = None if bypass_cache else self.checkpoints.get("agent1", document_key)
+            if stored is not None:
+                use_cases = [UseCase(text, sources) if sources is not None else text for text, sources in stored]
+                metrics.incr("checkpoint_hits", agent="agent1")
+                print("Agent 1: Using checkpointed use cases for this document (no Cortex call made).")
+                return use_cases
+
+        if self.chunk_token_budget and estimate_tokens(requirements_document_text) > self.chunk_token_budget:
+            use_cases, stats = self._analyze_chunked(requirements_document_text, bypass_cache=bypass_cache)
+            self.last_chunk_stats = stats
+            complete = use_cases is not None and not stats["failed_chunks"]
+        else:
+            prompt = self._construct_llm_prompt(requirements_document_text)
+            use_cases = self._complete_use_cases(prompt, bypass_cache=bypass_cache)
+            complete = use_cases is not None
+        if document_key is not None and complete:
+            # Stored with their provenance, which plain JSON strings would lose.
+            self.checkpoints.put("agent1", document_key, [[str(u), getattr(u, "sources", None)] for u in use_cases])
+        return use_cases
+
+    def _checkpoint_key(self, *parts):
+        """
+        Content address of an analysis input. The prompt templates take part, so editing them invalidates checkpoints.
+        """
+        return checkpoint_key(self.model_name, self._construct_llm_prompt(""),
+                              self._construct_chunk_prompt(Chunk(0, "", [], 0), 1), *parts)
+
+    def _cached_response(self, prompt, bypass_cache=False):
+        """
+        Returns the cached LLM response for a prompt, or None.
+        """
+        if self.response_cache is None or bypass_cache:
+            return None
+        llm_response_json = self.response_cache.get(prompt, self.model_name)
+        if llm_response_json is not None:
+            metrics.incr("llm_cache_hits", agent="agent1")
+            print("Agent 1: Using cached LLM response for this document (no Cortex call made).")
+        return llm_response_json
+
+    @staticmethod
+    def _is_use_case_list(llm_response_json):
+        """
+        True if an LLM response is a JSON list of strings.
+        """
+        try:
+            use_cases = json.loads(llm_response_json)
+        except (TypeError, ValueError):
+            return False
+        return isinstance(use_cases, list) and all(isinstance(uc, str) for uc in use_cases)
+
+    def _complete_use_cases_batched(self, prompts, bypass_cache=False):
+        """
+        Batched counterpart of _complete_use_cases for many prompts: cached prompts are answered locally and
+        the rest go to Cortex batch_size at a time. Only prompts whose response was missing or not a JSON
+        list of strings are resubmitted.
+
+        Returns:
+            list: One list of use cases (or None if it failed) per prompt.
+        """
+        responses = [self._cached_response(prompt, bypass_cache) for prompt in prompts]
+        pending = [index for index, response in enumerate(responses) if response is None]
+
+        def call_batch(batch):
+            metrics.incr("llm_calls", len(batch), agent="agent1")
+            metrics.incr("prompt_chars", sum(len(p) for p in batch), agent="agent1")
+            metrics.incr("prompt_tokens", sum(estimate_tokens(p) for p in batch), agent="agent1")
+            return self._call_snowflake_cortex_llm_batch(batch)
+
+        if pending:
+            completer = BatchCompleter(call_batch, batch_size=self.batch_size, max_retries=self.max_batch_retries,
+                                       max_concurrency=self.max_concurrency, is_valid=self._is_use_case_list,
+                                       agent="agent1", label="Cortex COMPLETE batch")
+            completed = completer.complete([prompts[index] for index in pending])
+            print(f"Agent 1: Sent {len(pending)} prompts to Cortex COMPLETE in batches of up to {completer.batch_size}.")
+            for index, response in zip(pending, completed):
+                if response is None:
+                    print(f"Error: No valid LLM response for prompt {index} after {self.max_batch_retries} retries.")
+                    continue
+                responses[index] = response
+                if self.response_cache is not None:
+                    self.response_cache.put(prompts[index], self.model_name, response)
+        return [json.loads(response) if response is not None else None for response in responses]
+
+    def _complete_use_cases(self, prompt, bypass_cache=False):
+        """
+        Sends one prompt to the LLM (or the response cache) and parses the JSON list of use cases.
+
+        Returns:
+            list: The use case strings, or None if an error occurs.
+        """
         # In a real implementation, you would use the Snowflake Python Connector to execute the SQL
         # query that calls SNOWFLAKE.CORTEX.COMPLETE.
         # For example:
         # try:
         #     conn = snowflake.connector.connect(**self.snowflake_connection_params)
         #     cursor = conn.cursor()
-        #     sql_query = f"SELECT SNOWFLAKE.CORTEX.COMPLETE('llama3.1-70b', $${prompt}$_$$);" # Using $$ for string literals
+        #     sql_query = f"SELECT SNOWFLAKE.CORTEX.COMPLETE('{self.model_name}', $${prompt}$_$$);" # Using $$ for string literals
         #     cursor.execute(sql_query)
         #     result = cursor.fetchone()
         #     llm_response_json = result[0] if result else None
@@ -101,7 +289,15 @@ JSON List of Use Cases:"""
         #     if 'cursor' in locals(): cursor.close()
         #     if 'conn' in locals() and conn: conn.close()
 
-        llm_response_json = self._call_snowflake_cortex_llm(prompt)
+        llm_response_json = self._cached_response(prompt, bypass_cache)
+        from_cache = llm_response_json is not None
+
+        if not from_cache:
+            metrics.incr("llm_calls", agent="agent1")
+            metrics.incr("prompt_chars", len(prompt), agent="agent1")
+            metrics.incr("prompt_tokens", estimate_tokens(prompt), agent="agent1")
+            with metrics.span("llm_call", agent="agent1"):
+                llm_response_json = self._call_snowflake_cortex_llm(prompt)
 
         if not llm_response_json:
             print("Error: No response from LLM.")
@@ -112,12 +308,130 @@ JSON List of Use Cases:"""
             if not isinstance(use_cases, list) or not all(isinstance(uc, str) for uc in use_cases):
                 print("Error: LLM response is not a valid JSON list of strings.")
                 return None
+            if self.response_cache is not None and not from_cache:
+                # Only well-formed responses are cached, so a bad LLM answer is retried on the next run.
+                self.response_cache.put(prompt, self.model_name, llm_response_json)
             return use_cases
         except json.JSONDecodeError as e:
             print(f"Error decoding LLM JSON response: {e}")
             print(f"LLM Response received: {llm_response_json}")
             return None
 
+    def analyze_requirements_chunked(self, requirements_document_text, bypass_cache=False):
+        """
+        Map-reduce analysis for large documents. The document is split on headings into chunks within
+        chunk_token_budget (default 3000 tokens), each chunk is analyzed concurrently (map), and the
+        per-chunk lists are merged with near-duplicates removed (reduce). The reduce step indexes use
+        cases with MinHash/LSH, so its cost stays roughly linear in the number of use cases.
+
+        Returns:
+            list: UseCase strings in document order, each with `sources` pointing at the chunk(s) and
+                  section(s) it was derived from, or None if no chunk could be analyzed.
+        """
+        use_cases, self.last_chunk_stats = self._analyze_chunked(requirements_document_text, bypass_cache=bypass_cache)
+        return use_cases
+
+    def _analyze_chunked(self, requirements_document_text, bypass_cache=False):
+        """
+        Runs analyze_requirements_chunked and returns the run's chunk statistics alongside its use cases,
+        so callers sharing this analyzer between concurrent runs do not read another run's last_chunk_stats.
+
+        Returns:
+            tuple: (use cases or None, stats dict or None when no chunk could be analyzed).
+        """
+        if not requirements_document_text:
+            print("Error: Requirements document text cannot be empty.")
+            return None, None
+        chunks = chunk_document(requirements_document_text, max_tokens=self.chunk_token_budget or 3000,
+                                stable_boundaries=self.checkpoints is not None)
+        print(f"Agent 1: Analyzing the document in {len(chunks)} chunks (up to {self.max_concurrency} at a time).")
+        prompts = [self._construct_chunk_prompt(chunk, len(chunks)) for chunk in chunks]
+        chunk_results = [None] * len(chunks)
+        keys = None
+        if self.checkpoints is not None:
+            # Chunks are keyed by their text (section titles and content), not their position, so
+            # a chunk survives sections being added or removed elsewhere in the document.
+            keys = [self._checkpoint_key("chunk", chunk.text) for chunk in chunks]
+            if not bypass_cache:
+                chunk_results = [self.checkpoints.get("agent1_chunks", key) for key in keys]
+        pending = [index for index, result in enumerate(chunk_results) if result is None]
+        reused = len(chunks) - len(pending)
+        if reused:
+            metrics.incr("checkpoint_hits", reused, agent="agent1")
+            changed = [title for index in pending for title, _ in chunks[index].sections]
+            print(f"Agent 1: Reusing {reused} checkpointed chunks; re-analyzing {len(pending)} "
+                  f"with new or changed sections: {', '.join(dict.fromkeys(changed)) or 'none'}.")
+
+        def analyze_chunk(index):
+            use_cases = self._complete_use_cases(prompts[index], bypass_cache=bypass_cache)
+            if keys is not None and use_cases is not None:
+                self.checkpoints.put("agent1_chunks", keys[index], use_cases)
+            return use_cases
+
+        if pending and self.batch_size and self.batch_size > 1:
+            completed = self._complete_use_cases_batched([prompts[index] for index in pending], bypass_cache=bypass_cache)
+            for index, use_cases in zip(pending, completed):
+                chunk_results[index] = use_cases
+                if keys is not None and use_cases is not None:
+                    self.checkpoints.put("agent1_chunks", keys[index], use_cases)
+        elif pending:
+            completed = run_ordered(analyze_chunk, pending, max_workers=self.max_concurrency,
+                                    label="Cortex COMPLETE call for chunk")
+            for index, use_cases in zip(pending, completed):
+                chunk_results[index] = use_cases
+        failed = [chunk.index for chunk, result in zip(chunks, chunk_results) if result is None]
+        if failed:
+            print(f"Warning: {len(failed)} of {len(chunks)} chunks could not be analyzed: {failed}")
+        if len(failed) == len(chunks):
+            print("Error: No chunk of the requirements document could be analyzed.")
+            return None, None
+        use_cases = self._merge_chunk_use_cases(chunks, chunk_results)
+        total = sum(len(r) for r in chunk_results if r)
+        stats = {"chunks": len(chunks), "failed_chunks": failed, "reused_chunks": reused,
+                 "use_cases_before_merge": total, "use_cases_after_merge": len(use_cases)}
+        print(f"Agent 1: Merged {total} use cases from {len(chunks)} chunks into {len(use_cases)} distinct use cases.")
+        return use_cases, stats
+
+    def _merge_chunk_use_cases(self, chunks, chunk_results):
+        """
+        Reduce step: keeps the first occurrence of every use case in document order and folds
+        exact and near-duplicate use cases (token Jaccard >= dedup_similarity_threshold) into it,
+        accumulating their provenance. Use cases differing in a number or status value ("active" vs
+        "cancelled" policies) are different checks and are never folded together.
+        """
+        hasher = MinHasher()
+        index = LSHIndex()
+        merged = []      # UseCase objects in document order
+        by_text = {}     # normalized text -> position in merged
+        token_sets = []  # position -> token set
+        for chunk, result in zip(chunks, chunk_results):
+            source = {"chunk": chunk.index,
+                      "sections": [{"title": title, "lines": list(lines)} for title, lines in chunk.sections]}
+            for text in result or []:
+                if not isinstance(text, str) or not text.strip():
+                    continue
+                normalized = normalize_text(text)
+                position = by_text.get(normalized)
+                tokens = shingles(text)
+                signature = hasher.signature(tokens)
+                if position is None:
+                    best, best_similarity = None, 0.0
+                    for candidate in index.query(signature):
+                        similarity = jaccard(tokens, token_sets[candidate])
+                        if similarity > best_similarity and not conflicting_terms(text, merged[candidate]):
+                            best, best_similarity = candidate, similarity
+                    if best is not None and best_similarity >= self.dedup_similarity_threshold:
+                        position = best
+                if position is None:
+                    position = len(merged)
+                    merged.append(UseCase(text.strip(), [source]))
+                    token_sets.append(tokens)
+                    index.add(position, signature)
+                    by_text[normalized] = position
+                elif not any(s["chunk"] == chunk.index for s in merged[position].sources):
+                    merged[position].sources.append(source)
+        return merged
+
 # --- Example Usage (Conceptual) ---
 if __name__ == "__main__":
     print("Starting Agent 1 example...")
@@ -147,5 +461,26 @@ Product information includes name, description, price, category, and stock quant
     else:
         print("\nFailed to generate use cases.")
 
+    # Re-running on the unchanged document is served from the persistent response cache.
+    import os, tempfile
+    from llm_response_cache import LLMResponseCache
+    cache = LLMResponseCache(db_path=os.path.join(tempfile.gettempdir(), "agent1_llm_response_cache.sqlite"), ttl_seconds=3600)
+    cached_agent1 = Agent1RequirementsAnalyzer(response_cache=cache)
+    first_run = cached_agent1.analyze_requirements(sample_requirements_doc)
+    second_run = cached_agent1.analyze_requirements(sample_requirements_doc)
+    assert first_run == second_run
+    print(f"\nLLM response cache stats: {cache.stats()}")
+    cache.close()
+
+    # A large document is analyzed in chunks; every merged use case points back to its source sections.
+    large_doc = "\n\n".join(
+        f"{n}. Module {n}\n{sample_requirements_doc.strip()}" for n in range(1, 9)
+    )
+    chunked_agent1 = Agent1RequirementsAnalyzer(chunk_token_budget=400, max_concurrency=4)
+    chunked_use_cases = chunked_agent1.analyze_requirements(large_doc)
+    print(f"\nChunked analysis stats: {chunked_agent1.last_chunk_stats}")
+    for uc in chunked_use_cases[:3]:
+        print(f"- {uc} (from: {', '.join(uc.section_titles)})")
+
     print("\nAgent 1 example finished.")
 
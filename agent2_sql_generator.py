@@ -1,7 +1,36 @@
 # agent2_sql_generator.py
 
 import json
+import logging
 import os
+import threading
+import time
+from concurrency_utils import iter_completed, run_ordered
+from cortex_batching import BatchCompleter, build_batch_complete_sql, demultiplex
+from instrumentation import log, metrics
+from pipeline_checkpoints import checkpoint_key
+from schema_pruning import estimate_tokens, get_schema_pruner
+from semantic_model import load_semantic_model
+from sql_templates import DEFAULT_TEMPLATES_PATH, TemplateLibrary, load_template_library
+from text_similarity import normalize_text
+
+# Canned responses of the simulated Cortex Agent API call, checked in priority order.
+_SIMULATED_RESPONSES = [
+    {"all": ["total order value"], "sql": "SELECT c.customer_id, c.customer_name, SUM(oi.quantity * p.price) AS total_order_value\nFROM Customers c\nJOIN Orders o ON c.customer_id = o.customer_id\nJOIN Order_Items oi ON o.order_id = oi.order_id\nJOIN Products p ON oi.product_id = p.product_id\nGROUP BY c.customer_id, c.customer_name;"},
+    {"all": ["inventory levels"], "sql": "SELECT product_id, product_name, stock_quantity FROM Products WHERE last_updated > CURRENT_TIMESTAMP() - INTERVAL '1 DAY';"},
+    {"all": ["consistency between customers and orders"], "sql": "SELECT o.order_id, o.customer_id FROM Orders o LEFT JOIN Customers c ON o.customer_id = c.customer_id WHERE c.customer_id IS NULL;"},
+    {"all": ["user roles and permissions"], "sql": "-- This use case typically requires checking application logic or specific permission tables.\n-- For example, trying to access data as a user with insufficient privileges (conceptual test, not a direct query for data).\nSELECT COUNT(*) FROM Financial_Data; -- (This would be run by different roles)"},
+    {"all": ["new user registration"], "sql": "SELECT user_id, email, profile_status FROM User_Profiles WHERE registration_date > CURRENT_TIMESTAMP() - INTERVAL '1 HOUR' AND (email IS NULL OR name IS NULL);"},
+    {"all": ["historical sales data"], "sql": "SELECT DATE_TRUNC('month', order_date) AS sales_month, SUM(order_total) AS monthly_sales\nFROM Orders\nWHERE order_date >= DATE_TRUNC('year', CURRENT_DATE) - INTERVAL '1 year' AND order_date < DATE_TRUNC('year', CURRENT_DATE)\nGROUP BY sales_month\nORDER BY sales_month;"},
+    {"all": ["product categorization"], "sql": "SELECT c.category_name, p.product_name FROM Products p JOIN Categories c ON p.category_id = c.category_id ORDER BY c.category_name, p.product_name LIMIT 20;"},
+    {"all": ["supplier information"], "sql": "SELECT supplier_id, supplier_name FROM Suppliers WHERE address IS NULL OR phone IS NULL;"},
+    {"all": ["product returns"], "sql": "SELECT r.return_id, r.order_id, r.product_id, r.return_date, o.order_status, p.stock_quantity\nFROM Returns r\nJOIN Orders o ON r.order_id = o.order_id\nJOIN Products p ON r.product_id = p.product_id\nWHERE r.processed_date > CURRENT_TIMESTAMP() - INTERVAL '7 DAY';"},
+    {"all": ["transactions are logged"], "sql": "SELECT transaction_id, user_id, transaction_type, transaction_time FROM Audit_Log WHERE transaction_time >= CURRENT_TIMESTAMP() - INTERVAL '1 DAY' ORDER BY transaction_time DESC;"},
+    {"all": ["searching for customers"], "sql": "SELECT customer_id, customer_name, email FROM Customers WHERE email LIKE '%@example.com';"},
+]
+for _priority, _response in enumerate(reversed(_SIMULATED_RESPONSES)):
+    _response["priority"] = _priority
+_SIMULATOR = TemplateLibrary(_SIMULATED_RESPONSES, strict=False)
 
 class Agent2SQLGenerator:
     """
@@ -9,15 +38,74 @@ class Agent2SQLGenerator:
     and generates specific, executable SQL queries for testing using Snowflake Cortex Analyst (conceptual).
     """
 
-    def __init__(self, semantic_model_path="/home/ubuntu/semantic_model.yaml"):
+    def __init__(self, semantic_model_path="/home/ubuntu/semantic_model.yaml", max_concurrency=1,
+                 requests_per_second=None, call_timeout_seconds=None, simulated_latency_seconds=0.0,
+                 sql_cache=None, prune_schema=False, sql_templates_path=DEFAULT_TEMPLATES_PATH, batch_size=None,
+                 max_batch_retries=2, checkpoints=None):
         """
         Initializes the agent.
         semantic_model_path (str): Path to the conceptual semantic model YAML file.
+        max_concurrency (int): Maximum number of Cortex Agent API calls in flight at once.
+                               1 keeps the original one-use-case-after-another behaviour.
+        requests_per_second (float): Optional cap on how many API calls are started per second.
+        call_timeout_seconds (float): Optional timeout for a single API call. A timed-out use case
+                                      is treated like one for which no SQL could be generated.
+        simulated_latency_seconds (float): Artificial delay added to every simulated API call, so the
+                                           effect of concurrency can be measured offline.
+        sql_cache (SQLGenerationCache): Optional persistent use-case-to-SQL cache. Exact and near-duplicate
+                                        use cases are answered from it without calling the Cortex Agent API.
+        prune_schema (bool): If True, each payload carries only the tables the use case touches (closed over
+                             the FK graph) as an inline semantic model instead of pointing at the whole model.
+        sql_templates_path (str): YAML library of SQL templates. Use cases matching a template get their SQL
+                                  locally without calling the Cortex Agent API. None disables templates.
+        batch_size (int): If greater than 1, use cases that need the LLM are sent up to this many per round trip
+                          (one Cortex COMPLETE statement with a VALUES row per prompt) and the responses are
+                          matched back to their use cases. max_concurrency then limits batches in flight.
+        max_batch_retries (int): How often use cases whose batched response was missing are resubmitted.
+        checkpoints (PipelineCheckpointStore): Optional store of generated SQL keyed by the exact use case and the
+                                               semantic model's content hash. Each query is stored as soon as it
+                                               is generated, so an interrupted run resumes with the remaining
+                                               use cases; editing the semantic model invalidates the entries.
         """
         self.semantic_model_path = semantic_model_path
+        self.max_concurrency = max(1, int(max_concurrency or 1))
+        self.requests_per_second = requests_per_second
+        self.call_timeout_seconds = call_timeout_seconds
+        self.simulated_latency_seconds = simulated_latency_seconds
+        self.sql_cache = sql_cache
+        self.prune_schema = prune_schema
+        self.sql_templates_path = sql_templates_path
+        self.batch_size = batch_size
+        self.max_batch_retries = max_batch_retries
+        self.checkpoints = checkpoints
+        self.schema_pruning_stats = {"use_cases_pruned": 0, "full_tokens": 0, "pruned_tokens": 0, "tokens_saved": 0}
+        self.last_generated = [] # (use_case, sql or None) pairs from the latest generate_sql_queries() run
+        self._stats_lock = threading.Lock()
         # In a real scenario, you would ensure this semantic model is available in a Snowflake stage
         # accessible by Cortex Analyst.
         print(f"Agent 2 (SQL Generator) initialized. Using conceptual semantic model: {self.semantic_model_path}")
+        if self.max_concurrency > 1:
+            print(f"Agent 2 concurrent generation enabled (max_concurrency={self.max_concurrency}, requests_per_second={self.requests_per_second}, call_timeout_seconds={self.call_timeout_seconds})")
+
+    @property
+    def semantic_model(self):
+        """
+        The compiled SemanticModel for semantic_model_path (None if missing or unparsable).
+        Loaded once per process and reloaded only when the file changes.
+        """
+        return load_semantic_model(self.semantic_model_path)
+
+    @property
+    def sql_templates(self):
+        """
+        The compiled TemplateLibrary for sql_templates_path against the semantic model, or None.
+        """
+        if not self.sql_templates_path:
+            return None
+        semantic_model = self.semantic_model
+        if semantic_model is None:
+            return None
+        return load_template_library(self.sql_templates_path, semantic_model)
 
     def _construct_cortex_agent_api_payload(self, use_case_text):
         """
@@ -52,80 +140,278 @@ class Agent2SQLGenerator:
             },
             "response_instruction": "Provide only the generated SQL query as a raw string. Do not include any explanations or markdown formatting."
         }
+        pruned = self._prune_schema_for_use_case(use_case_text) if self.prune_schema else None
+        if pruned is not None:
+            # Inline only the relevant sub-model so prompt size tracks the question, not the whole schema.
+            payload["messages"][0]["content"][0]["text"] += f" (Relevant tables: {', '.join(pruned.tables)})"
+            payload["tool_resources"]["database_analyzer"] = {"semantic_model": pruned.sub_model_yaml}
         return payload
 
+    def _prune_schema_for_use_case(self, use_case_text):
+        """
+        Returns the PrunedSchema for a use case, or None when the model is unavailable or no table could be
+        identified (in which case the full semantic model is used).
+        """
+        semantic_model = self.semantic_model
+        if semantic_model is None or not semantic_model.tables:
+            return None
+        pruned = get_schema_pruner(semantic_model).prune(use_case_text)
+        if not pruned.is_pruned:
+            metrics.incr("schema_pruning_fallbacks", agent="agent2")
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Agent 2: Schema pruning found no relevant tables, using full semantic model: %s", use_case_text[:80])
+            return None
+        with self._stats_lock:
+            self.schema_pruning_stats["use_cases_pruned"] += 1
+            self.schema_pruning_stats["full_tokens"] += pruned.full_tokens
+            self.schema_pruning_stats["pruned_tokens"] += pruned.pruned_tokens
+            self.schema_pruning_stats["tokens_saved"] += pruned.tokens_saved
+        metrics.incr("schema_tokens_saved", pruned.tokens_saved, agent="agent2")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Agent 2: Pruned schema to %s (~%d of %d tokens, saved %d).",
+                      pruned.tables, pruned.pruned_tokens, pruned.full_tokens, pruned.tokens_saved)
+        return pruned
+
     def _call_cortex_agent_api(self, payload):
         """
         (Conceptual) Simulates a call to the Snowflake Cortex Agent REST API.
         In a real scenario, this would be an HTTP POST request to '/api/v2/cortex/agent:run'.
         The response from Cortex Analyst (via the Agent) would be the SQL query.
         """
-        use_case_in_payload = payload["messages"][0]["content"][0]["text"]
-        print(f"\n--- Simulating Cortex Agent API Call (Agent 2 for use case: '{use_case_in_payload[:100]}...') ---")
-        print(f"Payload sent (conceptual):\n{json.dumps(payload, indent=2)}")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Agent 2: Simulated Cortex Agent API call, payload:\n%s", json.dumps(payload, indent=2))
+
+        if self.simulated_latency_seconds:
+            # Stand-in for the network and Cortex Analyst round trip.
+            time.sleep(self.simulated_latency_seconds)
+        return self._simulated_cortex_response(payload)
 
+    def _call_cortex_agent_api_batch(self, payloads):
+        """
+        (Conceptual) Sends several use-case prompts in one round trip: a single SNOWFLAKE.CORTEX.TRY_COMPLETE
+        statement with one VALUES row per prompt (see build_batch_complete_sql), each prompt carrying its
+        semantic model context. Rows are matched back to payloads by their index.
+
+        Returns:
+            list: One SQL string per payload, None where the row came back NULL.
+        """
+        prompts = [self._batch_prompt(payload) for payload in payloads]
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Agent 2: Simulated batched Cortex COMPLETE call for %d use cases:\n%s...", len(prompts),
+                      build_batch_complete_sql(payloads[0]["model"], prompts)[:400])
+        if self.simulated_latency_seconds:
+            # One round trip for the whole batch.
+            time.sleep(self.simulated_latency_seconds)
+        # In a real implementation: cursor.execute(sql); rows = cursor.fetchall()
+        rows = [(index, self._simulated_cortex_response(payload)) for index, payload in enumerate(payloads)]
+        return demultiplex(rows, len(payloads))
+
+    @staticmethod
+    def _batch_prompt(payload):
+        """
+        Flattens an Agent API payload into a single COMPLETE prompt.
+        """
+        resources = payload["tool_resources"]["database_analyzer"]
+        model_context = resources.get("semantic_model") or f"Semantic model file: {resources.get('semantic_model_file')}"
+        return (f"{payload['messages'][0]['content'][0]['text']}\n\n{model_context}\n\n"
+                f"{payload['response_instruction']}")
+
+    def _simulated_cortex_response(self, payload):
+        """
+        Simulated Cortex Analyst answer for one payload.
+        """
+        use_case_in_payload = payload["messages"][0]["content"][0]["text"]
         # Simulated SQL query response based on the use case
         # This is highly dependent on the use case and the (conceptual) semantic model.
         # We'll create some plausible SQL queries for the example use cases.
-        simulated_sql_query = "-- Placeholder: No specific SQL generated for this generic simulation step."
-        if "total order value" in use_case_in_payload.lower():
-            simulated_sql_query = "SELECT c.customer_id, c.customer_name, SUM(oi.quantity * p.price) AS total_order_value\nFROM Customers c\nJOIN Orders o ON c.customer_id = o.customer_id\nJOIN Order_Items oi ON o.order_id = oi.order_id\nJOIN Products p ON oi.product_id = p.product_id\nGROUP BY c.customer_id, c.customer_name;"
-        elif "inventory levels" in use_case_in_payload.lower():
-            simulated_sql_query = "SELECT product_id, product_name, stock_quantity FROM Products WHERE last_updated > CURRENT_TIMESTAMP() - INTERVAL '1 DAY';"
-        elif "consistency between customers and orders" in use_case_in_payload.lower():
-            simulated_sql_query = "SELECT o.order_id, o.customer_id FROM Orders o LEFT JOIN Customers c ON o.customer_id = c.customer_id WHERE c.customer_id IS NULL;"
-        elif "user roles and permissions" in use_case_in_payload.lower():
-            simulated_sql_query = "-- This use case typically requires checking application logic or specific permission tables.\n-- For example, trying to access data as a user with insufficient privileges (conceptual test, not a direct query for data).
-SELECT COUNT(*) FROM Financial_Data; -- (This would be run by different roles)"
-        elif "new user registration" in use_case_in_payload.lower():
-            simulated_sql_query = "SELECT user_id, email, profile_status FROM User_Profiles WHERE registration_date > CURRENT_TIMESTAMP() - INTERVAL '1 HOUR' AND (email IS NULL OR name IS NULL);"
-        elif "historical sales data" in use_case_in_payload.lower():
-            simulated_sql_query = "SELECT DATE_TRUNC('month', order_date) AS sales_month, SUM(order_total) AS monthly_sales\nFROM Orders\nWHERE order_date >= DATE_TRUNC('year', CURRENT_DATE) - INTERVAL '1 year' AND order_date < DATE_TRUNC('year', CURRENT_DATE)\nGROUP BY sales_month\nORDER BY sales_month;"
-        elif "product categorization" in use_case_in_payload.lower():
-            simulated_sql_query = "SELECT c.category_name, p.product_name FROM Products p JOIN Categories c ON p.category_id = c.category_id ORDER BY c.category_name, p.product_name LIMIT 20;"
-        elif "supplier information" in use_case_in_payload.lower():
-            simulated_sql_query = "SELECT supplier_id, supplier_name FROM Suppliers WHERE address IS NULL OR phone IS NULL;"
-        elif "product returns" in use_case_in_payload.lower():
-            simulated_sql_query = "SELECT r.return_id, r.order_id, r.product_id, r.return_date, o.order_status, p.stock_quantity\nFROM Returns r\nJOIN Orders o ON r.order_id = o.order_id\nJOIN Products p ON r.product_id = p.product_id\nWHERE r.processed_date > CURRENT_TIMESTAMP() - INTERVAL '7 DAY';"
-        elif "transactions are logged" in use_case_in_payload.lower():
-            simulated_sql_query = "SELECT transaction_id, user_id, transaction_type, transaction_time FROM Audit_Log WHERE transaction_time >= CURRENT_TIMESTAMP() - INTERVAL '1 DAY' ORDER BY transaction_time DESC;"
-        elif "searching for customers" in use_case_in_payload.lower():
-            simulated_sql_query = "SELECT customer_id, customer_name, email FROM Customers WHERE email LIKE '%@example.com';"
+        response = _SIMULATOR.match(use_case_in_payload)
+        if response is not None:
+            simulated_sql_query = response.sql
         else:
             # Fallback for unmapped use cases to ensure we get enough queries
             simulated_sql_query = f"SELECT * FROM Some_Table WHERE condition_related_to_'{use_case_in_payload[:30].replace("'", "")}';"
 
-        print(f"Simulated SQL Query from Cortex Analyst (via Agent):\n{simulated_sql_query}")
-        print("--- End of Simulated Cortex Agent API Call ---\n")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Agent 2: Simulated SQL from Cortex Analyst:\n%s", simulated_sql_query)
         # The actual API would stream a response. For simplicity, we assume the final SQL is extracted.
         # A real response might be a JSON object from which the SQL needs to be extracted.
         return simulated_sql_query # In reality, this would be parsed from the API's JSON response
 
-    def generate_sql_queries(self, high_level_use_cases):
+    def _local_sql_for_use_case(self, use_case):
         """
-        Generates specific SQL queries from high-level use cases.
+        Returns SQL for a use case from a matching SQL template, a checkpoint or the SQL cache, or None if the LLM is needed.
+        """
+        templates = self.sql_templates
+        if templates is not None:
+            template = templates.match(use_case)
+            if template is not None:
+                metrics.incr("template_hits", agent="agent2")
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("Agent 2: SQL template '%s' matched use case: %s", template.rule, use_case[:80])
+                return template.sql
+        if self.checkpoints is not None:
+            key = self._checkpoint_key(use_case)
+            sql_query = self.checkpoints.get("agent2", key) if key is not None else None
+            if sql_query is not None:
+                metrics.incr("checkpoint_hits", agent="agent2")
+                return sql_query
+        if self.sql_cache is not None:
+            cached = self.sql_cache.get(use_case)
+            if cached is not None:
+                sql_query, match_type, similarity = cached
+                metrics.incr("llm_cache_hits", agent="agent2", match=match_type)
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("Agent 2: SQL cache %s hit (similarity %.2f) for use case: %s", match_type, similarity, use_case[:80])
+                return sql_query
+        return None
 
-        Args:
-            high_level_use_cases (list): A list of natural language use cases from Agent 1.
+    @staticmethod
+    def _count_prompt(payload):
+        prompt_text = payload["messages"][0]["content"][0]["text"]
+        inline_model = payload["tool_resources"]["database_analyzer"].get("semantic_model", "")
+        metrics.incr("llm_calls", agent="agent2")
+        metrics.incr("prompt_chars", len(prompt_text) + len(inline_model), agent="agent2")
+        metrics.incr("prompt_tokens", estimate_tokens(prompt_text) + estimate_tokens(inline_model), agent="agent2")
 
-        Returns:
-            list: A list of generated SQL query strings, or None if an error occurs.
+    def _checkpoint_key(self, use_case):
+        semantic_model = self.semantic_model
+        if semantic_model is None:
+            return None
+        return checkpoint_key(semantic_model.content_hash, self.prune_schema, use_case)
+
+    def _remember_sql(self, use_case, sql_query):
+        if not self.is_specific_sql(sql_query):
+            return
+        if self.sql_cache is not None:
+            self.sql_cache.put(use_case, sql_query)
+        if self.checkpoints is not None:
+            key = self._checkpoint_key(use_case)
+            if key is not None:
+                self.checkpoints.put("agent2", key, sql_query)
+
+    def _generate_sql_for_use_case(self, use_case):
+        """
+        Builds the payload for a single use case and calls the Cortex Agent API, unless a SQL template
+        matches it or the SQL cache already holds SQL for the same or a near-duplicate use case.
+        """
+        sql_query = self._local_sql_for_use_case(use_case)
+        if sql_query is not None:
+            return sql_query
+        payload = self._construct_cortex_agent_api_payload(use_case)
+        self._count_prompt(payload)
+        with metrics.span("llm_call", agent="agent2"):
+            sql_query = self._call_cortex_agent_api(payload)
+        self._remember_sql(use_case, sql_query)
+        return sql_query
+
+    def _iter_sql_batched(self, use_cases):
+        """
+        Batched generation: use cases answered by a template or the cache are yielded first, the rest are sent
+        to Cortex batch_size per round trip and yielded as each batch completes. Use cases whose response is
+        missing are resubmitted up to max_batch_retries times, without repeating the rest of their batch.
+        """
+        pending = []
+        for index, use_case in enumerate(use_cases):
+            sql_query = self._local_sql_for_use_case(use_case)
+            if sql_query is not None:
+                yield index, sql_query
+            else:
+                pending.append(index)
+        if not pending:
+            return
+        payloads = [self._construct_cortex_agent_api_payload(use_cases[index]) for index in pending]
+
+        def call_batch(batch):
+            for payload in batch:
+                self._count_prompt(payload)
+            return self._call_cortex_agent_api_batch(batch)
+
+        completer = BatchCompleter(call_batch, batch_size=self.batch_size, max_retries=self.max_batch_retries,
+                                   max_concurrency=self.max_concurrency, requests_per_second=self.requests_per_second,
+                                   timeout_seconds=self.call_timeout_seconds, agent="agent2",
+                                   label="Cortex batch call for use cases")
+        for position, sql_query in completer.iter_complete(payloads):
+            index = pending[position]
+            self._remember_sql(use_cases[index], sql_query)
+            yield index, sql_query
+
+    def _generate_sql_for_use_cases(self, use_cases):
+        """
+        Generates one SQL query (or None on failure/timeout) per use case, preserving input order.
+        Calls run concurrently when max_concurrency > 1, and are batched when batch_size > 1.
+        """
+        if self.batch_size and self.batch_size > 1:
+            generated = [None] * len(use_cases)
+            for index, sql_query in self._iter_sql_batched(use_cases):
+                generated[index] = sql_query
+            return generated
+        if self.max_concurrency == 1 and not self.requests_per_second and not self.call_timeout_seconds:
+            return [self._generate_sql_for_use_case(use_case) for use_case in use_cases]
+        return run_ordered(
+            self._generate_sql_for_use_case,
+            use_cases,
+            max_workers=self.max_concurrency,
+            requests_per_second=self.requests_per_second,
+            timeout_seconds=self.call_timeout_seconds,
+            label="Cortex Agent API call for use case",
+        )
+
+    def iter_sql_for_use_cases(self, use_cases):
+        """
+        Generates SQL for each use case and yields (index, sql_query) as soon as each one is ready,
+        so downstream stages can start before the whole batch is done. With max_concurrency > 1
+        results arrive in completion order; new calls are only started as the consumer pulls results.
+        """
+        if self.batch_size and self.batch_size > 1:
+            yield from self._iter_sql_batched(use_cases)
+            return
+        if self.max_concurrency == 1 and not self.requests_per_second and not self.call_timeout_seconds:
+            for index, use_case in enumerate(use_cases):
+                yield index, self._generate_sql_for_use_case(use_case)
+            return
+        yield from iter_completed(
+            self._generate_sql_for_use_case,
+            use_cases,
+            max_workers=self.max_concurrency,
+            requests_per_second=self.requests_per_second,
+            timeout_seconds=self.call_timeout_seconds,
+            label="Cortex Agent API call for use case",
+        )
+
+    @staticmethod
+    def _valid_use_cases(high_level_use_cases):
+        """
+        Returns the usable use-case strings, or None if the input is not a non-empty list.
         """
         if not high_level_use_cases or not isinstance(high_level_use_cases, list):
             print("Error: No high-level use cases provided or format is incorrect.")
             return None
-
-        sql_queries = []
+        valid_use_cases = []
         for use_case in high_level_use_cases:
             if not isinstance(use_case, str) or not use_case.strip():
                 print(f"Warning: Skipping invalid use case: {use_case}")
                 continue
-            
-            payload = self._construct_cortex_agent_api_payload(use_case)
-            sql_query = self._call_cortex_agent_api(payload)
-            
-            if sql_query and "Placeholder: No specific SQL generated" not in sql_query:
+            valid_use_cases.append(use_case)
+        return valid_use_cases
+
+    @staticmethod
+    def is_specific_sql(sql_query):
+        """
+        True when the generated SQL is a real query rather than the simulator's placeholder.
+        """
+        return bool(sql_query) and "Placeholder: No specific SQL generated" not in sql_query
+
+    def _assemble_sql_queries(self, high_level_use_cases, valid_use_cases, generated):
+        """
+        Turns per-use-case results into the final query list: drops failures, adds generic fallbacks
+        and caps the list at 10 queries. Returns None if nothing could be generated.
+        """
+        sql_queries = []
+        covered = set() # Normalized use cases that already have a query
+        for use_case, sql_query in zip(valid_use_cases, generated):
+            if self.is_specific_sql(sql_query):
                 sql_queries.append(sql_query)
+                covered.add(normalize_text(use_case))
             else:
                 print(f"Warning: Could not generate a specific SQL query for use case: {use_case}")
 
@@ -135,7 +421,9 @@ SELECT COUNT(*) FROM Financial_Data; -- (This would be run by different roles)"
         while len(sql_queries) < 10 and idx < len(high_level_use_cases):
             # Try to generate more generic queries if specific ones failed or were insufficient
             use_case = high_level_use_cases[idx]
-            if not any(use_case_part in q for q in sql_queries for use_case_part in use_case.split()[:3]): # Avoid re-adding if already covered
+            key = normalize_text(use_case) if isinstance(use_case, str) else ""
+            if key and key not in covered: # Avoid re-adding if already covered
+                covered.add(key)
                 generic_query = f"SELECT COUNT(*) FROM Some_Table_Related_To_{use_case.split()[0].upper()}; -- Generic fallback for {use_case[:30]}..."
                 sql_queries.append(generic_query)
             idx +=1
@@ -146,6 +434,39 @@ SELECT COUNT(*) FROM Financial_Data; -- (This would be run by different roles)"
              
         return sql_queries[:10] # Return at most 10 as per original high-level plan, though prompt asked for 10+
 
+    def generate_sql_queries(self, high_level_use_cases):
+        """
+        Generates specific SQL queries from high-level use cases.
+
+        Args:
+            high_level_use_cases (list): A list of natural language use cases from Agent 1.
+
+        Returns:
+            list: A list of generated SQL query strings, or None if an error occurs.
+        """
+        sql_queries, self.last_generated = self._generate_sql_queries(high_level_use_cases)
+        return sql_queries
+
+    def _generate_sql_queries(self, high_level_use_cases):
+        """
+        Runs generate_sql_queries and returns the run's (use_case, sql or None) pairs alongside the queries,
+        so callers sharing this generator between concurrent runs do not read another run's last_generated.
+
+        Returns:
+            tuple: (SQL query list or None, list of (use_case, sql or None) pairs).
+        """
+        valid_use_cases = self._valid_use_cases(high_level_use_cases)
+        if valid_use_cases is None:
+            return None, []
+
+        tokens_saved_before = self.schema_pruning_stats["tokens_saved"]
+        generated = self._generate_sql_for_use_cases(valid_use_cases)
+        if self.prune_schema:
+            print(f"Agent 2: Schema pruning saved ~{self.schema_pruning_stats['tokens_saved'] - tokens_saved_before} prompt tokens in this run.")
+
+        sql_queries = self._assemble_sql_queries(high_level_use_cases, valid_use_cases, generated)
+        return sql_queries, list(zip(valid_use_cases, generated))
+
 # --- Example Usage (Conceptual) ---
 if __name__ == "__main__":
     print("Starting Agent 2 example...")
@@ -213,5 +534,44 @@ semantic_model:
     else:
         print("\nFailed to generate SQL queries.")
 
+    # Offline speed-up measurement: the same use cases with a simulated 0.2s round trip per call,
+    # first sequentially, then with 8 concurrent calls capped at 20 requests per second.
+    import contextlib, io
+    timings = {}
+    for label, concurrency in (("sequential", 1), ("concurrent", 8)):
+        timed_agent = Agent2SQLGenerator(semantic_model_path=conceptual_semantic_model_file,
+                                         max_concurrency=concurrency, requests_per_second=20,
+                                         call_timeout_seconds=5, simulated_latency_seconds=0.2)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            timed_sql = timed_agent.generate_sql_queries(sample_use_cases_from_agent1)
+        timings[label] = time.perf_counter() - start
+        assert timed_sql == generated_sql, "Concurrent generation must preserve input order"
+    print(f"\nSimulated latency benchmark: sequential {timings['sequential']:.2f}s, concurrent {timings['concurrent']:.2f}s "
+          f"({timings['sequential'] / timings['concurrent']:.1f}x speed-up)")
+
+    # Reworded use cases are answered from the persistent SQL cache without another Cortex call.
+    import tempfile
+    from sql_generation_cache import SQLGenerationCache
+    sql_cache = SQLGenerationCache(conceptual_semantic_model_file,
+                                   db_path=os.path.join(tempfile.gettempdir(), "agent2_sql_generation_cache.sqlite"))
+    cached_agent2 = Agent2SQLGenerator(semantic_model_path=conceptual_semantic_model_file, sql_cache=sql_cache)
+    cached_agent2.generate_sql_queries(sample_use_cases_from_agent1)
+    reworded_use_cases = [
+        "Check total order value accuracy for each customer.",
+        "Verify that product inventory levels are updated correctly after each sale.",
+    ]
+    print(cached_agent2.generate_sql_queries(reworded_use_cases)[:2])
+    print(f"\nSQL generation cache stats: {sql_cache.stats()}")
+    sql_cache.close()
+
+    # Schema pruning against the P&C model: each payload carries only the tables its use case touches.
+    pc_model_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "semantic_model_pc_insurance.yaml")
+    pruning_agent2 = Agent2SQLGenerator(semantic_model_path=pc_model_file, prune_schema=True)
+    pc_payload = pruning_agent2._construct_cortex_agent_api_payload(
+        "Check that every claim payment is made to a valid claimant on the claim.")
+    print(pc_payload["tool_resources"]["database_analyzer"]["semantic_model"])
+    print(f"Schema pruning stats: {pruning_agent2.schema_pruning_stats}")
+
     print("\nAgent 2 example finished.")
 
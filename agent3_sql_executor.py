@@ -1,15 +1,27 @@
 # agent3_sql_executor.py
 
 import json
+import logging
+import time
+from columnar_results import ColumnarResult
+from concurrency_utils import iter_completed
+from connection_pool import ConnectionPool
+from instrumentation import log, metrics
+from scan_sharing import plan_shared_scans
+from sql_validator import apply_row_limit
 # import snowflake.connector # This would be uncommented in a real environment
 
 class Agent3SQLExecutor:
     """
     Agent 3: Executes the generated SQL queries against the Snowflake database
-    and formats the results, limiting output to 10 records per query.
+    and formats the results, limiting output to max_rows (default 10) records per query.
+    Results are returned as ColumnarResult buffers, which also behave as lists of rows.
     """
 
-    def __init__(self, snowflake_connection_params=None):
+    def __init__(self, snowflake_connection_params=None, connector=None, max_workers=1, pool_size=None,
+                 statement_timeout_seconds=None, result_cache=None, max_rows=10, push_down_row_limit=True,
+                 fetch_batch_size=1000, share_scans=True, max_shared_scan_size=20, async_execution=False,
+                 poll_interval_seconds=0.05, admission=None):
         """
         Initializes the agent.
         snowflake_connection_params (dict): Parameters to connect to Snowflake.
@@ -21,8 +33,57 @@ class Agent3SQLExecutor:
                                               "database": "YOUR_DATABASE",
                                               "schema": "YOUR_SCHEMA"
                                           }
+        connector: Driver exposing connect(**snowflake_connection_params), e.g. snowflake.connector,
+                   local_backend.LocalSnowflakeBackend() (embedded database built from the sample setup script)
+                   or snowflake_stand_in.StandInConnector(). When None, query execution is simulated.
+        max_workers (int): Number of queries executed concurrently by execute_sql_queries.
+        pool_size (int): Maximum number of pooled connections. Defaults to max_workers.
+        statement_timeout_seconds (int): Optional per-query timeout; the warehouse cancels queries that exceed it.
+        result_cache (QueryResultCache): Optional cache of query results keyed by SQL fingerprint and
+                                         validated against table data versions. Used with a connector only.
+        max_rows (int): Maximum number of rows kept per query result.
+        push_down_row_limit (bool): If True, queries are rewritten with LIMIT max_rows + 1 so the warehouse
+                                    stops early instead of the executor discarding rows.
+        fetch_batch_size (int): Rows requested per fetchmany() call.
+        share_scans (bool): If True, single-row aggregate queries (counts, NULL checks, sums, ...) over the same
+                            table or join are combined into one query with conditional aggregates, so the table
+                            is scanned once; the combined row is split back per original query. Used with a
+                            connector only.
+        max_shared_scan_size (int): Maximum number of queries combined into one scan.
+        async_execution (bool): If True, execute_sql_queries submits every query with the connector's
+                                execute_async from a single pooled connection and polls the query IDs in one loop,
+                                fetching each result as its query finishes; the queries run concurrently inside the
+                                warehouse instead of each holding a client thread. statement_timeout_seconds is
+                                enforced by cancelling the query server-side. Used with a connector that supports
+                                execute_async only; otherwise queries run synchronously.
+        poll_interval_seconds (float): Pause between status sweeps over the in-flight queries in async mode.
+        admission (QueryAdmissionController): Optional cost-aware admission control. Each run's queries are
+                                              estimated (EXPLAIN or table statistics plus foreign key fan-out),
+                                              executed cheapest first, and held to the controller's per-run
+                                              budget: queries that do not fit are deferred (reported as errors)
+                                              or run on a table sample. Used with a connector only.
         """
         self.snowflake_connection_params = snowflake_connection_params
+        self.connector = connector
+        self.max_workers = max(1, int(max_workers or 1))
+        self.statement_timeout_seconds = statement_timeout_seconds
+        self.result_cache = result_cache
+        self.max_rows = max(0, int(max_rows))
+        self.push_down_row_limit = push_down_row_limit
+        self.fetch_batch_size = max(1, int(fetch_batch_size or 1))
+        self.share_scans = share_scans
+        self.max_shared_scan_size = max_shared_scan_size
+        self.last_scan_sharing = None # Report of the latest execute_sql_queries run
+        self.async_execution = async_execution
+        self.poll_interval_seconds = max(0.0, float(poll_interval_seconds or 0.0))
+        self._has_async_api = None # Probed on the first asynchronous run
+        self.admission = admission
+        self.last_admission = None # Admission report of the latest execute_sql_queries run
+        self.connection_pool = None
+        if self.connector is not None:
+            # The pool is owned by the executor and reused across queries and across execute_sql_queries runs.
+            self.connection_pool = ConnectionPool(self.connector, self.snowflake_connection_params,
+                                                  max_size=pool_size or self.max_workers)
         if self.snowflake_connection_params:
             print(f"Agent 3 (SQL Executor) initialized with conceptual Snowflake connection parameters for account: {self.snowflake_connection_params.get("account")}")
         else:
@@ -31,36 +92,30 @@ class Agent3SQLExecutor:
     def _execute_single_query_on_snowflake(self, sql_query):
         """
         (Conceptual) Executes a single SQL query on Snowflake and fetches results.
-        Limits results to 10 records.
-        """
-        print(f"\n--- Simulating SQL Execution on Snowflake (Agent 3) ---")
-        print(f"Executing SQL Query:\n{sql_query}")
-
-        # In a real implementation:
-        # conn = None
-        # try:
-        #     if not self.snowflake_connection_params:
-        #         print("Error: Snowflake connection parameters not provided.")
-        #         return None, None # No headers, no data
-        #     conn = snowflake.connector.connect(**self.snowflake_connection_params)
-        #     cursor = conn.cursor()
-        #     cursor.execute(sql_query)
-        #     headers = [desc[0] for desc in cursor.description]
-        #     # Fetch up to 10 records + 1 to see if there are more, then slice to 10
-        #     data = cursor.fetchmany(11) 
-        #     limited_data = [list(row) for row in data[:10]] # Convert tuples to lists for easier JSON serialization
-        #     print(f"Fetched {len(limited_data)} records (limited to 10).")
-        #     return headers, limited_data
-        # except snowflake.connector.Error as e:
-        #     print(f"Snowflake Error during SQL execution: {e}")
-        #     error_message = f"Error executing SQL: {e.msg if hasattr(e, 'msg') else str(e)}"
-        #     return ["Error"], [[error_message]]
-        # except Exception as e:
-        #     print(f"General Error during SQL execution: {e}")
-        #     return ["Error"], [[f"General Error: {str(e)}"]]
-        # finally:
-        #     if "cursor" in locals() and cursor: cursor.close()
-        #     if conn: conn.close()
+        Limits results to max_rows records.
+        """
+        with metrics.span("query", agent="agent3"):
+            if self.connection_pool is not None:
+                headers, data = self._execute_single_query_with_pool(sql_query)
+            else:
+                headers, data = self._simulate_single_query(sql_query)
+        self._record_outcome(headers, data)
+        return headers, data
+
+    def _record_outcome(self, headers, data):
+        if headers == ["Error"]:
+            metrics.incr("query_errors", agent="agent3")
+        else:
+            metrics.incr("queries_executed", agent="agent3")
+            metrics.incr("rows_fetched", len(data), agent="agent3")
+            metrics.incr("result_bytes", data.nbytes if isinstance(data, ColumnarResult) else 0, agent="agent3")
+
+    def _simulate_single_query(self, sql_query):
+        """
+        Simulated execution used when no connection parameters or connector are configured.
+        """
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Agent 3: Simulating SQL execution:\n%s", sql_query)
 
         # Simulated response for demonstration
         simulated_headers = ["column_A", "column_B", "column_C"]
@@ -94,27 +149,413 @@ class Agent3SQLExecutor:
             for i in range(min(5, 10)): # Simulate a few rows up to 10
                 simulated_data.append([f"data_A{i+1}", f"data_B{i+1}", i*100])
         
-        print(f"Simulated Headers: {simulated_headers}")
-        print(f"Simulated Data (first few rows): {simulated_data[:3]}")
-        print("--- End of Simulated SQL Execution ---")
-        return simulated_headers, simulated_data[:10] # Ensure limit
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Agent 3: Simulated headers %s, first rows %s", simulated_headers, simulated_data[:3])
+        return simulated_headers, ColumnarResult.from_rows(simulated_headers, simulated_data, max_rows=self.max_rows) # Ensure limit
+
+    def _execute_single_query_with_pool(self, sql_query):
+        """
+        Executes a single SQL query on a pooled connection and fetches results.
+        Limits results to max_rows records, pushing the cap into the query where it can be done safely.
+        """
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Agent 3: Executing SQL on a pooled connection:\n%s", sql_query)
+        sql_query = self._push_down_row_limit(sql_query)
+        driver_error = getattr(self.connector, "Error", Exception)
+        try:
+            with metrics.span("connection_acquire", agent="agent3"):
+                connection = self.connection_pool.acquire()
+        except Exception as e:
+            print(f"Error acquiring a Snowflake connection: {e}")
+            return ["Error"], [[f"Connection Error: {str(e)}"]]
+
+        cursor = None
+        try:
+            lookup = None
+            if self.result_cache is not None:
+                # Table versions are probed on this connection before the query runs.
+                lookup = self.result_cache.lookup(sql_query, lambda probe_sql: self._fetch_all(connection, probe_sql))
+                metrics.incr("result_cache_hits" if lookup.hit else "result_cache_misses", agent="agent3")
+                if lookup.hit:
+                    headers, limited_data = lookup.result
+                    if log.isEnabledFor(logging.DEBUG):
+                        log.debug("Agent 3: Result cache hit: %d records (tables unchanged: %s).",
+                                  len(limited_data), ", ".join(lookup.tables) or "none")
+                    return headers, limited_data
+            cursor = connection.cursor()
+            if self.statement_timeout_seconds:
+                cursor.execute(sql_query, timeout=self.statement_timeout_seconds)
+            else:
+                cursor.execute(sql_query)
+            headers = [desc[0] for desc in cursor.description] if cursor.description else []
+            limited_data = self._fetch_columnar(cursor, headers)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Agent 3: Fetched %d records (limited to %d).", len(limited_data), self.max_rows)
+            if lookup is not None:
+                self.result_cache.store(lookup, headers, limited_data)
+            return headers, limited_data
+        except driver_error as e:
+            print(f"Snowflake Error during SQL execution: {e}")
+            error_message = f"Error executing SQL: {e.msg if hasattr(e, 'msg') else str(e)}"
+            return ["Error"], [[error_message]]
+        except Exception as e:
+            print(f"General Error during SQL execution: {e}")
+            return ["Error"], [[f"General Error: {str(e)}"]]
+        finally:
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+            self.connection_pool.release(connection)
+
+    def _push_down_row_limit(self, sql_query):
+        """
+        Returns the query with LIMIT max_rows + 1 applied where that can be done safely.
+        """
+        if not self.push_down_row_limit:
+            return sql_query
+        # One extra row tells us whether the result was truncated.
+        sql_query, limit_applied = apply_row_limit(sql_query, self.max_rows + 1)
+        if limit_applied:
+            metrics.incr("row_cap_pushdowns", agent="agent3")
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Agent 3: Row cap pushed down: LIMIT %d", self.max_rows + 1)
+        return sql_query
+
+    def _fetch_columnar(self, cursor, headers):
+        """
+        Reads at most max_rows rows into a ColumnarResult, using the connector's Arrow batches when available.
+        """
+        result = ColumnarResult(headers)
+        fetch_arrow_batches = getattr(cursor, "fetch_arrow_batches", None)
+        if fetch_arrow_batches is not None:
+            try:
+                for batch in fetch_arrow_batches():
+                    result.append_arrow(batch, max_rows=self.max_rows)
+                    if result.truncated:
+                        break
+                return result
+            except Exception as e:
+                if len(result):
+                    raise
+                print(f"Arrow fetch unavailable ({e}); fetching rows.")
+        # Ask for one row beyond the cap to know whether the result was truncated.
+        remaining = self.max_rows + 1
+        while remaining > 0:
+            batch = cursor.fetchmany(min(self.fetch_batch_size, remaining))
+            if not batch:
+                break
+            result.append_rows(batch, max_rows=self.max_rows)
+            remaining -= len(batch)
+        return result
+
+    def _fetch_all(self, connection, sql_query):
+        cursor = connection.cursor()
+        try:
+            if self.statement_timeout_seconds:
+                cursor.execute(sql_query, timeout=self.statement_timeout_seconds)
+            else:
+                cursor.execute(sql_query)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def close(self):
+        """
+        Closes every pooled connection. The pool reopens connections on demand if the executor is used again.
+        """
+        if self.connection_pool is not None:
+            self.connection_pool.close_all()
+
+    def _execute_all(self, sql_queries, on_outcome=None):
+        """
+        Executes queries (asynchronously in the warehouse, or concurrently when max_workers > 1) and returns
+        their (headers, data) in input order. on_outcome(index, outcome), if given, is called on the calling
+        thread as each query finishes.
+        """
+        if self.async_execution and self.connection_pool is not None and sql_queries and self._async_api_available():
+            return self._execute_all_async(sql_queries, on_outcome)
+        outcomes = [None] * len(sql_queries)
+        if self.max_workers > 1 and len(sql_queries) > 1:
+            completed = iter_completed(
+                self._execute_single_query_on_snowflake,
+                sql_queries,
+                max_workers=self.max_workers,
+                default=(["Error"], [["Query execution failed"]]),
+                label="SQL query",
+                max_in_flight=len(sql_queries),
+            )
+        else:
+            completed = ((index, self._execute_single_query_on_snowflake(q)) for index, q in enumerate(sql_queries))
+        for index, outcome in completed:
+            outcomes[index] = outcome
+            if on_outcome is not None:
+                on_outcome(index, outcome)
+        return outcomes
+
+    def _async_api_available(self):
+        """
+        True if the connector's connections offer execute_async, get_query_status and get_results_from_sfqid.
+        """
+        if self._has_async_api is None:
+            try:
+                with self.connection_pool.connection() as connection:
+                    cursor = connection.cursor()
+                    self._has_async_api = all(callable(getattr(connection, name, None))
+                                              for name in ("get_query_status", "is_still_running")) and \
+                                          all(callable(getattr(cursor, name, None))
+                                              for name in ("execute_async", "get_results_from_sfqid"))
+                    cursor.close()
+            except Exception:
+                return False
+            if not self._has_async_api:
+                print("Warning: The connector has no asynchronous query API; executing queries synchronously.")
+        return self._has_async_api
 
-    def execute_sql_queries(self, sql_queries_list):
+    def _cancel_query(self, connection, sfqid):
+        """
+        Cancels a query in the warehouse. Returns False if the cancel request itself failed.
+        """
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(f"SELECT SYSTEM$CANCEL_QUERY('{sfqid}')")
+            finally:
+                cursor.close()
+            return True
+        except Exception as e:
+            print(f"Warning: Could not cancel query {sfqid}: {e}")
+            return False
+
+    def _execute_all_async(self, sql_queries, on_outcome=None):
+        """
+        Submits every query with execute_async on one pooled connection, then polls the query IDs in a
+        single loop and fetches each result as soon as its query finishes. Queries still running after
+        statement_timeout_seconds are cancelled in the warehouse.
+        Returns (headers, data) per query in input order; on_outcome(index, outcome) is called as each finishes.
+        """
+        outcomes = [None] * len(sql_queries)
+
+        def finish(index, outcome):
+            outcomes[index] = outcome
+            if on_outcome is not None:
+                on_outcome(index, outcome)
+
+        driver_error = getattr(self.connector, "Error", Exception)
+        try:
+            with metrics.span("connection_acquire", agent="agent3"):
+                connection = self.connection_pool.acquire()
+        except Exception as e:
+            print(f"Error acquiring a Snowflake connection: {e}")
+            for index in range(len(sql_queries)):
+                finish(index, (["Error"], [[f"Connection Error: {str(e)}"]]))
+            return outcomes
+
+        in_flight = {} # sfqid -> (index, cursor, result cache lookup, submission time)
+        try:
+            for index, sql_query in enumerate(sql_queries):
+                sql_query = self._push_down_row_limit(sql_query)
+                cursor = None
+                try:
+                    lookup = None
+                    if self.result_cache is not None:
+                        lookup = self.result_cache.lookup(sql_query, lambda probe_sql: self._fetch_all(connection, probe_sql))
+                        metrics.incr("result_cache_hits" if lookup.hit else "result_cache_misses", agent="agent3")
+                        if lookup.hit:
+                            finish(index, lookup.result)
+                            continue
+                    cursor = connection.cursor()
+                    cursor.execute_async(sql_query)
+                    in_flight[cursor.sfqid] = (index, cursor, lookup, time.monotonic())
+                except driver_error as e:
+                    print(f"Snowflake Error submitting SQL: {e}")
+                    finish(index, (["Error"], [[f"Error executing SQL: {e.msg if hasattr(e, 'msg') else str(e)}"]]))
+                    if cursor is not None:
+                        cursor.close()
+                except Exception as e:
+                    print(f"General Error submitting SQL: {e}")
+                    finish(index, (["Error"], [[f"General Error: {str(e)}"]]))
+                    if cursor is not None:
+                        cursor.close()
+            metrics.incr("async_queries_submitted", len(in_flight), agent="agent3")
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Agent 3: %d queries submitted asynchronously: %s", len(in_flight), list(in_flight))
+
+            while in_flight:
+                for sfqid in list(in_flight):
+                    index, cursor, lookup, submitted = in_flight[sfqid]
+                    try:
+                        if connection.is_still_running(connection.get_query_status(sfqid)):
+                            if not self.statement_timeout_seconds or \
+                                    time.monotonic() - submitted <= self.statement_timeout_seconds:
+                                continue
+                            self._cancel_query(connection, sfqid)
+                            metrics.incr("async_queries_cancelled", agent="agent3")
+                            print(f"Snowflake Error during SQL execution: query {sfqid} exceeded "
+                                  f"{self.statement_timeout_seconds} seconds and was canceled.")
+                            finish(index, (["Error"], [[f"Error executing SQL: Statement reached its statement timeout of "
+                                                        f"{self.statement_timeout_seconds} seconds and was canceled."]]))
+                        else:
+                            cursor.get_results_from_sfqid(sfqid)
+                            headers = [desc[0] for desc in cursor.description] if cursor.description else []
+                            limited_data = self._fetch_columnar(cursor, headers)
+                            if lookup is not None:
+                                self.result_cache.store(lookup, headers, limited_data)
+                            finish(index, (headers, limited_data))
+                    except driver_error as e:
+                        print(f"Snowflake Error during SQL execution: {e}")
+                        finish(index, (["Error"], [[f"Error executing SQL: {e.msg if hasattr(e, 'msg') else str(e)}"]]))
+                    except Exception as e:
+                        print(f"General Error during SQL execution: {e}")
+                        finish(index, (["Error"], [[f"General Error: {str(e)}"]]))
+                    del in_flight[sfqid]
+                    metrics.observe("query_seconds", time.monotonic() - submitted, agent="agent3")
+                    try:
+                        cursor.close()
+                    except Exception:
+                        pass
+                if in_flight:
+                    time.sleep(self.poll_interval_seconds)
+        finally:
+            for sfqid in in_flight: # Only left over if polling was interrupted
+                self._cancel_query(connection, sfqid)
+            self.connection_pool.release(connection)
+
+        for headers, data in outcomes:
+            self._record_outcome(headers, data)
+        return outcomes
+
+    def _execute_with_shared_scans(self, sql_queries, on_outcome=None, report=None):
+        """
+        Executes queries with compatible aggregate queries merged into shared scans (see scan_sharing).
+        Members of a combined query that fails are re-run on their own, so sharing never changes an outcome.
+        Returns (headers, data) per query in input order; on_outcome(index, outcome) is called as each is known.
+        The run's scan sharing report is stored under "scan_sharing" in report, if given.
+        """
+        groups, standalone = plan_shared_scans(sql_queries, max_group_size=self.max_shared_scan_size)
+        outcomes = [None] * len(sql_queries)
+        retry, scans_saved = [], 0
+
+        def finish(index, outcome):
+            outcomes[index] = outcome
+            if on_outcome is not None:
+                on_outcome(index, outcome)
+
+        def finish_executed(position, outcome):
+            nonlocal scans_saved
+            if position >= len(groups):
+                finish(standalone[position - len(groups)], outcome)
+                return
+            group = groups[position]
+            split = group.split(*outcome)
+            if split is None:
+                print(f"Warning: Shared scan on {group.source} failed; running its {len(group.members)} queries separately.")
+                retry.extend(group.members)
+                return
+            for index, member_outcome in zip(group.members, split):
+                finish(index, member_outcome)
+            scans_saved += len(group.members) - 1
+
+        self._execute_all([group.sql for group in groups] + [sql_queries[i] for i in standalone], finish_executed)
+        if retry:
+            self._execute_all([sql_queries[i] for i in retry], lambda position, outcome: finish(retry[position], outcome))
+        merged = sum(len(group.members) for group in groups)
+        if report is not None:
+            report["scan_sharing"] = {"queries": len(sql_queries), "shared_scans": len(groups), "queries_merged": merged,
+                                      "fallbacks": len(retry), "scans_saved": scans_saved}
+        if groups:
+            metrics.incr("scans_saved", scans_saved, agent="agent3")
+            print(f"Agent 3: Scan sharing merged {merged} aggregate queries into {len(groups)} scans "
+                  f"({scans_saved} scans saved).")
+        return outcomes
+
+    def _execute_planned(self, sql_queries, on_outcome=None, report=None):
+        if self.share_scans and self.connection_pool is not None and len(sql_queries) > 1:
+            return self._execute_with_shared_scans(sql_queries, on_outcome, report)
+        return self._execute_all(sql_queries, on_outcome)
+
+    @staticmethod
+    def _deferred_outcome(entry):
+        return (["Error"], [[f"Deferred by admission control: estimated {entry.estimate.cost_bytes:,} bytes "
+                             f"exceed the remaining budget of this run"]])
+
+    def _execute_admitted(self, sql_queries, sample_percents, on_outcome=None, report=None):
+        """
+        Executes queries through the admission controller: cheapest first, within the per-run budget.
+        Fills sample_percents with {index: sample percent} for queries run on a sample before any query
+        runs, then returns outcomes in input order; on_outcome(index, outcome) is called as each is known.
+        The run's admission report is stored under "admission" in report, if given.
+        """
+        with self.connection_pool.connection() as connection:
+            schedule, admission_report = self.admission.plan(connection, sql_queries)
+        if report is not None:
+            report["admission"] = admission_report
+        admitted = [entry for entry in schedule if entry.action != "defer"]
+        sample_percents.update((entry.index, entry.sample_percent) for entry in admitted if entry.action == "sample")
+        outcomes = [None] * len(sql_queries)
+
+        def finish(index, outcome):
+            outcomes[index] = outcome
+            if on_outcome is not None:
+                on_outcome(index, outcome)
+
+        for entry in schedule:
+            if entry.action == "defer":
+                finish(entry.index, self._deferred_outcome(entry))
+        self._execute_planned([entry.sql_to_run for entry in admitted],
+                              lambda position, outcome: finish(admitted[position].index, outcome), report)
+        metrics.incr("queries_deferred", len(schedule) - len(admitted), agent="agent3")
+        return outcomes
+
+    def execute_sql_queries(self, sql_queries_list, on_result=None, report=None):
         """
         Executes a list of SQL queries and returns their results.
 
         Args:
             sql_queries_list (list): A list of SQL query strings.
+            on_result (callable): Optional on_result(sql_query, result) called on the calling thread as each
+                                  query finishes, with the same result dict the returned mapping holds.
+            report (dict): Optional dict that receives this run's "admission" and "scan_sharing" reports (None
+                           when unused). Pass one per run when the executor is shared between concurrent runs;
+                           last_admission and last_scan_sharing only hold the latest run's reports.
 
         Returns:
             dict: A dictionary where keys are SQL queries and values are dicts 
-                  containing {"headers": list, "data": list_of_lists (max 10 rows)}.
+                  containing {"headers": list, "data": ColumnarResult (a sequence of rows, max max_rows rows)},
+                  plus "sample_percent" for queries the admission controller ran on a table sample.
                   Returns None if input is invalid.
         """
         if not sql_queries_list or not isinstance(sql_queries_list, list):
             print("Error: No SQL queries provided or format is incorrect.")
             return None
 
+        report = {} if report is None else report
+        report.update(admission=None, scan_sharing=None)
+        if self.result_cache is not None:
+            # Re-check table data versions once per run.
+            self.result_cache.expire_versions()
+        valid_queries = [q for q in sql_queries_list if isinstance(q, str) and q.strip()]
+        sample_percents = {}
+
+        def result_entry(index, outcome):
+            result = {"headers": outcome[0], "data": outcome[1]}
+            if index in sample_percents:
+                result["sample_percent"] = sample_percents[index]
+            return result
+
+        on_outcome = None
+        if on_result is not None:
+            def on_outcome(index, outcome):
+                on_result(valid_queries[index], result_entry(index, outcome))
+        if self.admission is not None and self.connection_pool is not None and valid_queries:
+            outcomes = self._execute_admitted(valid_queries, sample_percents, on_outcome, report)
+        else:
+            outcomes = self._execute_planned(valid_queries, on_outcome, report)
+        self.last_admission, self.last_scan_sharing = report["admission"], report["scan_sharing"]
+        outcomes = iter(enumerate(outcomes))
+
+        # Results are assembled in input order, regardless of the order in which queries finished.
         all_results = {}
         for i, sql_query in enumerate(sql_queries_list):
             if not isinstance(sql_query, str) or not sql_query.strip():
@@ -122,13 +563,14 @@ class Agent3SQLExecutor:
                 all_results[f"Skipped_Invalid_Query_{i}"] = {"headers": ["Error"], "data": [["Invalid SQL query string"]]}
                 continue
             
-            headers, data = self._execute_single_query_on_snowflake(sql_query)
-            all_results[sql_query] = {"headers": headers, "data": data}
+            index, outcome = next(outcomes)
+            all_results[sql_query] = result_entry(index, outcome)
         
         return all_results
 
 # --- Example Usage (Conceptual) ---
 if __name__ == "__main__":
+    import time
     print("Starting Agent 3 example...")
     # Conceptual connection parameters (replace with actual in a real scenario)
     # For this example, we run in simulation mode as snowflake_connection_params is None by default.
@@ -165,5 +607,76 @@ if __name__ == "__main__":
     else:
         print("\nFailed to execute SQL queries or process results.")
 
+    # Pooled, parallel execution against the embedded local backend (SQLite snapshot of the P&C sample data).
+    from local_backend import LocalSnowflakeBackend
+    stand_in = LocalSnowflakeBackend(connect_latency_seconds=0.2, query_latency_seconds=0.05)
+    pooled_agent3 = Agent3SQLExecutor(snowflake_connection_params={"account": "LOCAL_STAND_IN"}, connector=stand_in,
+                                      max_workers=4, statement_timeout_seconds=30)
+    pc_queries = [
+        "SELECT PolicyID, PolicyType, TotalPremium FROM Policies ORDER BY PolicyID;",
+        "SELECT c.ClaimID, SUM(p.PaymentAmount) AS TotalPaid FROM Claims c JOIN ClaimPayments p ON c.ClaimID = p.ClaimID GROUP BY c.ClaimID;",
+        "SELECT COUNT(*) FROM Customers WHERE EmailAddress IS NULL;",
+        "SELECT COUNT(*) AS MissingPhone FROM Customers WHERE PhoneNumber IS NULL;", # Shares a scan with the query above
+        "SELECT ClaimID, DATE_TRUNC('month', DateOfLoss) AS LossMonth FROM Claims WHERE DateReported > CURRENT_TIMESTAMP() - INTERVAL '10 YEARS';",
+        "SELECT * FROM Non_Existent_Table;",
+    ]
+    for run in range(2): # The second run reuses the pooled connections
+        pooled_results = pooled_agent3.execute_sql_queries(pc_queries)
+    assert list(pooled_results) == pc_queries, "Results must follow input order"
+    print(f"\nLocal backend: {stand_in.connections_opened} connections opened for {stand_in.queries_executed} queries. Pool stats: {pooled_agent3.connection_pool.stats()}")
+    print(f"Scan sharing: {pooled_agent3.last_scan_sharing}")
+    pooled_agent3.close()
+
+    # Asynchronous execution: every query is submitted from one connection and runs concurrently in the warehouse;
+    # a query exceeding the statement timeout is cancelled server-side.
+    slow_backend = LocalSnowflakeBackend(query_latency_seconds=0.5)
+    async_agent3 = Agent3SQLExecutor(snowflake_connection_params={"account": "LOCAL_STAND_IN"}, connector=slow_backend,
+                                     async_execution=True, statement_timeout_seconds=5, share_scans=False)
+    async_queries = [f"SELECT ClaimID, Status FROM Claims WHERE ClaimID > 'CLM{i:08d}' ORDER BY ClaimID;" for i in range(40)]
+    started = time.perf_counter()
+    async_results = async_agent3.execute_sql_queries(async_queries + ["SELECT * FROM Non_Existent_Table;"])
+    print(f"\nAsync: {len(async_results)} queries in {time.perf_counter() - started:.2f}s on "
+          f"{slow_backend.connections_opened} connection(s) (0.5s each in the warehouse).")
+    async_agent3.statement_timeout_seconds = 0.2
+    timed_out = async_agent3.execute_sql_queries(["SELECT COUNT(*) FROM Claims;"])
+    print(f"Async with a 0.2s timeout: {list(timed_out.values())[0]['data']} ({slow_backend.queries_cancelled} cancelled)")
+    async_agent3.close()
+
+    # Result cache: a reformatted query is served from the cache until a table it reads changes.
+    import os
+    import tempfile
+    from query_result_cache import QueryResultCache
+    from snowflake_stand_in import StandInConnector
+    with open(stand_in.setup_sql_path) as f:
+        writable = StandInConnector(setup_sql=f.read())
+    result_cache = QueryResultCache(db_path=os.path.join(tempfile.mkdtemp(), "query_result_cache.sqlite"))
+    cached_agent3 = Agent3SQLExecutor(snowflake_connection_params={"account": "LOCAL_STAND_IN"}, connector=writable,
+                                      pool_size=1, result_cache=result_cache)
+    cached_agent3.execute_sql_queries(["SELECT ClaimID, Status FROM Claims ORDER BY ClaimID;"])
+    cached_agent3.execute_sql_queries(["select ClaimID,  Status\nfrom Claims -- same query, reformatted\norder by ClaimID"])
+    with cached_agent3.connection_pool.connection() as conn:
+        conn.cursor().execute("UPDATE Claims SET Status = 'Closed', LastUpdatedDate = CURRENT_TIMESTAMP WHERE ClaimID = 'CLM00000001'")
+    cached_agent3.execute_sql_queries(["SELECT ClaimID, Status FROM Claims ORDER BY ClaimID;"]) # Stale: re-executed
+    print(f"\nResult cache stats: {result_cache.stats()}")
+    cached_agent3.close()
+    result_cache.close()
+
+    # Admission control: cheapest queries first; the accidental cross join and anything else over budget is held back.
+    from query_admission import QueryAdmissionController
+    from semantic_model import load_semantic_model
+    model = load_semantic_model(os.path.join(os.path.dirname(os.path.abspath(__file__)), "semantic_model_pc_insurance.yaml"))
+    admitted_agent3 = Agent3SQLExecutor(snowflake_connection_params={"account": "LOCAL_STAND_IN"}, connector=LocalSnowflakeBackend(),
+                                        admission=QueryAdmissionController(semantic_model=model, max_bytes=1200, over_budget="sample"))
+    admitted_results = admitted_agent3.execute_sql_queries([
+        "SELECT COUNT(*) AS Pairs FROM Customers c, ClaimPayments p;",
+        "SELECT COUNT(*) FROM Users WHERE Role IS NULL;",
+        "SELECT SUM(CurrentReserveAmount) AS Reserved FROM ClaimReserves;",
+        "SELECT AVG(TotalPremium) AS AvgPremium FROM Policies WHERE Status = 'Active';",
+    ])
+    for query, result in admitted_results.items():
+        print(f"{query[:60]!r}: {result['headers']} {list(result['data'])} sample={result.get('sample_percent')}")
+    print(f"Admission: {admitted_agent3.last_admission}")
+    admitted_agent3.close()
+
     print("\nAgent 3 example finished.")
 
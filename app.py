@@ -2,8 +2,12 @@
 
 import streamlit as st
 from main_orchestrator import MainOrchestrator
+from pipeline_jobs import PipelineJob
 import os
 import json # For pretty printing dicts/lists if needed
+import time
+
+PROGRESS_POLL_SECONDS = 0.5
 
 # --- Page Configuration ---
 st.set_page_config(
@@ -13,6 +17,60 @@ st.set_page_config(
 )
 
 # --- Helper Functions ---
+@st.cache_resource(show_spinner=False)
+def get_orchestrator(connection_params_json, semantic_model_path):
+    """
+    Returns a warm orchestrator (agents, caches, connection pool, compiled semantic model) for a
+    connection config, built once per server process and reused across clicks, reruns and sessions.
+    The config is passed as a JSON string so it can serve as the cache key. Runs from concurrent
+    sessions may overlap: the orchestrator returns each run's reports in its results and does not
+    read them back from the shared agents' last_* fields.
+    """
+    return MainOrchestrator(
+        conceptual_snowflake_connection_params=json.loads(connection_params_json),
+        conceptual_semantic_model_path=semantic_model_path
+    )
+
+def rerun():
+    (getattr(st, "rerun", None) or st.experimental_rerun)()
+
+def display_result_table(result_data):
+    if result_data.get("headers") and result_data.get("data") is not None:
+        if result_data["headers"][0] == "Error":
+            st.error(f"Error executing query: {result_data["data"][0][0]}")
+        else:
+            data = result_data["data"]
+            # Columnar results render directly as {header: column values}.
+            st.table(data.to_pydict() if hasattr(data, "to_pydict") else result_data)
+    else:
+        st.write("No data returned for this query or an error occurred during its execution.")
+
+def display_progress(progress):
+    """
+    Renders a running job: the use cases once Agent 1 is done, then each query and its result as it completes.
+    """
+    use_cases = progress.get("high_level_use_cases")
+    events = progress["events"]
+    st.info(f"Agents at work... {len(events)} use case(s) processed after {progress['elapsed_seconds']:.0f}s. "
+            "Results appear below as they complete.")
+    if use_cases:
+        st.markdown("### 1. High-Level Use Cases (from Agent 1)")
+        for i, uc in enumerate(use_cases):
+            st.write(f"{i+1}. {uc}")
+        st.markdown("---")
+    else:
+        st.write("Agent 1 is analyzing the requirements document...")
+    if events:
+        st.markdown("### 2. Queries and Results So Far")
+        for event in events:
+            with st.expander(str(event["use_case"] or "Generic fallback query"), expanded=event["result"] is not None):
+                if event["sql"]:
+                    st.code(event["sql"], language="sql")
+                if event["result"] is not None:
+                    display_result_table(event["result"])
+                else:
+                    st.write("Not executed (no specific SQL generated, rejected by validation, or beyond the 10-query limit).")
+
 def display_results(results):
     st.subheader("Processed Results")
 
@@ -26,6 +84,12 @@ def display_results(results):
         st.markdown("### 1. High-Level Use Cases (from Agent 1)")
         for i, uc in enumerate(results["high_level_use_cases"]):
             st.write(f"{i+1}. {uc}")
+        dedup = results.get("use_case_dedup")
+        if dedup and dedup["generation_calls_saved"]:
+            st.caption(f"{dedup['use_cases']} use cases clustered into {dedup['clusters']}; "
+                       f"{dedup['generation_calls_saved']} SQL generation calls saved.")
+            for duplicate in dedup["duplicates"]:
+                st.caption(f"'{duplicate['representative']}' also covers: " + "; ".join(duplicate["members"]))
         st.markdown("---")
     else:
         st.info("No high-level use cases were generated or Agent 1 did not complete successfully.")
@@ -41,18 +105,25 @@ def display_results(results):
         st.info("No SQL queries were generated or Agent 2 did not complete successfully.")
         st.markdown("---")
 
+    validation_report = results.get("sql_validation_report")
+    if validation_report:
+        st.markdown("### SQL Validation (offline, before execution)")
+        st.write(f"{validation_report['valid']} valid, {len(validation_report['repaired'])} repaired, "
+                 f"{len(validation_report['rejected'])} rejected in {validation_report['elapsed_ms']:.2f} ms")
+        for rejected in validation_report["rejected"]:
+            st.code(rejected["sql"], language="sql")
+            st.warning("Rejected: " + "; ".join(rejected["reasons"]))
+        for repaired in validation_report["repaired"]:
+            st.code(repaired["repaired_sql"], language="sql")
+            st.info("Repaired: " + "; ".join(repaired["reasons"]))
+        st.markdown("---")
+
     if results.get("sql_execution_results"):
         st.markdown("### 3. SQL Execution Results (from Agent 3 - Max 10 rows per query)")
         for query, result_data in results["sql_execution_results"].items():
             st.markdown(f"**Results for Query:**")
             st.code(query, language="sql")
-            if result_data.get("headers") and result_data.get("data") is not None:
-                if result_data["headers"][0] == "Error":
-                    st.error(f"Error executing query: {result_data["data"][0][0]}")
-                else:
-                    st.table(result_data) # Streamlit table handles headers and data nicely
-            else:
-                st.write("No data returned for this query or an error occurred during its execution.")
+            display_result_table(result_data)
             st.markdown("&nbsp;") # Little spacer
         st.markdown("---")
     elif results.get("generated_sql_queries"): # Only show if Agent 2 ran but Agent 3 didn't produce results
@@ -116,25 +187,37 @@ if uploaded_file is not None:
 
 # Process Button and Output Area
 st.header("2. Process and View Results")
-if st.button("Process Requirements and Generate SQL Tests"):
+# The pipeline runs as a background job held in session state, so reruns of this script (widget
+# interactions, progress polling) never restart it.
+job = st.session_state.get("pipeline_job")
+if st.button("Process Requirements and Generate SQL Tests", disabled=bool(job and job.is_running)):
     if not requirements_text:
         st.warning("Please upload a requirements document first.")
     else:
-        with st.spinner("Agents at work... This may take a moment as it involves conceptual LLM calls and processing."):
-            try:
-                # Initialize orchestrator (it will initialize agents)
-                # Pass conceptual params; agents are designed to simulate if these are not fully functional
-                orchestrator = MainOrchestrator(
-                    conceptual_snowflake_connection_params=conceptual_connection_params,
-                    conceptual_semantic_model_path=conceptual_semantic_model_path
-                )
-                
-                # Run the full pipeline
-                st.session_state.results = orchestrator.process_requirements_to_sql_results(requirements_text)
-                st.success("Processing complete!")
-            except Exception as e:
-                st.error(f"An error occurred during orchestration: {e}")
-                st.session_state.results = {"errors": [f"Orchestration Error: {str(e)}"]}
+        try:
+            # Pass conceptual params; agents are designed to simulate if these are not fully functional
+            orchestrator = get_orchestrator(json.dumps(conceptual_connection_params, sort_keys=True),
+                                            conceptual_semantic_model_path)
+            job = PipelineJob(orchestrator, requirements_text).start()
+            st.session_state.pipeline_job = job
+            st.session_state.pop("results", None)
+        except Exception as e:
+            st.error(f"An error occurred during orchestration: {e}")
+            st.session_state.results = {"errors": [f"Orchestration Error: {str(e)}"]}
+            job = None
+
+if job is not None and "results" not in st.session_state:
+    progress = job.snapshot()
+    if job.is_running:
+        display_progress(progress)
+        time.sleep(PROGRESS_POLL_SECONDS)
+        rerun()
+    elif progress["status"] == "completed":
+        st.success(f"Processing complete in {progress['elapsed_seconds']:.1f}s!")
+        st.session_state.results = progress["results"]
+    else:
+        st.error(f"An error occurred during orchestration: {progress['error']}")
+        st.session_state.results = {"errors": [f"Orchestration Error: {progress['error']}"]}
 
 if "results" in st.session_state:
     display_results(st.session_state.results)
@@ -0,0 +1,263 @@
+# batch_runner.py
+
+import argparse
+import contextlib
+import glob
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from columnar_results import ColumnarResult
+from instrumentation import metrics
+
+DEFAULT_PATTERNS = ("*.txt", "*.md")
+STAGES = ("agent1", "dedup", "agent2", "validation", "agent3")
+
+_orchestrator = None # One warm orchestrator per worker process
+
+def find_documents(inputs, patterns=DEFAULT_PATTERNS):
+    """
+    Expands directories (searched recursively for `patterns`) and glob patterns into a sorted,
+    de-duplicated list of document paths.
+    """
+    paths = set()
+    for entry in inputs:
+        if os.path.isdir(entry):
+            for pattern in patterns:
+                paths.update(glob.glob(os.path.join(entry, "**", pattern), recursive=True))
+        else:
+            paths.update(glob.glob(entry, recursive=True))
+    return sorted(os.path.abspath(p) for p in paths if os.path.isfile(p))
+
+def _json_default(value):
+    if isinstance(value, ColumnarResult):
+        return value.to_rows()
+    return str(value)
+
+def load_checkpoint(output_path):
+    """
+    Reads the JSONL output of an earlier (possibly crashed) run and returns {document path: content sha256}
+    for every document that completed successfully. A partially written last line is cut off so that
+    new records are appended after the last complete one.
+    """
+    done = {}
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        complete = data.rfind(b"\n") + 1
+        if complete < len(data):
+            print(f"Warning: Discarding a partially written record at the end of {output_path}.")
+            f.truncate(complete)
+    for line in data[:complete].splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if record.get("status") == "ok":
+            done[record["document"]] = record.get("sha256")
+        else:
+            done.pop(record.get("document"), None)
+    return done
+
+def _init_worker(orchestrator_kwargs, use_local_backend, verbose):
+    global _orchestrator
+    from main_orchestrator import MainOrchestrator
+    kwargs = dict(orchestrator_kwargs)
+    if use_local_backend:
+        from local_backend import LocalSnowflakeBackend
+        kwargs["execution_connector"] = LocalSnowflakeBackend()
+    with contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+        _orchestrator = MainOrchestrator(**kwargs)
+
+def _process_document(path, sha256, verbose):
+    """
+    Runs the pipeline on one document inside a worker process and returns (json_line, document_metrics).
+    """
+    metrics.reset() # Counters in the record cover this document only
+    started = time.perf_counter()
+    record = {"document": path, "sha256": sha256, "worker_pid": os.getpid()}
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            text = f.read()
+        with contextlib.redirect_stdout(sys.stdout if verbose else io.StringIO()):
+            results = _orchestrator.process_requirements_to_sql_results(text)
+        record["status"] = "ok" if results["sql_execution_results"] else "failed"
+        record["results"] = results
+        stage_seconds = dict(_orchestrator.last_stage_seconds)
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+        results, stage_seconds = None, {}
+    record["elapsed_seconds"] = time.perf_counter() - started
+    record["stage_seconds"] = stage_seconds
+    record["counters"] = flat_counters(metrics.report()["counters"])
+    document_metrics = {
+        "status": record["status"],
+        "elapsed_seconds": record["elapsed_seconds"],
+        "stage_seconds": stage_seconds,
+        "queries": len(results["sql_execution_results"] or {}) if results else 0,
+        "counters": record["counters"],
+    }
+    return json.dumps(record, default=_json_default), document_metrics
+
+def flat_counters(counters):
+    """
+    Flattens a metrics report's counters into {"name{label=value,...}": value}.
+    """
+    flat = {}
+    for name, series in counters.items():
+        for entry in series:
+            labels = ",".join(f"{k}={v}" for k, v in sorted(entry["labels"].items()))
+            flat[f"{name}{{{labels}}}" if labels else name] = entry["value"]
+    return flat
+
+def percentile(values, q):
+    """
+    Nearest-rank percentile of a list of numbers (q in 0..100), or None for an empty list.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100)) # ceil(n * q / 100)
+    return ordered[min(int(rank), len(ordered)) - 1]
+
+def summarize(per_document, wall_seconds):
+    """
+    Aggregates per-document metrics into throughput and per-stage latency percentiles.
+    """
+    completed = sum(1 for m in per_document if m["status"] != "lost")
+    summary = {
+        "documents": len(per_document),
+        "ok": sum(1 for m in per_document if m["status"] == "ok"),
+        "failed": sum(1 for m in per_document if m["status"] != "ok"),
+        "lost": sum(1 for m in per_document if m["status"] == "lost"),
+        "queries": sum(m["queries"] for m in per_document),
+        "wall_seconds": wall_seconds,
+        "docs_per_minute": completed / wall_seconds * 60 if wall_seconds else 0.0,
+        "queries_per_second": sum(m["queries"] for m in per_document) / wall_seconds if wall_seconds else 0.0,
+        "stage_latency_seconds": {},
+        "counters": {},
+    }
+    for m in per_document:
+        for name, value in m.get("counters", {}).items():
+            summary["counters"][name] = summary["counters"].get(name, 0) + value
+    for stage in STAGES + ("total",):
+        values = [m["elapsed_seconds"] if stage == "total" else m["stage_seconds"].get(stage) for m in per_document
+                  if m["status"] != "lost"]
+        values = [v for v in values if v is not None]
+        if values:
+            summary["stage_latency_seconds"][stage] = {f"p{q}": percentile(values, q) for q in (50, 90, 99)}
+    return summary
+
+def run_batch(inputs, output_path, workers=None, patterns=DEFAULT_PATTERNS, resume=True, orchestrator_kwargs=None,
+              use_local_backend=False, verbose=False):
+    """
+    Processes every document found under `inputs` on a process pool, appending one JSONL record per
+    document to output_path as soon as it finishes. With resume=True, documents already recorded as
+    successful with unchanged content are skipped, so a crashed run continues where it stopped.
+
+    A document whose worker process dies is counted as "lost" (and failed) in the summary but gets no
+    record, so the next run retries it.
+
+    Returns:
+        dict: The run summary (see summarize()), or None if no documents were found.
+    """
+    documents = find_documents(inputs, patterns)
+    if not documents:
+        print(f"Error: No documents found for {inputs}.")
+        return None
+    done = load_checkpoint(output_path) if resume else {}
+    pending = []
+    for path in documents:
+        with open(path, "rb") as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+        if done.get(path) != sha256:
+            pending.append((path, sha256))
+    print(f"Batch: {len(documents)} documents found, {len(documents) - len(pending)} already done, {len(pending)} to process.")
+    if not pending:
+        return summarize([], 0.0)
+
+    workers = max(1, int(workers or os.cpu_count() or 1))
+    per_document = []
+    started = time.perf_counter()
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(orchestrator_kwargs or {}, use_local_backend, verbose)) as pool:
+        futures = {pool.submit(_process_document, path, sha256, verbose): path for path, sha256 in pending}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                line, document_metrics = future.result()
+            except Exception as e: # The worker process died; the document is retried on the next run
+                print(f"Error: Worker failed on {path}: {e!r}")
+                per_document.append({"status": "lost", "elapsed_seconds": None, "stage_seconds": {}, "queries": 0,
+                                     "counters": {}})
+                continue
+            out.write(line + "\n")
+            out.flush()
+            os.fsync(out.fileno()) # The output file is the checkpoint
+            per_document.append(document_metrics)
+            print(f"[{len(per_document)}/{len(pending)}] {document_metrics['status']:6} {document_metrics['elapsed_seconds']:.2f}s "
+                  f"{document_metrics['queries']} queries  {path}")
+    summary = summarize(per_document, time.perf_counter() - started)
+    print_summary(summary)
+    return summary
+
+def print_summary(summary):
+    lost = f", {summary['lost']} lost to worker crashes" if summary.get("lost") else ""
+    print(f"\nProcessed {summary['documents']} documents ({summary['ok']} ok, {summary['failed']} failed{lost}) "
+          f"in {summary['wall_seconds']:.1f}s: {summary['docs_per_minute']:.1f} docs/min, "
+          f"{summary['queries_per_second']:.2f} queries/s")
+    print(f"{'stage':<12}{'p50':>10}{'p90':>10}{'p99':>10}")
+    for stage, values in summary["stage_latency_seconds"].items():
+        print(f"{stage:<12}" + "".join(f"{values[q]:>9.3f}s" for q in ("p50", "p90", "p99")))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the requirements-to-SQL pipeline over many documents.")
+    parser.add_argument("inputs", nargs="+", help="Directories and/or glob patterns of requirements documents.")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl", help="JSONL output file, also used as the checkpoint.")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--pattern", action="append", dest="patterns", help="File pattern inside directories (default: *.txt, *.md).")
+    parser.add_argument("--no-resume", action="store_true", help="Start over instead of skipping completed documents.")
+    parser.add_argument("--semantic-model", default="semantic_model.yaml", help="Path to the semantic model YAML.")
+    parser.add_argument("--connection-params", default=None, help="Snowflake connection parameters as JSON.")
+    parser.add_argument("--local-backend", action="store_true", help="Execute against the embedded local sample database.")
+    parser.add_argument("--no-validate", action="store_true", help="Skip offline SQL validation.")
+    parser.add_argument("--chunk-token-budget", type=int, default=None, help="Analyze larger documents in chunks.")
+    parser.add_argument("--llm-batch-size", type=int, default=None, help="Send up to this many prompts per Cortex round trip.")
+    parser.add_argument("--checkpoint-db", default=None, help="SQLite file of stage checkpoints; reruns skip completed LLM calls and queries.")
+    parser.add_argument("--query-budget-bytes", type=int, default=None, help="Estimated bytes Agent 3 may process per document.")
+    parser.add_argument("--query-budget-credits", type=float, default=None, help="Warehouse credits Agent 3 may use per document.")
+    parser.add_argument("--over-budget", choices=("defer", "sample"), default="defer",
+                        help="Defer queries over the budget, or run them on a table sample where possible.")
+    parser.add_argument("--summary-json", default=None, help="Also write the run summary to this JSON file.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show the agents' own output.")
+    args = parser.parse_args(argv)
+
+    orchestrator_kwargs = {
+        "conceptual_snowflake_connection_params": json.loads(args.connection_params) if args.connection_params else None,
+        "conceptual_semantic_model_path": args.semantic_model,
+        "validate_sql": not args.no_validate,
+        "chunk_token_budget": args.chunk_token_budget,
+        "llm_batch_size": args.llm_batch_size,
+        "checkpoint_path": args.checkpoint_db,
+        "query_budget_bytes": args.query_budget_bytes,
+        "query_budget_credits": args.query_budget_credits,
+        "over_budget": args.over_budget,
+    }
+    summary = run_batch(args.inputs, args.output, workers=args.workers, patterns=tuple(args.patterns or DEFAULT_PATTERNS),
+                        resume=not args.no_resume, orchestrator_kwargs=orchestrator_kwargs,
+                        use_local_backend=args.local_backend, verbose=args.verbose)
+    if summary and args.summary_json:
+        with open(args.summary_json, "w") as f:
+            json.dump(summary, f, indent=2)
+    return 0 if summary is not None and summary["failed"] == 0 else 1
+
+# --- Example Usage ---
+# python batch_runner.py specs/ "archive/**/*.md" -o nightly.jsonl --workers 8 --local-backend
+if __name__ == "__main__":
+    sys.exit(main())
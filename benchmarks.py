@@ -0,0 +1,370 @@
+# benchmarks.py
+
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+import yaml
+from agent1_requirements_analyzer import Agent1RequirementsAnalyzer
+from agent2_sql_generator import Agent2SQLGenerator
+from agent3_sql_executor import Agent3SQLExecutor
+from instrumentation import metrics
+from main_orchestrator import MainOrchestrator
+from semantic_model import compile_semantic_model
+from snowflake_stand_in import StandInConnector
+from sql_validator import SQLValidator
+
+RESULTS_FORMAT_VERSION = 1
+SCALE_PRESETS = {
+    "smoke": [(10, 10)],
+    "default": [(10, 10), (100, 100), (1000, 500)],
+    "full": [(10, 10), (100, 100), (1000, 500), (5000, 1000)],
+}
+BENCHMARKS = ("semantic_model_compile", "agent1_analyze", "agent2_generate", "sql_validation", "agent3_execute", "pipeline")
+
+_NOUNS = ("policy", "claim", "payment", "invoice", "vehicle", "property", "coverage", "agent", "broker", "reserve",
+          "endorsement", "premium", "deductible", "adjuster", "customer", "renewal", "quote", "audit", "asset", "loss")
+_CHECKS = (
+    "Verify that every {table} record references an existing {parent}.",
+    "Check that {table} amounts are never negative.",
+    "Ensure each {table} has a status of Open or Closed.",
+    "Validate that the total {table} amount per {parent} matches the reported figure.",
+    "Check that {table} records are updated after they are created.",
+)
+_ENTITY = re.compile(r"\bEntity\d{4,5}\b")
+# Same libyaml-backed loader the semantic model module uses when available.
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+_YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+# --- Synthetic inputs ---
+
+def synthetic_semantic_model(num_tables, seed=0):
+    """
+    Returns the parsed YAML document of a semantic model with num_tables tables. Every table after the
+    first has a foreign key to an earlier one, so the relationship graph is connected.
+    """
+    rng = random.Random(seed)
+    tables = []
+    for i in range(num_tables):
+        name = f"Entity{i:04d}"
+        columns = [
+            {"name": f"{name}ID", "data_type": "NUMBER", "is_primary_key": True},
+            {"name": "Name", "data_type": "VARCHAR"},
+            {"name": "Status", "data_type": "VARCHAR"},
+            {"name": "Amount", "data_type": "DECIMAL"},
+            {"name": "CreatedDate", "data_type": "TIMESTAMP_NTZ"},
+            {"name": "LastUpdatedDate", "data_type": "TIMESTAMP_NTZ"},
+        ]
+        if i:
+            parent = f"Entity{rng.randrange(i):04d}"
+            columns.append({"name": f"{parent}ID", "data_type": "NUMBER", "is_foreign_key": True,
+                            "references": f"{parent}.{parent}ID"})
+        tables.append({"name": name, "synonyms": [f"{rng.choice(_NOUNS)} {i}"], "columns": columns})
+    return {"version": 1, "semantic_model": {"name": f"Synthetic{num_tables}", "description": "Benchmark model.", "tables": tables}}
+
+def synthetic_setup_sql(raw_model, rows_per_table=20, seed=0):
+    """
+    Returns a SQLite script creating the model's tables with rows_per_table deterministic rows each.
+    """
+    rng = random.Random(seed)
+    statements = []
+    for table in raw_model["semantic_model"]["tables"]:
+        names = [c["name"] for c in table["columns"]]
+        statements.append(f"CREATE TABLE {table['name']} ({', '.join(names)});")
+        rows = []
+        for row_id in range(1, rows_per_table + 1):
+            values = [str(row_id), f"'{table['name']} {row_id}'", f"'{rng.choice(('Open', 'Closed'))}'",
+                      f"{rng.uniform(-5, 1000):.2f}", "'2024-01-01 00:00:00'", "'2024-06-01 00:00:00'"]
+            if len(names) > 6:
+                values.append(str(rng.randint(1, rows_per_table)))
+            rows.append(f"({', '.join(values)})")
+        statements.append(f"INSERT INTO {table['name']} VALUES {', '.join(rows)};")
+    return "\n".join(statements)
+
+def synthetic_requirements(raw_model, num_use_cases, seed=0, section_size=20):
+    """
+    Returns a requirements document with num_use_cases requirement lines grouped under numbered headings.
+    About one in ten requirements re-words an earlier one, as real documents do.
+    """
+    rng = random.Random(seed)
+    tables = raw_model["semantic_model"]["tables"]
+    lines = ["Synthetic Requirements Specification", ""]
+    written = []
+    for i in range(num_use_cases):
+        if i % section_size == 0:
+            lines += ["", f"{i // section_size + 1}. Module {i // section_size + 1}"]
+        if written and rng.random() < 0.1:
+            earlier = rng.choice(written)
+            requirement = "In addition, " + earlier[0].lower() + earlier[1:]
+        else:
+            table = tables[rng.randrange(len(tables))]
+            parent = table["columns"][-1]["name"][:-2] if len(table["columns"]) > 6 else table["name"]
+            requirement = rng.choice(_CHECKS).format(table=table["name"], parent=parent)
+        written.append(requirement)
+        lines.append(f"- {requirement}")
+    return "\n".join(lines) + "\n"
+
+# --- Deterministic stand-ins ---
+
+class StandInAgent1(Agent1RequirementsAnalyzer):
+    """
+    Agent 1 whose Cortex COMPLETE call returns the document's requirement lines after a fixed latency.
+    """
+
+    def __init__(self, latency_seconds=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.latency_seconds = latency_seconds
+
+    def _call_snowflake_cortex_llm(self, prompt):
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return self._response(prompt)
+
+    def _call_snowflake_cortex_llm_batch(self, prompts):
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds) # One round trip per batch
+        return [self._response(prompt) for prompt in prompts]
+
+    @staticmethod
+    def _response(prompt):
+        return json.dumps([line[2:].strip() for line in prompt.splitlines() if line.startswith("- ")])
+
+class StandInAgent2(Agent2SQLGenerator):
+    """
+    Agent 2 whose Cortex Analyst call returns valid SQL against the table the use case names.
+    """
+
+    def _simulated_cortex_response(self, payload):
+        text = payload["messages"][0]["content"][0]["text"]
+        names = _ENTITY.findall(text)
+        if not names:
+            return "-- Placeholder: No specific SQL generated for this generic simulation step."
+        table = names[0]
+        if "negative" in text:
+            return f"SELECT {table}ID, Amount FROM {table} WHERE Amount < 0"
+        if "status" in text:
+            return f"SELECT Status, COUNT(*) AS Records FROM {table} GROUP BY Status"
+        if len(names) > 1 and names[1] != table:
+            parent = names[1]
+            return (f"SELECT c.{table}ID FROM {table} c LEFT JOIN {parent} p ON c.{parent}ID = p.{parent}ID "
+                    f"WHERE p.{parent}ID IS NULL")
+        return f"SELECT COUNT(*) AS Records, MAX(LastUpdatedDate) AS LastUpdate FROM {table} WHERE LastUpdatedDate >= CreatedDate"
+
+class BenchmarkCase:
+    """
+    Synthetic inputs for one (tables, use cases) scale, written to a temporary directory.
+    """
+
+    def __init__(self, num_tables, num_use_cases, seed, directory):
+        self.num_tables = num_tables
+        self.num_use_cases = num_use_cases
+        self.raw_model = synthetic_semantic_model(num_tables, seed)
+        self.model_yaml = yaml.dump(self.raw_model, Dumper=_YAML_DUMPER, sort_keys=False)
+        self.model_path = os.path.join(directory, f"semantic_model_{num_tables}_{seed}.yaml")
+        with open(self.model_path, "w") as f:
+            f.write(self.model_yaml)
+        self.setup_sql = synthetic_setup_sql(self.raw_model, seed=seed)
+        self.document = synthetic_requirements(self.raw_model, num_use_cases, seed)
+        self.use_cases = [line[2:] for line in self.document.splitlines() if line.startswith("- ")]
+
+# --- Measurement ---
+
+def measure(func, calls, trace_memory=True):
+    """
+    Runs func() once and returns {"wall_seconds", "peak_memory_bytes", "calls", "calls_per_second"}.
+    calls is a number, or a callable returning the number of calls made (read after the run).
+    """
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        wall_seconds = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+    calls = calls() if callable(calls) else calls
+    return {
+        "wall_seconds": wall_seconds,
+        "peak_memory_bytes": peak,
+        "calls": calls,
+        "calls_per_second": calls / wall_seconds if wall_seconds else None,
+    }
+
+def run_case(case, llm_latency, query_latency, concurrency, chunk_token_budget, benchmarks=BENCHMARKS, trace_memory=True,
+             llm_batch_size=None, async_queries=False):
+    """
+    Runs the selected benchmarks on one BenchmarkCase. Returns a list of result dicts.
+    """
+    results = []
+
+    def record(name, outcome):
+        outcome.update({"benchmark": name, "tables": case.num_tables, "use_cases": case.num_use_cases})
+        results.append(outcome)
+        peak = outcome["peak_memory_bytes"]
+        memory = f"{peak / 1e6:>8.1f} MB" if peak is not None else f"{'n/a':>11}"
+        print(f"  {name:<24} {outcome['wall_seconds']:>9.3f}s  {memory}  {outcome['calls_per_second'] or 0:>10.1f} calls/s")
+
+    def llm_calls(agent):
+        return lambda: metrics.counter_value("llm_calls", agent=agent) + metrics.counter_value("llm_cache_hits", agent=agent)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        agent1 = StandInAgent1(latency_seconds=llm_latency, chunk_token_budget=chunk_token_budget, max_concurrency=concurrency,
+                               batch_size=llm_batch_size)
+        # Templates off: agent2_generate measures the Cortex call path, not template hit rates.
+        agent2 = StandInAgent2(semantic_model_path=case.model_path, max_concurrency=concurrency,
+                               simulated_latency_seconds=llm_latency, sql_templates_path=None, batch_size=llm_batch_size)
+        connector = StandInConnector(setup_sql=case.setup_sql, query_latency_seconds=query_latency)
+        agent3 = Agent3SQLExecutor(snowflake_connection_params={"account": "BENCHMARK"}, connector=connector,
+                                   max_workers=concurrency, async_execution=async_queries)
+        model = agent2.semantic_model
+
+    if "semantic_model_compile" in benchmarks:
+        record("semantic_model_compile", measure(lambda: compile_semantic_model(yaml.load(case.model_yaml, Loader=_YAML_LOADER)),
+                                                   1, trace_memory))
+    if "agent1_analyze" in benchmarks:
+        metrics.reset()
+        record("agent1_analyze", measure(lambda: agent1.analyze_requirements(case.document), llm_calls("agent1"), trace_memory))
+    with contextlib.redirect_stdout(io.StringIO()):
+        sql_queries = [sql for sql in agent2._generate_sql_for_use_cases(case.use_cases) if agent2.is_specific_sql(sql)]
+    if "agent2_generate" in benchmarks:
+        metrics.reset()
+        record("agent2_generate", measure(lambda: agent2._generate_sql_for_use_cases(case.use_cases), llm_calls("agent2"), trace_memory))
+    if "sql_validation" in benchmarks:
+        validator = SQLValidator(model)
+        record("sql_validation", measure(lambda: validator.validate_queries(sql_queries), len(sql_queries), trace_memory))
+    if "agent3_execute" in benchmarks:
+        record("agent3_execute", measure(lambda: agent3.execute_sql_queries(sql_queries), len(set(sql_queries)), trace_memory))
+    if "pipeline" in benchmarks:
+        with contextlib.redirect_stdout(io.StringIO()):
+            orchestrator = MainOrchestrator(conceptual_semantic_model_path=case.model_path, execution_connector=connector,
+                                            chunk_token_budget=chunk_token_budget)
+            orchestrator.agent1, orchestrator.agent2, orchestrator.agent3 = agent1, agent2, agent3
+        metrics.reset()
+        record("pipeline", measure(lambda: orchestrator.process_requirements_to_sql_results(case.document),
+                                   lambda: metrics.counter_value("llm_calls", agent="agent1") +
+                                           metrics.counter_value("llm_calls", agent="agent2") +
+                                           metrics.counter_value("queries_executed", agent="agent3"),
+                                   trace_memory))
+    connector_queries = connector.queries_executed
+    for result in results:
+        result["connector_queries_total"] = connector_queries
+    return results
+
+def compare_to_baseline(results, baseline, tolerance=0.25, metrics_to_compare=("wall_seconds", "peak_memory_bytes"),
+                        min_wall_seconds=0.01):
+    """
+    Compares results with a baseline results file. A metric regresses when it is more than `tolerance`
+    (a fraction) above the baseline value. Wall times below min_wall_seconds in both runs are too noisy
+    to flag.
+
+    Returns:
+        list: One dict per compared metric: benchmark, tables, use_cases, metric, baseline, current, change, regression.
+    """
+    def key(r):
+        return (r["benchmark"], r["tables"], r["use_cases"])
+    previous = {key(r): r for r in baseline.get("results", [])}
+    comparisons = []
+    for result in results:
+        before = previous.get(key(result))
+        if before is None:
+            continue
+        for metric in metrics_to_compare:
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            noisy = metric == "wall_seconds" and max(old, new) < min_wall_seconds
+            comparisons.append({"benchmark": result["benchmark"], "tables": result["tables"], "use_cases": result["use_cases"],
+                                "metric": metric, "baseline": old, "current": new, "change": change,
+                                "regression": change > tolerance and not noisy})
+    return comparisons
+
+def parse_scales(text):
+    """
+    Parses "smoke", "default", "full" or a list like "10x10,100x200" (tables x use cases).
+    """
+    if text in SCALE_PRESETS:
+        return SCALE_PRESETS[text]
+    scales = []
+    for item in text.split(","):
+        tables, use_cases = item.lower().split("x")
+        scales.append((int(tables), int(use_cases)))
+    return scales
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the agent pipeline on synthetic inputs.")
+    parser.add_argument("--scales", default="default", help="Preset (smoke, default, full) or e.g. 10x10,100x200 (tables x use cases).")
+    parser.add_argument("--benchmarks", default=",".join(BENCHMARKS), help="Comma-separated subset of: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Injected latency per Cortex call (seconds).")
+    parser.add_argument("--query-latency", type=float, default=0.0, help="Injected latency per Snowflake query (seconds).")
+    parser.add_argument("--concurrency", type=int, default=1, help="Concurrent Cortex calls and query workers.")
+    parser.add_argument("--chunk-token-budget", type=int, default=3000, help="Agent 1 map-reduce chunk size (tokens).")
+    parser.add_argument("--llm-batch-size", type=int, default=None, help="Prompts per batched Cortex round trip (default: unbatched).")
+    parser.add_argument("--async-queries", action="store_true", help="Submit Agent 3 queries asynchronously and poll their query IDs.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc (it slows the measured code).")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="Machine-readable results file.")
+    parser.add_argument("--baseline", default=None, help="Results file to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown/growth before a regression is reported.")
+    args = parser.parse_args(argv)
+
+    benchmarks = tuple(b.strip() for b in args.benchmarks.split(",") if b.strip())
+    unknown = set(benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+    results = []
+    with tempfile.TemporaryDirectory(prefix="pipeline_benchmarks_") as directory:
+        for num_tables, num_use_cases in parse_scales(args.scales):
+            print(f"\n{num_tables} tables, {num_use_cases} use cases:")
+            case = BenchmarkCase(num_tables, num_use_cases, args.seed, directory)
+            results += run_case(case, args.llm_latency, args.query_latency, args.concurrency, args.chunk_token_budget,
+                                benchmarks, trace_memory=not args.no_memory, llm_batch_size=args.llm_batch_size,
+                                async_queries=args.async_queries)
+
+    report = {
+        "format_version": RESULTS_FORMAT_VERSION,
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count()},
+        "settings": {"scales": parse_scales(args.scales), "llm_latency": args.llm_latency, "query_latency": args.query_latency,
+                     "concurrency": args.concurrency, "chunk_token_budget": args.chunk_token_budget, "seed": args.seed,
+                     "llm_batch_size": args.llm_batch_size, "async_queries": args.async_queries, "trace_memory": not args.no_memory},
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        changed = {k: (baseline.get("settings", {}).get(k), v) for k, v in report["settings"].items()
+                   if k != "scales" and baseline.get("settings", {}).get(k) != v}
+        if changed:
+            print(f"Warning: Settings differ from the baseline, comparisons may not be meaningful: {changed}")
+        comparisons = compare_to_baseline(results, baseline, args.tolerance)
+        regressions = [c for c in comparisons if c["regression"]]
+        for c in comparisons:
+            flag = "REGRESSION" if c["regression"] else ""
+            print(f"{c['benchmark']:<24} {c['tables']:>5}x{c['use_cases']:<5} {c['metric']:<18} "
+                  f"{c['baseline']:>14.4f} -> {c['current']:>14.4f} ({c['change']:+.1%}) {flag}")
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%} against {args.baseline}.")
+        return 1 if regressions else 0
+    return 0
+
+# --- Example Usage ---
+# python benchmarks.py --scales smoke -o baseline.json
+# python benchmarks.py --scales smoke --baseline baseline.json
+if __name__ == "__main__":
+    sys.exit(main())
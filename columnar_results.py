@@ -0,0 +1,241 @@
+# columnar_results.py
+
+import base64
+import datetime
+import decimal
+import json
+import sys
+from array import array
+from collections.abc import Sequence
+
+_INT_MIN, _INT_MAX = -(1 << 63), (1 << 63) - 1
+
+class _ColumnBuilder:
+    """
+    One column of a ColumnarResult. Starts untyped and settles on the narrowest storage for the
+    values seen: a typed array ('q' for integers, 'd' for floats) plus a null mask, or a plain
+    list for anything else (strings, decimals, timestamps, mixed types).
+    """
+    __slots__ = ("kind", "values", "nulls")
+
+    def __init__(self):
+        self.kind = None # None (no non-null value yet), "q", "d" or "object"
+        self.values = []
+        self.nulls = bytearray()
+
+    @staticmethod
+    def _kind_of(value):
+        if isinstance(value, bool):
+            return "object"
+        if isinstance(value, int):
+            return "q" if _INT_MIN <= value <= _INT_MAX else "object"
+        if isinstance(value, float):
+            return "d"
+        return "object"
+
+    def _promote(self, kind):
+        values = [None if self.nulls[i] else v for i, v in enumerate(self.values)] if self.kind in ("q", "d") else list(self.values)
+        if kind == "object":
+            self.values = values
+        else:
+            self.values = array(kind, (0 if v is None else v for v in values))
+        self.kind = kind
+
+    def append(self, value):
+        if value is None:
+            self.nulls.append(1)
+            self.values.append(0 if self.kind in ("q", "d") else None)
+            return
+        kind = self._kind_of(value)
+        if kind != self.kind:
+            if self.kind is None:
+                self._promote(kind)
+            elif {self.kind, kind} == {"q", "d"}:
+                if self.kind == "q":
+                    self._promote("d") # Integers and floats mix as floats
+            elif self.kind != "object":
+                self._promote("object")
+        self.nulls.append(0)
+        self.values.append(value if self.kind != "d" else float(value))
+
+    def get(self, index):
+        if self.nulls[index]:
+            return None
+        value = self.values[index]
+        return int(value) if self.kind == "q" else value
+
+    def to_list(self):
+        if self.kind in ("q", "d"):
+            return [None if null else v for v, null in zip(self.values, self.nulls)]
+        return list(self.values)
+
+    @property
+    def nbytes(self):
+        if self.kind in ("q", "d"):
+            return self.values.itemsize * len(self.values) + len(self.nulls)
+        return sys.getsizeof(self.values) + sum(sys.getsizeof(v) for v in self.values if v is not None) + len(self.nulls)
+
+class ColumnarResult(Sequence):
+    """
+    A query result held column by column in array-backed buffers.
+
+    It still behaves as a read-only sequence of rows (len(), indexing, iteration and equality with a
+    list of lists), so code that consumed Agent 3's former list-of-lists keeps working, while
+    column access (column(), to_pydict(), to_arrow()) needs no transposition.
+    """
+
+    def __init__(self, headers, truncated=False):
+        self.headers = list(headers)
+        self.truncated = truncated # True when the source had more rows than were kept
+        self._columns = [_ColumnBuilder() for _ in self.headers]
+        self._num_rows = 0
+
+    @classmethod
+    def from_rows(cls, headers, rows, max_rows=None):
+        result = cls(headers)
+        result.append_rows(rows, max_rows=max_rows)
+        return result
+
+    def append_arrow(self, batch, max_rows=None):
+        """
+        Appends a pyarrow Table or RecordBatch whose columns match the headers, e.g. one batch from
+        the Snowflake connector's cursor.fetch_arrow_batches(). Returns the number of rows appended.
+        """
+        take = batch.num_rows
+        if max_rows is not None and self._num_rows + take > max_rows:
+            take = max(max_rows - self._num_rows, 0)
+            self.truncated = True
+        for builder, column in zip(self._columns, batch.columns):
+            for value in column.slice(0, take).to_pylist():
+                builder.append(value)
+        self._num_rows += take
+        return take
+
+    def append_rows(self, rows, max_rows=None):
+        """
+        Appends a batch of row tuples. With max_rows, rows beyond the cap are dropped and `truncated` is set.
+        Returns the number of rows appended.
+        """
+        appended = 0
+        width = len(self._columns)
+        for row in rows:
+            if max_rows is not None and self._num_rows >= max_rows:
+                self.truncated = True
+                break
+            for i in range(width):
+                self._columns[i].append(row[i])
+            self._num_rows += 1
+            appended += 1
+        return appended
+
+    def __len__(self):
+        return self._num_rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._num_rows))]
+        if index < 0:
+            index += self._num_rows
+        if not 0 <= index < self._num_rows:
+            raise IndexError("row index out of range")
+        return [column.get(index) for column in self._columns]
+
+    def __eq__(self, other):
+        if isinstance(other, ColumnarResult):
+            return self.headers == other.headers and self.to_rows() == other.to_rows()
+        if isinstance(other, Sequence) and not isinstance(other, (str, bytes)):
+            return self.to_rows() == [list(row) for row in other]
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"ColumnarResult({self.headers}, {self._num_rows} rows{', truncated' if self.truncated else ''})"
+
+    def column(self, key):
+        """
+        Returns one column's values (None for nulls) by header name or position.
+        """
+        index = self.headers.index(key) if isinstance(key, str) else key
+        return self._columns[index].to_list()
+
+    def column_types(self):
+        """
+        Returns {header: "int64" | "float64" | "object" | "null"} describing each column's storage.
+        """
+        names = {"q": "int64", "d": "float64", "object": "object", None: "null"}
+        return {h: names[c.kind] for h, c in zip(self.headers, self._columns)}
+
+    def to_rows(self):
+        columns = [c.to_list() for c in self._columns]
+        return [list(row) for row in zip(*columns)] if columns else [[] for _ in range(self._num_rows)]
+
+    def to_pydict(self):
+        return {h: c.to_list() for h, c in zip(self.headers, self._columns)}
+
+    def to_arrow(self):
+        """
+        Returns the result as a pyarrow Table. Requires the optional pyarrow package.
+        """
+        try:
+            import pyarrow
+        except ImportError as e:
+            raise ImportError("ColumnarResult.to_arrow() requires pyarrow (pip install pyarrow).") from e
+        return pyarrow.table(self.to_pydict())
+
+    @property
+    def nbytes(self):
+        """
+        Approximate memory held by the column buffers.
+        """
+        return sum(c.nbytes for c in self._columns)
+
+def _encode_json(value):
+    if isinstance(value, ColumnarResult):
+        return {"__type__": "columnar", "headers": value.headers, "rows": value.to_rows(), "truncated": value.truncated}
+    if isinstance(value, decimal.Decimal):
+        return {"__type__": "decimal", "value": str(value)}
+    if isinstance(value, datetime.datetime): # Before date: datetime is a date subclass
+        return {"__type__": "datetime", "value": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"__type__": "date", "value": value.isoformat()}
+    if isinstance(value, datetime.time):
+        return {"__type__": "time", "value": value.isoformat()}
+    if isinstance(value, (bytes, bytearray)):
+        return {"__type__": "bytes", "value": base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"{type(value).__name__} values cannot be stored as JSON")
+
+def _decode_json(obj):
+    kind = obj.get("__type__")
+    if kind is None:
+        return obj
+    if kind == "columnar":
+        result = ColumnarResult.from_rows(obj["headers"], obj["rows"])
+        result.truncated = obj["truncated"]
+        return result
+    decoders = {"decimal": decimal.Decimal, "datetime": datetime.datetime.fromisoformat, "date": datetime.date.fromisoformat,
+                "time": datetime.time.fromisoformat, "bytes": base64.b64decode}
+    return decoders[kind](obj["value"])
+
+def to_json(value):
+    """
+    Serializes query output (ColumnarResult, lists, dicts and the Decimal, date/time and bytes values
+    drivers return) to JSON text for the on-disk caches. Tuples come back as lists.
+    """
+    return json.dumps(value, default=_encode_json, separators=(",", ":"))
+
+def from_json(text):
+    """
+    Reverses to_json(). Raises ValueError (or KeyError/TypeError) for text that is not its output.
+    """
+    return json.loads(text, object_hook=_decode_json)
+
+# --- Example Usage ---
+if __name__ == "__main__":
+    headers = ["ClaimID", "PaymentAmount", "Payments", "Status"]
+    rows = [(f"CLM{i:08d}", i * 12.5, i, None if i % 3 else "Open") for i in range(1000)]
+    result = ColumnarResult.from_rows(headers, rows, max_rows=100)
+    print(result, result.column_types())
+    print(f"First row: {result[0]}, last row: {result[-1]}, equals list of lists: {result == [list(r) for r in rows[:100]]}")
+    list_bytes = sum(sys.getsizeof(list(r)) + sum(sys.getsizeof(v) for v in r) for r in rows[:100])
+    print(f"Column buffers: ~{result.nbytes} bytes vs ~{list_bytes} bytes as a list of lists")
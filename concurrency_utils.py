@@ -0,0 +1,169 @@
+# concurrency_utils.py
+
+import collections
+import threading
+import time
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+
+class RateLimiter:
+    """
+    Thread-safe limiter that spaces calls so that no more than `requests_per_second`
+    calls are started per second. A value of None (or <= 0) disables limiting.
+    """
+
+    def __init__(self, requests_per_second=None):
+        self.requests_per_second = requests_per_second
+        self._interval = 1.0 / requests_per_second if requests_per_second and requests_per_second > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Blocks until the caller may start its call.
+        """
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+def _start_call(func, *args):
+    """
+    Runs func(*args) on a new daemon thread and returns a Future for its result. A call abandoned after
+    a timeout keeps only its own thread, and does not keep the interpreter from exiting.
+    """
+    future = Future()
+
+    def _run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = func(*args)
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    threading.Thread(target=_run, daemon=True).start()
+    return future
+
+def iter_completed(func, items, max_workers=1, requests_per_second=None, timeout_seconds=None, default=None,
+                   label="Task", max_in_flight=None):
+    """
+    Applies `func` to every item on worker threads and yields (index, result) as calls complete.
+
+    Calls are submitted lazily: at most `max_in_flight` (default max_workers) calls are outstanding
+    at a time, so a consumer that stops pulling results also stops new calls from starting.
+    A call that times out cannot be interrupted: `default` is yielded for it, but its thread keeps its
+    worker slot until the call returns, so no more than max_workers calls ever run at once. If every
+    worker is held by timed-out calls for another timeout_seconds (e.g. the service hangs), the items
+    not yet started are skipped and yield `default` instead of piling up more stuck threads.
+
+    Args:
+        func (callable): Function called with a single item.
+        items (iterable): Inputs to process.
+        max_workers (int): Maximum number of calls in flight at once.
+        requests_per_second (float): Optional cap on how many calls are started per second.
+        timeout_seconds (float): Optional per-call timeout, measured from when the call starts
+                                 (time spent waiting on the rate limiter is not counted).
+        default: Value yielded for calls that raise or time out.
+        label (str): Name used in warning messages.
+        max_in_flight (int): Maximum number of submitted calls whose results have not been yielded yet.
+
+    Yields:
+        tuple: (index of the item in `items`, result)
+    """
+    max_workers = max(1, int(max_workers or 1))
+    max_in_flight = max(max_workers, int(max_in_flight or max_workers))
+    item_iter = enumerate(items)
+    limiter = RateLimiter(requests_per_second)
+    started_at = {}
+
+    def _invoke(index, item):
+        limiter.acquire()
+        started_at[index] = time.monotonic()
+        return func(item)
+
+    pending = {} # Started calls whose results have not been yielded yet
+    abandoned = set() # Timed-out calls still running; each holds its worker slot until it returns
+    waiting = collections.deque() # Pulled items that have not been started yet
+    exhausted = False
+    stalled_since = None # When every worker became held by a timed-out call
+    poll_interval = min(0.05, timeout_seconds) if timeout_seconds else None
+    while True:
+        while not exhausted and len(pending) + len(waiting) < max_in_flight:
+            try:
+                waiting.append(next(item_iter))
+            except StopIteration:
+                exhausted = True
+        while waiting and len(pending) + len(abandoned) < max_workers:
+            index, item = waiting.popleft()
+            pending[_start_call(_invoke, index, item)] = index
+        if not pending:
+            if not waiting:
+                break
+            now = time.monotonic()
+            if stalled_since is None:
+                stalled_since = now
+            elif now - stalled_since > timeout_seconds:
+                skipped = list(waiting) + list(item_iter)
+                print(f"Warning: All {max_workers} workers are stuck on timed-out calls; skipping {len(skipped)} "
+                      f"remaining item(s) ({label} {', '.join(str(index) for index, _ in skipped)}).")
+                for index, _ in skipped:
+                    yield index, default
+                return
+        else:
+            stalled_since = None
+        done, _ = wait(list(pending) + list(abandoned), timeout=poll_interval, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future in abandoned:
+                abandoned.discard(future) # A timed-out call finally returned; its result is discarded
+                continue
+            index = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Warning: {label} {index} failed: {e}")
+                result = default
+            yield index, result
+        if timeout_seconds:
+            now = time.monotonic()
+            for future, index in list(pending.items()):
+                start = started_at.get(index)
+                if start is not None and now - start > timeout_seconds:
+                    # The worker thread cannot be interrupted; its eventual result is discarded.
+                    print(f"Warning: {label} {index} timed out after {timeout_seconds}s.")
+                    del pending[future]
+                    abandoned.add(future)
+                    yield index, default
+
+def run_ordered(func, items, max_workers=1, requests_per_second=None, timeout_seconds=None, default=None, label="Task"):
+    """
+    Applies `func` to every item on worker threads and returns the results in input order.
+
+    Args:
+        func (callable): Function called with a single item.
+        items (iterable): Inputs to process.
+        max_workers (int): Maximum number of calls in flight at once.
+        requests_per_second (float): Optional cap on how many calls are started per second.
+        timeout_seconds (float): Optional per-call timeout, measured from when the call starts
+                                 (time spent waiting on the rate limiter is not counted).
+        default: Value stored for calls that raise or time out.
+        label (str): Name used in warning messages.
+
+    Returns:
+        list: One result per input item, in the same order as `items`.
+    """
+    items = list(items)
+    results = [default] * len(items)
+    # Everything is submitted up front; results are only reordered.
+    for index, result in iter_completed(func, items, max_workers=max_workers, requests_per_second=requests_per_second,
+                                        timeout_seconds=timeout_seconds, default=default, label=label,
+                                        max_in_flight=len(items)):
+        results[index] = result
+    return results
+
@@ -0,0 +1,126 @@
+# connection_pool.py
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+class ConnectionPool:
+    """
+    A small thread-safe pool of DB-API connections (e.g. snowflake.connector connections).
+    Connections are opened lazily, up to `max_size`, and handed back to the pool after each use
+    so that connection setup and authentication are paid once rather than once per query.
+    """
+
+    def __init__(self, connector, connection_params, max_size=4):
+        """
+        Initializes the pool.
+        connector: A driver exposing connect(**connection_params), such as snowflake.connector.
+        connection_params (dict): Keyword arguments passed to connector.connect().
+        max_size (int): Maximum number of open connections.
+        """
+        self.connector = connector
+        self.connection_params = connection_params or {}
+        self.max_size = max(1, int(max_size or 1))
+        self._idle = [] # Most recently released last, so the warmest connection is reused first
+        self._condition = threading.Condition() # Guards _idle and _open_count; notified when either frees up
+        self._open_count = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+
+    def acquire(self, timeout=None):
+        """
+        Returns an idle connection, opening a new one if the pool is not yet full.
+        Blocks (up to `timeout` seconds) when every connection is in use, and raises queue.Empty
+        if none became available in time.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                while self._idle:
+                    connection = self._idle.pop()
+                    if self._is_closed(connection):
+                        # Closed while idle (e.g. a server-side session timeout): drop it and free its slot.
+                        self._open_count -= 1
+                        continue
+                    self.connections_reused += 1
+                    return connection
+                if self._open_count < self.max_size:
+                    self._open_count += 1
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise queue.Empty
+                self._condition.wait(remaining)
+
+        try:
+            connection = self.connector.connect(**self.connection_params)
+        except Exception:
+            with self._condition:
+                self._open_count -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self.connections_created += 1
+        return connection
+
+    def release(self, connection, discard=False):
+        """
+        Returns a connection to the pool. Closed or explicitly discarded connections are dropped,
+        which frees their slot for a caller waiting in acquire().
+        """
+        if discard or self._is_closed(connection):
+            self._close_quietly(connection)
+            with self._condition:
+                self._open_count -= 1
+                self._condition.notify()
+            return
+        with self._condition:
+            self._idle.append(connection)
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Context manager that acquires a connection and always hands it back.
+        """
+        connection = self.acquire(timeout=timeout)
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close_all(self):
+        """
+        Closes every idle connection. Connections currently checked out are closed when released.
+        """
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._open_count -= len(idle)
+            self._condition.notify_all()
+        for connection in idle:
+            self._close_quietly(connection)
+
+    def stats(self):
+        """
+        Returns pool usage counters.
+        """
+        with self._condition:
+            return {
+                "open_connections": self._open_count,
+                "idle_connections": len(self._idle),
+                "connections_created": self.connections_created,
+                "connections_reused": self.connections_reused,
+            }
+
+    @staticmethod
+    def _is_closed(connection):
+        is_closed = getattr(connection, "is_closed", None)
+        return callable(is_closed) and is_closed()
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception as e:
+            print(f"Warning: Error closing pooled connection: {e}")
@@ -0,0 +1,146 @@
+# cortex_batching.py
+
+from concurrency_utils import iter_completed
+from instrumentation import metrics
+
+def quote_sql_string(text):
+    """
+    Returns text as a Snowflake single-quoted string literal.
+    """
+    return "'" + text.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+def build_batch_complete_sql(model_name, prompts):
+    """
+    Builds one statement that completes every prompt: one VALUES row per prompt, tagged with its position
+    so the responses can be matched back to their prompts whatever order the rows come back in.
+    TRY_COMPLETE returns NULL for a prompt that fails instead of failing the whole statement.
+    """
+    rows = ",\n    ".join(f"({index}, {quote_sql_string(prompt)})" for index, prompt in enumerate(prompts))
+    return (f"SELECT batch.idx, SNOWFLAKE.CORTEX.TRY_COMPLETE({quote_sql_string(model_name)}, batch.prompt) AS response\n"
+            f"FROM VALUES\n    {rows}\nAS batch(idx, prompt)\nORDER BY batch.idx;")
+
+def demultiplex(rows, count):
+    """
+    Maps (idx, response) rows of a batched call back to prompt order. Prompts without a row, or whose
+    response is NULL, get None.
+    """
+    responses = [None] * count
+    for index, response in rows:
+        index = int(index)
+        if 0 <= index < count:
+            responses[index] = response
+    return responses
+
+class BatchCompleter:
+    """
+    Sends prompts to an LLM in batches of up to `batch_size` per round trip and retries only the prompts
+    whose responses came back missing or invalid.
+
+    `call_batch(prompts)` performs one round trip and returns one response per prompt (None for a prompt
+    that failed). If it raises, every prompt of that batch counts as failed.
+    """
+
+    def __init__(self, call_batch, batch_size=16, max_retries=2, max_concurrency=1, requests_per_second=None,
+                 timeout_seconds=None, is_valid=None, agent=None, label="Cortex batch call"):
+        """
+        call_batch (callable): One round trip for a list of prompts.
+        batch_size (int): Maximum prompts per round trip.
+        max_retries (int): How many times the failed prompts of a batch are resubmitted.
+        max_concurrency (int): Maximum number of batches in flight at once.
+        requests_per_second (float): Optional cap on how many round trips are started per second.
+        timeout_seconds (float): Optional timeout for a batch including its retries.
+        is_valid (callable): Optional check of a response; invalid responses are retried like missing ones.
+        agent (str): Label for the llm_batches / llm_batch_retries counters.
+        label (str): Name used in warning messages.
+        """
+        self.call_batch = call_batch
+        self.batch_size = max(1, int(batch_size or 1))
+        self.max_retries = max(0, int(max_retries or 0))
+        self.max_concurrency = max(1, int(max_concurrency or 1))
+        self.requests_per_second = requests_per_second
+        self.timeout_seconds = timeout_seconds
+        self.is_valid = is_valid
+        self.agent = agent
+        self.label = label
+
+    def _run_batch(self, prompts, indices):
+        """
+        Completes the prompts at `indices`, resubmitting failed ones. Returns {index: response} for the
+        prompts that succeeded.
+        """
+        responses = {}
+        todo = indices
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                print(f"Warning: Retrying {len(todo)} of {len(indices)} prompts of a {self.label} (attempt {attempt + 1}).")
+                metrics.incr("llm_batch_retries", len(todo), agent=self.agent)
+            metrics.incr("llm_batches", agent=self.agent)
+            try:
+                with metrics.span("llm_batch_call", agent=self.agent):
+                    results = self.call_batch([prompts[i] for i in todo])
+            except Exception as e:
+                print(f"Warning: {self.label} with {len(todo)} prompts failed: {e}")
+                results = None
+            if results is None or len(results) != len(todo):
+                results = [None] * len(todo)
+            failed = []
+            for index, response in zip(todo, results):
+                if response is None or (self.is_valid is not None and not self.is_valid(response)):
+                    failed.append(index)
+                else:
+                    responses[index] = response
+            todo = failed
+            if not todo:
+                break
+        return responses
+
+    def iter_complete(self, prompts):
+        """
+        Yields (index, response) for every prompt as its batch finishes; response is None for prompts that
+        still failed after max_retries.
+        """
+        prompts = list(prompts)
+        batches = [list(range(start, min(start + self.batch_size, len(prompts))))
+                   for start in range(0, len(prompts), self.batch_size)]
+        if len(batches) == 1 and not self.timeout_seconds:
+            completed = iter([(0, self._run_batch(prompts, batches[0]))])
+        else:
+            completed = iter_completed(lambda indices: self._run_batch(prompts, indices), batches,
+                                       max_workers=self.max_concurrency, requests_per_second=self.requests_per_second,
+                                       timeout_seconds=self.timeout_seconds, default={}, label=self.label)
+        for batch_index, responses in completed:
+            for index in batches[batch_index]:
+                yield index, responses.get(index)
+
+    def complete(self, prompts):
+        """
+        Returns one response (or None) per prompt, in prompt order.
+        """
+        prompts = list(prompts)
+        responses = [None] * len(prompts)
+        for index, response in self.iter_complete(prompts):
+            responses[index] = response
+        return responses
+
+# --- Example Usage ---
+if __name__ == "__main__":
+    import random
+    import time
+    random.seed(7)
+    round_trips = []
+
+    def flaky_batch(prompts):
+        # One round trip; roughly one prompt in five comes back NULL.
+        round_trips.append(len(prompts))
+        time.sleep(0.05)
+        rows = [(i, None if random.random() < 0.2 else f"answer to {p}") for i, p in enumerate(prompts)]
+        random.shuffle(rows) # Row order is not guaranteed
+        return demultiplex(rows, len(prompts))
+
+    prompts = [f"prompt {i}" for i in range(40)]
+    print(build_batch_complete_sql("llama3.1-70b", prompts[:2]))
+    started = time.perf_counter()
+    responses = BatchCompleter(flaky_batch, batch_size=16, max_concurrency=3, agent="demo").complete(prompts)
+    print(f"{sum(r is not None for r in responses)}/{len(prompts)} answered in {len(round_trips)} round trips "
+          f"{round_trips} ({time.perf_counter() - started:.2f}s)")
+    assert all(r is None or r == f"answer to {p}" for p, r in zip(prompts, responses))
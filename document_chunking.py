@@ -0,0 +1,194 @@
+# document_chunking.py
+
+import hashlib
+import re
+from schema_pruning import estimate_tokens
+
+# Heading styles recognized in requirements documents.
+_MARKDOWN_HEADING = re.compile(r"^\s{0,3}(#{1,6})\s+(.+?)\s*#*\s*$")
+_NUMBERED_HEADING = re.compile(r"^\s*((?:\d+\.)+\d*|\d+\))\s+([A-Z][^.!?]{0,100})$")
+_UNDERLINE = re.compile(r"^\s*(=+|-+)\s*$")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+# With stable boundaries, about one section in ANCHOR_INTERVAL ends a chunk once it is a quarter full.
+ANCHOR_INTERVAL = 8
+
+class Section:
+    """
+    A titled part of a document. `lines` is the 1-based (first, last) line range in the source.
+    """
+    __slots__ = ("title", "level", "text", "lines")
+
+    def __init__(self, title, level, text, lines):
+        self.title = title
+        self.level = level
+        self.text = text
+        self.lines = lines
+
+    def __repr__(self):
+        return f"Section({self.title!r}, lines {self.lines[0]}-{self.lines[1]})"
+
+class Chunk:
+    """
+    A piece of the document sized for one LLM call, with the sections it came from.
+    """
+    __slots__ = ("index", "text", "sections", "tokens")
+
+    def __init__(self, index, text, sections, tokens):
+        self.index = index
+        self.text = text
+        self.sections = sections # list of (title, (first_line, last_line))
+        self.tokens = tokens
+
+    def __repr__(self):
+        return f"Chunk({self.index}, {self.tokens} tokens, {len(self.sections)} sections)"
+
+def _heading(line, next_line):
+    """
+    Returns (level, title) if the line is a heading, else None.
+    """
+    match = _MARKDOWN_HEADING.match(line)
+    if match:
+        return len(match.group(1)), match.group(2).strip()
+    match = _NUMBERED_HEADING.match(line)
+    if match and len(line) <= 120:
+        return match.group(1).rstrip(".)").count(".") + 1, line.strip()
+    if next_line is not None and _UNDERLINE.match(next_line) and line.strip() and len(line.strip()) <= 120:
+        return (1 if next_line.strip().startswith("=") else 2), line.strip()
+    stripped = line.strip()
+    if 3 <= len(stripped) <= 80 and stripped.isupper() and any(c.isalpha() for c in stripped):
+        return 1, stripped
+    return None
+
+def split_into_sections(text):
+    """
+    Splits a document on its headings (Markdown #, numbered "2.1 Title", underlined or ALL CAPS lines).
+    Section titles carry the enclosing headings, e.g. "2. Claims > 2.2 Payments". Text before the
+    first heading becomes an "Introduction" section.
+
+    Returns:
+        list: Sections in document order.
+    """
+    lines = (text or "").splitlines()
+    sections = []
+    title, level, start, body = "Introduction", 0, 1, []
+    stack = [] # (level, heading) of the enclosing headings
+
+    def flush(end_line):
+        content = "\n".join(body).strip()
+        if content:
+            sections.append(Section(title, level, content, (start, end_line)))
+
+    i = 0
+    while i < len(lines):
+        next_line = lines[i + 1] if i + 1 < len(lines) else None
+        heading = _heading(lines[i], next_line)
+        if heading:
+            flush(i)
+            level, heading_text = heading
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+            stack.append((level, heading_text))
+            title = " > ".join(h for _, h in stack)
+            start, body = i + 1, []
+            if next_line is not None and _UNDERLINE.match(next_line) and not _MARKDOWN_HEADING.match(lines[i]):
+                i += 1 # Skip the underline
+        else:
+            body.append(lines[i])
+        i += 1
+    flush(len(lines))
+    return sections
+
+def _split_oversized(text, max_tokens):
+    """
+    Splits text that exceeds the budget on paragraphs, then sentences, then hard character limits.
+    """
+    pieces, current = [], ""
+    units = [p for p in re.split(r"\n\s*\n", text) if p.strip()]
+    expanded = []
+    for unit in units:
+        if estimate_tokens(unit) <= max_tokens:
+            expanded.append(unit)
+            continue
+        for sentence in _SENTENCE_END.split(unit):
+            while estimate_tokens(sentence) > max_tokens:
+                expanded.append(sentence[:max_tokens * 4])
+                sentence = sentence[max_tokens * 4:]
+            if sentence.strip():
+                expanded.append(sentence)
+    for unit in expanded:
+        candidate = f"{current}\n\n{unit}" if current else unit
+        if current and estimate_tokens(candidate) > max_tokens:
+            pieces.append(current)
+            current = unit
+        else:
+            current = candidate
+    if current:
+        pieces.append(current)
+    return pieces
+
+def _is_anchor(block):
+    digest = hashlib.sha1(block.encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") % ANCHOR_INTERVAL == 0
+
+def chunk_document(text, max_tokens=3000, stable_boundaries=False):
+    """
+    Splits a document into chunks of at most about max_tokens tokens. Consecutive small sections are
+    packed together; a section larger than the budget is split on paragraph and sentence boundaries.
+    Each chunk starts with the titles of its sections so the LLM keeps the context.
+
+    With stable_boundaries=True, chunks also end after "anchor" sections picked by a hash of their content
+    (once the chunk is a quarter full). An edit then moves chunk boundaries only up to the next anchor,
+    so the unchanged parts of an edited document produce the same chunks as before.
+
+    Returns:
+        list: Chunks in document order.
+    """
+    chunks = []
+    pending_text, pending_sections = [], []
+
+    def flush():
+        if pending_text:
+            body = "\n\n".join(pending_text)
+            chunks.append(Chunk(len(chunks), body, list(pending_sections), estimate_tokens(body)))
+            pending_text.clear()
+            pending_sections.clear()
+
+    for section in split_into_sections(text):
+        block = f"## {section.title}\n{section.text}" if section.level else section.text
+        if estimate_tokens(block) > max_tokens:
+            flush()
+            for part in _split_oversized(section.text, max_tokens):
+                pending_text.append(f"## {section.title} (continued)\n{part}" if section.level else part)
+                pending_sections.append((section.title, section.lines))
+                flush()
+            continue
+        if pending_text and estimate_tokens("\n\n".join(pending_text + [block])) > max_tokens:
+            flush()
+        pending_text.append(block)
+        pending_sections.append((section.title, section.lines))
+        if stable_boundaries and _is_anchor(block) and estimate_tokens("\n\n".join(pending_text)) * 4 >= max_tokens:
+            flush()
+    flush()
+    return chunks
+
+# --- Example Usage ---
+if __name__ == "__main__":
+    document = """P&C Claims Platform Requirements
+
+1. Policies
+Every policy belongs to exactly one customer. Total premium equals the sum of coverage premiums.
+
+2. Claims
+2.1 First Notice of Loss
+A claim must reference an active policy on the date of loss.
+
+2.2 Payments
+Claim payments must not exceed the open reserve. Payments go to a claimant on the claim.
+
+BILLING
+Installments must add up to the policy's total premium.
+"""
+    for section in split_into_sections(document):
+        print(section)
+    for chunk in chunk_document(document, max_tokens=40):
+        print(chunk, [title for title, _ in chunk.sections])
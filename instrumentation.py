@@ -0,0 +1,257 @@
+# instrumentation.py
+
+import json
+import logging
+import threading
+import time
+
+# Verbose tracing (prompts, payloads, SQL text, rows) goes to this logger at DEBUG level. Call sites
+# guard it with `if log.isEnabledFor(logging.DEBUG):` so nothing is formatted while it is off.
+log = logging.getLogger("pipeline")
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def enable_verbose_logging(level=logging.DEBUG, stream=None):
+    """
+    Sends the pipeline's trace log to stderr (or `stream`) at the given level.
+    """
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    log.addHandler(handler)
+    log.setLevel(level)
+    return handler
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        low, high = 0, len(self.buckets)
+        while low < high: # First bucket whose bound is >= value
+            mid = (low + high) // 2
+            if self.buckets[mid] < value:
+                low = mid + 1
+            else:
+                high = mid
+        self.counts[low] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """
+        Estimates a quantile by linear interpolation inside the bucket that contains it.
+        """
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= target and bucket_count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+                return lower + (upper - lower) * (target - seen) / bucket_count
+            seen += bucket_count
+        return self.max
+
+class Span:
+    """
+    A timed section of work; `duration` (seconds) is set when the span ends.
+    """
+    __slots__ = ("name", "labels", "start", "duration", "span_id", "parent_id")
+
+    def __init__(self, name, labels, span_id, parent_id):
+        self.name = name
+        self.labels = labels
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.start = None
+        self.duration = None
+
+class _SpanContext:
+    __slots__ = ("_metrics", "_span")
+
+    def __init__(self, metrics, span):
+        self._metrics = metrics
+        self._span = span
+
+    def __enter__(self):
+        self._metrics._stack().append(self._span.span_id)
+        self._span.start = time.perf_counter()
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        span = self._span
+        span.duration = time.perf_counter() - span.start
+        self._metrics._stack().pop()
+        if exc_type is not None:
+            span.labels = dict(span.labels, error=exc_type.__name__)
+        self._metrics._finish(span)
+        return False
+
+class Metrics:
+    """
+    Thread-safe counters, latency histograms and timing spans for one process.
+
+        with metrics.span("llm_call", agent="agent2"):
+            ...
+        metrics.incr("llm_calls", agent="agent2")
+        metrics.observe("rows_per_query", 10)
+
+    Every span also feeds the "<name>_seconds" histogram with the same labels. report() returns a JSON-ready
+    run report and to_prometheus() renders the Prometheus text exposition format.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, max_spans=10000, namespace="pipeline"):
+        self.buckets = tuple(buckets)
+        self.max_spans = max_spans
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counters = {} # name -> {label_key: value}
+            self._histograms = {} # name -> {label_key: _Histogram}
+            self._spans = []
+            self._dropped_spans = 0
+            self._next_span_id = 1
+            self._started_at = time.time()
+            self._started = time.perf_counter()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, name, **labels):
+        """
+        Context manager timing a block of work. Spans opened inside it on the same thread become its children.
+        """
+        stack = self._stack()
+        with self._lock:
+            span_id = self._next_span_id
+            self._next_span_id += 1
+        return _SpanContext(self, Span(name, labels, span_id, stack[-1] if stack else None))
+
+    def _finish(self, span):
+        self.observe(f"{span.name}_seconds", span.duration, **span.labels)
+        with self._lock:
+            if len(self._spans) < self.max_spans:
+                self._spans.append(span)
+            else:
+                self._dropped_spans += 1
+
+    def incr(self, name, value=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+
+    def counter_value(self, name, **labels):
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def report(self):
+        """
+        Returns the run report: counters, histogram summaries (count, sum, mean, max, p50/p90/p99
+        estimates) and the recorded spans with start offsets relative to the start of the run.
+        """
+        with self._lock:
+            counters = {name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                        for name, series in self._counters.items()}
+            histograms = {}
+            for name, series in self._histograms.items():
+                histograms[name] = [{
+                    "labels": dict(key),
+                    "count": h.count,
+                    "sum": h.sum,
+                    "mean": h.sum / h.count if h.count else None,
+                    "max": h.max,
+                    "p50": h.quantile(0.5),
+                    "p90": h.quantile(0.9),
+                    "p99": h.quantile(0.99),
+                } for key, h in series.items()]
+            spans = [{"id": s.span_id, "parent": s.parent_id, "name": s.name, "labels": s.labels,
+                      "start_seconds": s.start - self._started, "duration_seconds": s.duration} for s in self._spans]
+            return {
+                "started_at": self._started_at,
+                "elapsed_seconds": time.perf_counter() - self._started,
+                "counters": counters,
+                "histograms": histograms,
+                "spans": spans,
+                "dropped_spans": self._dropped_spans,
+            }
+
+    def write_report(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2, default=str)
+
+    @staticmethod
+    def _format_labels(labels, extra=None):
+        items = list(labels) + (list(extra.items()) if extra else [])
+        if not items:
+            return ""
+        escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+        return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+    def to_prometheus(self):
+        """
+        Renders counters and histograms in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                metric = f"{self.namespace}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for key, value in series.items():
+                    lines.append(f"{metric}{self._format_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                metric = f"{self.namespace}_{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for key, h in series.items():
+                    cumulative = 0
+                    for bound, bucket_count in zip(self.buckets + ("+Inf",), h.counts):
+                        cumulative += bucket_count
+                        lines.append(f"{metric}_bucket{self._format_labels(key, {'le': bound})} {cumulative}")
+                    lines.append(f"{metric}_sum{self._format_labels(key)} {h.sum}")
+                    lines.append(f"{metric}_count{self._format_labels(key)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+# Process-wide registry used by the agents and the orchestrator.
+metrics = Metrics()
+
+# --- Example Usage ---
+if __name__ == "__main__":
+    import random
+    enable_verbose_logging()
+    for i in range(20):
+        with metrics.span("stage", stage="agent2"):
+            with metrics.span("llm_call", agent="agent2"):
+                time.sleep(random.uniform(0.001, 0.02))
+            metrics.incr("llm_calls", agent="agent2")
+            metrics.incr("prompt_chars", 120, agent="agent2")
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Payload %d sent", i)
+    print(json.dumps({k: v for k, v in metrics.report().items() if k != "spans"}, indent=2)[:1200])
+    print(metrics.to_prometheus()[:800])
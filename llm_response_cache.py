@@ -0,0 +1,141 @@
+# llm_response_cache.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+class LLMResponseCache:
+    """
+    Persistent, SQLite-backed cache of LLM responses keyed by the hash of the prompt plus the model name.
+    Entries expire after `ttl_seconds`; when the cache grows past `max_entries` or `max_bytes`, the least
+    recently used entries are evicted.
+    """
+
+    def __init__(self, db_path="llm_response_cache.sqlite", ttl_seconds=7 * 24 * 3600, max_entries=10000,
+                 max_bytes=256 * 1024 * 1024):
+        """
+        Initializes the cache, creating the database file if needed.
+        db_path (str): Path of the SQLite database file.
+        ttl_seconds (float): Lifetime of an entry. None disables expiry.
+        max_entries (int): Maximum number of cached responses. None disables the limit.
+        max_bytes (int): Maximum total size of cached responses in bytes. None disables the limit.
+        """
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses ("
+            " cache_key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " response TEXT NOT NULL,"
+            " size_bytes INTEGER NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_lru ON llm_responses (last_accessed)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(prompt, model_name):
+        """
+        Returns the cache key for a prompt/model pair.
+        """
+        return hashlib.sha256(f"{model_name}\x00{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, prompt, model_name):
+        """
+        Returns the cached response for the prompt/model pair, or None on a miss or expired entry.
+        """
+        key = self.make_key(prompt, model_name)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_responses WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            response, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_responses WHERE cache_key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_responses SET last_accessed = ? WHERE cache_key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return response
+
+    def put(self, prompt, model_name, response):
+        """
+        Stores a response and enforces the size limits.
+        """
+        key = self.make_key(prompt, model_name)
+        now = time.time()
+        size_bytes = len(response.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (cache_key, model, response, size_bytes, created_at, last_accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_name, response, size_bytes, now, now),
+            )
+            self._evict_locked(now)
+            self._conn.commit()
+
+    def _evict_locked(self, now):
+        if self.ttl_seconds is not None:
+            cursor = self._conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            self.evictions += max(cursor.rowcount, 0)
+        count, total_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM llm_responses").fetchone()
+        if (self.max_entries is None or count <= self.max_entries) and (self.max_bytes is None or total_bytes <= self.max_bytes):
+            return
+        # Walk entries from least to most recently used until both limits are satisfied.
+        victims = []
+        for key, size_bytes in self._conn.execute("SELECT cache_key, size_bytes FROM llm_responses ORDER BY last_accessed ASC"):
+            if (self.max_entries is None or count <= self.max_entries) and (self.max_bytes is None or total_bytes <= self.max_bytes):
+                break
+            victims.append((key,))
+            count -= 1
+            total_bytes -= size_bytes
+        self._conn.executemany("DELETE FROM llm_responses WHERE cache_key = ?", victims)
+        self.evictions += len(victims)
+
+    def clear(self):
+        """
+        Removes every cached response.
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_responses")
+            self._conn.commit()
+
+    def stats(self):
+        """
+        Returns hit/miss counters and current cache size.
+        """
+        with self._lock:
+            count, total_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM llm_responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": count,
+            "bytes": total_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
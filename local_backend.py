@@ -0,0 +1,538 @@
+# local_backend.py
+
+import calendar
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+from datetime import date, datetime, timedelta
+from semantic_model import is_private
+from snowflake_stand_in import StandInConnector
+from sql_validator import iter_sql_tokens
+
+# Bump when the shim changes how the setup script is translated so old snapshots are rebuilt.
+SHIM_VERSION = 1
+DEFAULT_SETUP_SQL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_snowflake_setup_complete.sql")
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                                    "local_backend_snapshots")
+
+# Snowflake column types without a SQLite equivalent; stored as text so values round-trip unchanged.
+_DDL_TYPE_MAP = {
+    "timestamp_ntz": "TIMESTAMP", "timestamp_ltz": "TIMESTAMP", "timestamp_tz": "TIMESTAMP",
+    "variant": "TEXT", "object": "TEXT", "array": "TEXT",
+}
+# Interval / date part names -> (unit used by the date helpers, multiplier).
+_DATE_PARTS = {
+    "year": ("years", 1), "years": ("years", 1), "y": ("years", 1), "yy": ("years", 1), "yyyy": ("years", 1),
+    "quarter": ("months", 3), "quarters": ("months", 3), "q": ("months", 3),
+    "month": ("months", 1), "months": ("months", 1), "mm": ("months", 1), "mon": ("months", 1),
+    "week": ("days", 7), "weeks": ("days", 7), "w": ("days", 7), "wk": ("days", 7),
+    "day": ("days", 1), "days": ("days", 1), "d": ("days", 1), "dd": ("days", 1),
+    "hour": ("hours", 1), "hours": ("hours", 1), "h": ("hours", 1), "hh": ("hours", 1),
+    "minute": ("minutes", 1), "minutes": ("minutes", 1), "mi": ("minutes", 1), "min": ("minutes", 1),
+    "second": ("seconds", 1), "seconds": ("seconds", 1), "s": ("seconds", 1), "sec": ("seconds", 1),
+}
+_DATE_PART_FUNCTIONS = frozenset(("dateadd", "datediff", "date_trunc", "timestampadd", "timestampdiff"))
+_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+_DATE_FORMAT = "%Y-%m-%d"
+
+# --- Date helpers registered as SQLite functions ---
+
+def _parse_temporal(value):
+    """
+    Parses a SQLite date or timestamp string. Returns (datetime, is_date_only) or (None, False).
+    """
+    if value is None:
+        return None, False
+    if isinstance(value, (datetime, date)):
+        return (value, False) if isinstance(value, datetime) else (datetime(value.year, value.month, value.day), True)
+    text = str(value).strip().replace("T", " ")
+    if len(text) == 10:
+        try:
+            return datetime.strptime(text, _DATE_FORMAT), True
+        except ValueError:
+            return None, False
+    try:
+        return datetime.fromisoformat(text[:26]), False
+    except ValueError:
+        return None, False
+
+def _format_temporal(value, date_only):
+    return value.strftime(_DATE_FORMAT if date_only else _TIMESTAMP_FORMAT)
+
+def _add_months(value, months):
+    month_index = value.month - 1 + months
+    year, month = value.year + month_index // 12, month_index % 12 + 1
+    return value.replace(year=year, month=month, day=min(value.day, calendar.monthrange(year, month)[1]))
+
+def _shift(value, unit, amount):
+    if unit == "years":
+        return _add_months(value, 12 * amount)
+    if unit == "months":
+        return _add_months(value, amount)
+    return value + timedelta(**{unit: amount})
+
+def _parse_interval(text):
+    """
+    Parses an interval literal such as '1 DAY' or '1 year 2 months' into [(unit, amount)].
+    Raises ValueError on anything else.
+    """
+    parts = text.strip().strip("'").replace(",", " ").split()
+    if not parts or len(parts) % 2:
+        raise ValueError(f"Unsupported interval literal: {text}")
+    shifts = []
+    for amount, part in zip(parts[0::2], parts[1::2]):
+        unit, multiplier = _DATE_PARTS[part.lower()]
+        shifts.append((unit, int(amount) * multiplier))
+    return shifts
+
+def sf_add_interval(value, interval, sign):
+    """
+    value +/- INTERVAL 'interval'. Keeps the input's format: a date stays a date unless the
+    interval has a time component.
+    """
+    parsed, date_only = _parse_temporal(value)
+    if parsed is None:
+        return None
+    try:
+        shifts = _parse_interval(interval)
+    except (ValueError, KeyError):
+        return None
+    for unit, amount in shifts:
+        parsed = _shift(parsed, unit, amount * sign)
+        if unit in ("hours", "minutes", "seconds"):
+            date_only = False
+    return _format_temporal(parsed, date_only)
+
+def sf_date_trunc(part, value):
+    parsed, date_only = _parse_temporal(value)
+    unit = _DATE_PARTS.get(str(part).lower(), (None, 1))
+    if parsed is None or unit[0] is None:
+        return None
+    name = str(part).lower()
+    if unit[0] == "years":
+        parsed = parsed.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    elif unit == ("months", 3):
+        parsed = parsed.replace(month=3 * ((parsed.month - 1) // 3) + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    elif unit[0] == "months":
+        parsed = parsed.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    elif unit[0] == "days" and name not in ("day", "days", "d", "dd"):
+        parsed = (parsed - timedelta(days=parsed.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    elif unit[0] == "days":
+        parsed = parsed.replace(hour=0, minute=0, second=0, microsecond=0)
+    elif unit[0] == "hours":
+        parsed = parsed.replace(minute=0, second=0, microsecond=0)
+    elif unit[0] == "minutes":
+        parsed = parsed.replace(second=0, microsecond=0)
+    else:
+        parsed = parsed.replace(microsecond=0)
+    return _format_temporal(parsed, date_only)
+
+def sf_dateadd(part, amount, value):
+    unit = _DATE_PARTS.get(str(part).lower())
+    parsed, date_only = _parse_temporal(value)
+    if unit is None or parsed is None or amount is None:
+        return None
+    if unit[0] in ("hours", "minutes", "seconds"):
+        date_only = False
+    return _format_temporal(_shift(parsed, unit[0], int(amount) * unit[1]), date_only)
+
+def sf_datediff(part, start, end):
+    unit = _DATE_PARTS.get(str(part).lower())
+    start, _ = _parse_temporal(start)
+    end, _ = _parse_temporal(end)
+    if unit is None or start is None or end is None:
+        return None
+    if unit[0] in ("years", "months"):
+        months = (end.year - start.year) * 12 + end.month - start.month
+        return months // (12 if unit[0] == "years" else unit[1])
+    if unit[0] == "days":
+        return (end.date() - start.date()).days // unit[1]
+    seconds = {"hours": 3600, "minutes": 60, "seconds": 1}[unit[0]]
+    return int((end - start).total_seconds() // seconds)
+
+def _to_date(value):
+    parsed, _ = _parse_temporal(value)
+    return parsed.strftime(_DATE_FORMAT) if parsed else None
+
+def _to_timestamp(value):
+    parsed, _ = _parse_temporal(value)
+    return parsed.strftime(_TIMESTAMP_FORMAT) if parsed else None
+
+def _date_part(fmt):
+    def extract(value):
+        parsed, _ = _parse_temporal(value)
+        return int(parsed.strftime(fmt)) if parsed else None
+    return extract
+
+class _CountIf:
+    def __init__(self):
+        self.count = 0
+
+    def step(self, condition):
+        if condition:
+            self.count += 1
+
+    def finalize(self):
+        return self.count
+
+def register_snowflake_functions(db):
+    """
+    Registers SQLite implementations of the Snowflake functions the shim relies on.
+    """
+    deterministic = {"deterministic": True}
+    db.create_function("SF_ADD_INTERVAL", 3, sf_add_interval, **deterministic)
+    db.create_function("DATE_TRUNC", 2, sf_date_trunc, **deterministic)
+    db.create_function("DATEADD", 3, sf_dateadd, **deterministic)
+    db.create_function("TIMESTAMPADD", 3, sf_dateadd, **deterministic)
+    db.create_function("DATEDIFF", 3, sf_datediff, **deterministic)
+    db.create_function("TIMESTAMPDIFF", 3, sf_datediff, **deterministic)
+    db.create_function("TO_DATE", 1, _to_date, **deterministic)
+    db.create_function("TO_TIMESTAMP", 1, _to_timestamp, **deterministic)
+    db.create_function("TO_TIMESTAMP_NTZ", 1, _to_timestamp, **deterministic)
+    db.create_function("YEAR", 1, _date_part("%Y"), **deterministic)
+    db.create_function("MONTH", 1, _date_part("%m"), **deterministic)
+    db.create_function("DAY", 1, _date_part("%d"), **deterministic)
+    db.create_function("IFF", 3, lambda condition, a, b: a if condition else b, **deterministic)
+    db.create_function("NVL", 2, lambda a, b: b if a is None else a, **deterministic)
+    db.create_function("ZEROIFNULL", 1, lambda a: 0 if a is None else a, **deterministic)
+    db.create_aggregate("COUNT_IF", 1, _CountIf)
+
+# --- Dialect shim ---
+
+def _previous_significant(tokens, index):
+    index -= 1
+    while index >= 0 and tokens[index][0] in ("ws", "line_comment", "block_comment"):
+        index -= 1
+    return index
+
+def _next_significant(tokens, index):
+    index += 1
+    while index < len(tokens) and tokens[index][0] in ("ws", "line_comment", "block_comment"):
+        index += 1
+    return index
+
+def _operand_start(tokens, end):
+    """
+    Returns the index of the first token of the operand ending at `end`: a literal, a (qualified)
+    identifier, a parenthesized expression, or a function call.
+    """
+    kind, text = tokens[end]
+    if text == ")":
+        depth = 0
+        for i in range(end, -1, -1):
+            if tokens[i][1] == ")":
+                depth += 1
+            elif tokens[i][1] == "(":
+                depth -= 1
+                if depth == 0:
+                    before = _previous_significant(tokens, i)
+                    if before >= 0 and tokens[before][0] in ("ident", "quoted") \
+                            and tokens[before][1].lower() not in ("and", "or", "not", "where", "select", "when", "then", "else", "on"):
+                        return before
+                    return i
+        return end
+    start = end
+    while True:
+        dot = _previous_significant(tokens, start)
+        if dot < 0 or tokens[dot][1] != ".":
+            return start
+        owner = _previous_significant(tokens, dot)
+        if owner < 0 or tokens[owner][0] not in ("ident", "quoted"):
+            return start
+        start = owner
+
+def _rewrite_casts(tokens):
+    """
+    Rewrites `expr::type` into TO_DATE(expr) / TO_TIMESTAMP(expr) for temporal types and CAST(expr AS type) otherwise.
+    """
+    i = 0
+    while i < len(tokens):
+        if tokens[i][0] != "cast":
+            i += 1
+            continue
+        type_start = _next_significant(tokens, i)
+        operand_end = _previous_significant(tokens, i)
+        if type_start >= len(tokens) or tokens[type_start][0] != "ident" or operand_end < 0:
+            i += 1
+            continue
+        type_end = type_start
+        after = _next_significant(tokens, type_start)
+        if after < len(tokens) and tokens[after][1] == "(":
+            close = after
+            while close < len(tokens) and tokens[close][1] != ")":
+                close += 1
+            type_end = min(close, len(tokens) - 1)
+        operand_start = _operand_start(tokens, operand_end)
+        operand = "".join(t for _, t in tokens[operand_start:operand_end + 1])
+        type_name = "".join(t for _, t in tokens[type_start:type_end + 1])
+        lower = tokens[type_start][1].lower()
+        if lower == "date":
+            replacement = f"TO_DATE({operand})"
+        elif lower.startswith("timestamp") or lower == "datetime":
+            replacement = f"TO_TIMESTAMP({operand})"
+        else:
+            replacement = f"CAST({operand} AS {type_name})"
+        tokens[operand_start:type_end + 1] = [("ident", replacement)]
+        i = operand_start + 1
+    return tokens
+
+def _rewrite_intervals(tokens):
+    """
+    Rewrites `expr +/- INTERVAL 'n unit'` (and `INTERVAL n unit`) into SF_ADD_INTERVAL(expr, 'n unit', +/-1).
+    """
+    i = 0
+    while i < len(tokens):
+        kind, text = tokens[i]
+        if kind != "ident" or text.lower() != "interval":
+            i += 1
+            continue
+        literal = _next_significant(tokens, i)
+        if literal >= len(tokens):
+            break
+        end = literal
+        if tokens[literal][0] == "string":
+            interval_text = tokens[literal][1]
+        elif tokens[literal][0] == "number":
+            unit = _next_significant(tokens, literal)
+            if unit >= len(tokens) or tokens[unit][0] != "ident":
+                i += 1
+                continue
+            interval_text = f"'{tokens[literal][1]} {tokens[unit][1]}'"
+            end = unit
+        else:
+            i += 1
+            continue
+        operator = _previous_significant(tokens, i)
+        if operator < 0 or tokens[operator][1] not in ("+", "-"):
+            i += 1
+            continue
+        operand_end = _previous_significant(tokens, operator)
+        if operand_end < 0:
+            i += 1
+            continue
+        operand_start = _operand_start(tokens, operand_end)
+        operand = "".join(t for _, t in tokens[operand_start:operand_end + 1])
+        sign = "-1" if tokens[operator][1] == "-" else "1"
+        replacement = ("ident", f"SF_ADD_INTERVAL({operand}, {interval_text}, {sign})")
+        tokens[operand_start:end + 1] = [replacement]
+        i = operand_start + 1
+    return tokens
+
+def _rewrite_samples(tokens):
+    """
+    Rewrites `table [AS alias] SAMPLE|TABLESAMPLE [method] (p)` into a subquery keeping each row with
+    probability p percent, and `(n ROWS)` into n random rows, aliased like the original table reference.
+    """
+    i = 0
+    while i < len(tokens):
+        kind, text = tokens[i]
+        if kind != "ident" or text.lower() not in ("sample", "tablesample"):
+            i += 1
+            continue
+        open_paren = _next_significant(tokens, i)
+        if open_paren < len(tokens) and tokens[open_paren][1].lower() in ("bernoulli", "row", "system", "block"):
+            open_paren = _next_significant(tokens, open_paren)
+        number = _next_significant(tokens, open_paren)
+        close_paren = _next_significant(tokens, number)
+        rows = close_paren < len(tokens) and tokens[close_paren][1].lower() == "rows"
+        if rows:
+            close_paren = _next_significant(tokens, close_paren)
+        reference_end = _previous_significant(tokens, i)
+        if open_paren >= len(tokens) or tokens[open_paren][1] != "(" or number >= len(tokens) or tokens[number][0] != "number" \
+                or close_paren >= len(tokens) or tokens[close_paren][1] != ")" \
+                or reference_end < 0 or tokens[reference_end][0] not in ("ident", "quoted"):
+            i += 1
+            continue
+        table_end, alias = reference_end, None
+        before = _previous_significant(tokens, _operand_start(tokens, reference_end))
+        if before >= 0 and tokens[before][1].lower() == "as":
+            alias, table_end = tokens[reference_end][1], _previous_significant(tokens, before)
+        elif before >= 0 and tokens[before][0] in ("ident", "quoted") and tokens[before][1].lower() not in ("from", "join"):
+            alias, table_end = tokens[reference_end][1], before
+        table_start = _operand_start(tokens, table_end)
+        table = "".join(t for _, t in tokens[table_start:table_end + 1])
+        if rows:
+            subquery = f"(SELECT * FROM {table} ORDER BY RANDOM() LIMIT {int(float(tokens[number][1]))})"
+        else:
+            subquery = f"(SELECT * FROM {table} WHERE ABS(RANDOM()) % 1000000 < {round(float(tokens[number][1]) * 10000)})"
+        tokens[table_start:close_paren + 1] = [("ident", f"{subquery} {alias or tokens[table_end][1]}")]
+        i = table_start + 1
+    return tokens
+
+def _is_date_part_argument(previous_tokens):
+    """
+    True when the next token is the first argument of DATEADD / DATEDIFF / DATE_TRUNC, where Snowflake
+    accepts a bare date part (DATEADD(day, ...)) that SQLite would read as a column.
+    """
+    significant = [t for t in previous_tokens[-4:] if t[0] not in ("ws", "line_comment", "block_comment")]
+    return len(significant) >= 2 and significant[-1][1] == "(" and significant[-2][1].lower() in _DATE_PART_FUNCTIONS
+
+def translate_snowflake_sql(sql_query, ddl=False):
+    """
+    Rewrites the Snowflake-specific parts of a query into SQLite SQL:
+      - CURRENT_TIMESTAMP() / CURRENT_DATE() / SYSDATE() -> CURRENT_TIMESTAMP / CURRENT_DATE
+      - expr +/- INTERVAL '1 DAY' -> SF_ADD_INTERVAL(expr, '1 DAY', +/-1)
+      - bare date parts in DATEADD(day, ...) / DATEDIFF / DATE_TRUNC -> string literals
+      - expr::type -> TO_DATE(expr) / TO_TIMESTAMP(expr) / CAST(expr AS type); DATE '...' literals -> '...'
+      - ILIKE -> LIKE (SQLite's LIKE is already case-insensitive for ASCII)
+      - COUNT_IF(cond) -> COUNT(NULL OR cond), which like Snowflake returns 0 rather than NULL over no rows
+      - table [AS alias] SAMPLE [method] (p) -> a random p% subquery of the table; (n ROWS) -> n random rows
+      - with ddl=True, TIMESTAMP_NTZ / VARIANT and similar column types -> SQLite types
+    DATE_TRUNC, DATEADD, DATEDIFF, IFF and friends are provided as registered functions.
+    Comments, string literals and quoted identifiers are left untouched.
+    """
+    tokens = list(iter_sql_tokens(sql_query))
+    out = []
+    i = 0
+    while i < len(tokens):
+        kind, text = tokens[i]
+        lower = text.lower()
+        if kind == "ident" and lower in ("current_timestamp", "current_date", "sysdate", "getdate", "localtimestamp"):
+            open_paren = _next_significant(tokens, i)
+            close_paren = _next_significant(tokens, open_paren)
+            if open_paren < len(tokens) and tokens[open_paren][1] == "(" \
+                    and close_paren < len(tokens) and tokens[close_paren][1] == ")":
+                i = close_paren
+            out.append(("ident", "CURRENT_DATE" if lower == "current_date" else "CURRENT_TIMESTAMP"))
+        elif kind == "ident" and lower in _DATE_PARTS and _is_date_part_argument(out):
+            out.append(("string", f"'{lower}'"))
+        elif kind == "ident" and lower in ("date", "timestamp", "timestamp_ntz") and not ddl \
+                and _next_significant(tokens, i) < len(tokens) and tokens[_next_significant(tokens, i)][0] == "string":
+            # Typed literal, e.g. DATE '2024-01-01': SQLite stores temporal values as text, so the string alone suffices.
+            i = _next_significant(tokens, i)
+            out.append(tokens[i])
+        elif kind == "ident" and lower == "ilike":
+            out.append((kind, "LIKE"))
+        elif kind == "ident" and lower == "count_if" and _next_significant(tokens, i) < len(tokens) \
+                and tokens[_next_significant(tokens, i)][1] == "(":
+            # OR binds loosest, so NULL OR cond is cond where cond is true and NULL (not counted) otherwise.
+            i = _next_significant(tokens, i)
+            out.extend([(kind, "COUNT"), ("punct", "("), ("ident", "NULL"), ("ws", " "), ("ident", "OR"), ("ws", " ")])
+        elif ddl and kind == "ident" and lower in _DDL_TYPE_MAP:
+            out.append((kind, _DDL_TYPE_MAP[lower]))
+        else:
+            out.append((kind, text))
+        i += 1
+    return "".join(text for _, text in _rewrite_samples(_rewrite_intervals(_rewrite_casts(out))))
+
+class LocalSnowflakeBackend(StandInConnector):
+    """
+    Embedded execution backend for Agent3SQLExecutor: a SQLite database built from the Snowflake
+    setup script (DDL and sample data), queried through the stand-in driver API with a dialect shim.
+
+    The database is built once and snapshotted to `snapshot_dir` under the hash of the setup script,
+    so later runs (and every pooled connection) open the snapshot read-only instead of replaying
+    the script. Only a directory and snapshot belonging to the current user and not writable by others
+    are trusted; otherwise the database is rebuilt (in a private temporary directory if `snapshot_dir`
+    itself is shared). Pass an instance as `connector` to Agent3SQLExecutor.
+    """
+
+    def __init__(self, setup_sql_path=DEFAULT_SETUP_SQL_PATH, snapshot_dir=DEFAULT_SNAPSHOT_DIR,
+                 connect_latency_seconds=0.0, query_latency_seconds=0.0, max_concurrent_queries=64, database_path=None):
+        """
+        setup_sql_path (str): Snowflake setup script to build the database from.
+        snapshot_dir (str): Directory holding built database snapshots.
+        database_path (str): Existing SQLite database to query instead of building one from the setup script,
+                             e.g. scale-factor data loaded by synthetic_data.load_into_sqlite().
+        connect_latency_seconds, query_latency_seconds (float): Optional simulated latencies, as for StandInConnector.
+        max_concurrent_queries (int): Asynchronous queries run at once, as for StandInConnector.
+        """
+        super().__init__(setup_sql=None, connect_latency_seconds=connect_latency_seconds,
+                         query_latency_seconds=query_latency_seconds, max_concurrent_queries=max_concurrent_queries)
+        self.setup_sql_path = setup_sql_path
+        self.snapshot_dir = snapshot_dir
+        self.database_path = database_path
+        self.snapshot_path = None
+        self.snapshot_built = False
+        self._private_dir = None
+        self._translations = {}
+        self._snapshot_lock = threading.Lock()
+
+    def ensure_snapshot(self):
+        """
+        Returns the snapshot path, building the database from the setup script if no snapshot exists for it yet.
+        """
+        if self.database_path:
+            return self.database_path
+        with self._snapshot_lock:
+            if self.snapshot_path and os.path.exists(self.snapshot_path):
+                return self.snapshot_path
+            with open(self.setup_sql_path, "rb") as f:
+                setup_sql = f.read()
+            digest = hashlib.sha256(setup_sql + f"\x00shim-v{SHIM_VERSION}".encode()).hexdigest()[:16]
+            snapshot_path = os.path.join(self._snapshot_directory(), f"{os.path.basename(self.setup_sql_path)}.{digest}.sqlite")
+            try:
+                trusted = is_private(os.stat(snapshot_path))
+            except OSError:
+                trusted = False
+            if not trusted:
+                self._build_snapshot(setup_sql.decode("utf-8"), snapshot_path)
+                self.snapshot_built = True
+            self.snapshot_path = snapshot_path
+            return snapshot_path
+
+    def _snapshot_directory(self):
+        """
+        Returns snapshot_dir if only the current user can write to it, else a private temporary directory.
+        """
+        if self._private_dir is None:
+            os.makedirs(self.snapshot_dir, mode=0o700, exist_ok=True)
+            self._private_dir = self.snapshot_dir
+            if not is_private(os.stat(self.snapshot_dir)):
+                self._private_dir = tempfile.mkdtemp(prefix="local_backend_snapshots_")
+                print(f"Warning: {self.snapshot_dir} is shared with other users; building the local database in {self._private_dir}.")
+        return self._private_dir
+
+    def _build_snapshot(self, setup_sql, snapshot_path):
+        tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        db = sqlite3.connect(tmp_path)
+        try:
+            register_snowflake_functions(db)
+            db.executescript(translate_snowflake_sql(setup_sql, ddl=True))
+            db.commit()
+            db.execute("ANALYZE")
+        finally:
+            db.close()
+        os.replace(tmp_path, snapshot_path)
+        print(f"Local backend: built database snapshot {snapshot_path}")
+
+    def _open_database(self):
+        snapshot_path = self.ensure_snapshot()
+        db = sqlite3.connect(f"file:{snapshot_path}?mode=ro", uri=True, check_same_thread=False)
+        register_snowflake_functions(db)
+        return db
+
+    def translate(self, sql_query):
+        translated = self._translations.get(sql_query)
+        if translated is None:
+            translated = translate_snowflake_sql(sql_query)
+            with self._lock:
+                if len(self._translations) > 4096:
+                    self._translations.clear()
+                self._translations[sql_query] = translated
+        return translated
+
+# --- Example Usage ---
+if __name__ == "__main__":
+    import time
+    backend = LocalSnowflakeBackend()
+    start = time.perf_counter()
+    conn = backend.connect()
+    first_open = time.perf_counter() - start
+    start = time.perf_counter()
+    backend.connect().close()
+    warm_open = time.perf_counter() - start
+    print(f"First connect: {first_open * 1000:.1f} ms (snapshot built: {backend.snapshot_built}), next connect: {warm_open * 1000:.2f} ms")
+    for query in [
+        "SELECT PolicyID, EffectiveDate, DATE_TRUNC('month', EffectiveDate) AS EffectiveMonth FROM Policies LIMIT 3;",
+        "SELECT COUNT(*) FROM Claims WHERE DateOfLoss > CURRENT_TIMESTAMP() - INTERVAL '10 YEARS';",
+        "SELECT COUNT_IF(Status ILIKE 'open') AS OpenClaims, COUNT(*) AS AllClaims FROM Claims;",
+    ]:
+        print(f"\n{query}\n  -> {backend.translate(query)}")
+        cursor = conn.cursor().execute(query)
+        print(f"  headers={[d[0] for d in cursor.description]} rows={cursor.fetchmany(3)}")
+    conn.close()
@@ -3,18 +3,56 @@
 from agent1_requirements_analyzer import Agent1RequirementsAnalyzer
 from agent2_sql_generator import Agent2SQLGenerator
 from agent3_sql_executor import Agent3SQLExecutor
+from pipeline_checkpoints import PipelineCheckpointStore, checkpoint_key
+from query_admission import QueryAdmissionController
+from query_result_cache import fingerprint_sql
+from schema_impact import diff_semantic_models, query_dependencies
+from semantic_model import SemanticModel, load_semantic_model
+from sql_validator import SQLValidator
+from streaming_pipeline import PipelineStream
+from use_case_clustering import UseCaseClusters, cluster_use_cases
+from instrumentation import metrics
 import os
+import time
 
 class MainOrchestrator:
     """
     Orchestrates the workflow between Agent 1, Agent 2, and Agent 3.
     """
-    def __init__(self, conceptual_snowflake_connection_params=None, conceptual_semantic_model_path="/home/ubuntu/semantic_model.yaml"):
+    def __init__(self, conceptual_snowflake_connection_params=None, conceptual_semantic_model_path="/home/ubuntu/semantic_model.yaml",
+                 validate_sql=True, execution_connector=None, chunk_token_budget=None,
+                 deduplicate_use_cases=True, use_case_similarity_threshold=0.65, llm_batch_size=None,
+                 checkpoint_path=None, query_budget_bytes=None, query_budget_credits=None,
+                 over_budget="defer"):
         """
         Initializes the orchestrator and the agents.
+        execution_connector: Optional driver Agent 3 executes queries with, e.g. local_backend.LocalSnowflakeBackend()
+                             to run the generated SQL against the embedded sample database.
+        validate_sql (bool): If True, generated SQL is checked offline against the semantic model before
+                             execution; bad queries are repaired or rejected instead of reaching the warehouse.
+        chunk_token_budget (int): Requirements documents larger than this many tokens are analyzed by Agent 1
+                                  in concurrent chunks (map-reduce). None analyzes every document in one prompt.
+        deduplicate_use_cases (bool): If True, near-duplicate use cases from Agent 1 are clustered and Agent 2
+                                      generates SQL once per cluster; the SQL is fanned back out to every member.
+        use_case_similarity_threshold (float): Word-bigram Jaccard similarity at which two use cases are duplicates,
+                                               unless they differ in a schema word, status value or number.
+        llm_batch_size (int): If greater than 1, Agent 1's chunk prompts and Agent 2's use-case prompts are sent to
+                              Cortex up to this many per round trip instead of one call per prompt.
+        checkpoint_path (str): Optional SQLite file for resumable checkpoints of every stage's output, keyed by
+                               the stage's inputs: the document (and its chunks) for Agent 1, the use case plus
+                               semantic model hash for Agent 2, the SQL fingerprint for Agent 3. A rerun after a
+                               failure skips the work already done, including part of an interrupted stage.
+        query_budget_bytes (int): Optional budget of estimated bytes processed per Agent 3 run. Queries are
+                                  costed before execution and run cheapest first; those that do not fit are
+                                  sampled or deferred (see query_admission.QueryAdmissionController).
+        query_budget_credits (float): Optional budget in warehouse credits per Agent 3 run.
+        over_budget (str): "defer" or "sample", what happens to queries that do not fit the budget.
         """
         print("Main Orchestrator initializing...")
-        self.agent1 = Agent1RequirementsAnalyzer(snowflake_connection_params=conceptual_snowflake_connection_params)
+        self.checkpoints = PipelineCheckpointStore(db_path=checkpoint_path) if checkpoint_path else None
+        self.agent1 = Agent1RequirementsAnalyzer(snowflake_connection_params=conceptual_snowflake_connection_params,
+                                                 chunk_token_budget=chunk_token_budget, batch_size=llm_batch_size,
+                                                 checkpoints=self.checkpoints)
         
         # Ensure the conceptual semantic model file exists for Agent 2, even if basic
         self.conceptual_semantic_model_path = conceptual_semantic_model_path
@@ -32,10 +70,41 @@ semantic_model:
             except Exception as e:
                 print(f"Error creating placeholder semantic model: {e}")
 
-        self.agent2 = Agent2SQLGenerator(semantic_model_path=self.conceptual_semantic_model_path)
-        self.agent3 = Agent3SQLExecutor(snowflake_connection_params=conceptual_snowflake_connection_params)
+        # Parse and index the semantic model once; agents share the process-wide compiled copy.
+        semantic_model = load_semantic_model(self.conceptual_semantic_model_path)
+        if semantic_model is not None:
+            print(f"Loaded semantic model {semantic_model.summary()}")
+
+        self.agent2 = Agent2SQLGenerator(semantic_model_path=self.conceptual_semantic_model_path, batch_size=llm_batch_size,
+                                         checkpoints=self.checkpoints)
+        admission = None
+        if query_budget_bytes is not None or query_budget_credits is not None:
+            admission = QueryAdmissionController(semantic_model=semantic_model, max_bytes=query_budget_bytes,
+                                                 max_credits=query_budget_credits, over_budget=over_budget)
+        self.agent3 = Agent3SQLExecutor(snowflake_connection_params=conceptual_snowflake_connection_params,
+                                        connector=execution_connector, admission=admission)
+        self.validate_sql = validate_sql
+        self.last_stage_seconds = {} # Wall-clock seconds per stage of the latest batch run
+        self.deduplicate_use_cases = deduplicate_use_cases
+        self.use_case_similarity_threshold = use_case_similarity_threshold
         print("Main Orchestrator initialized successfully.")
 
+    def cluster_use_cases(self, high_level_use_cases):
+        """
+        Clusters Agent 1's use cases before SQL generation. With deduplication disabled every use case
+        is its own cluster.
+
+        Returns:
+            UseCaseClusters: Send `representatives` to Agent 2 and `fan_out()` its SQL to all use cases.
+        """
+        if not self.deduplicate_use_cases:
+            return UseCaseClusters(high_level_use_cases, [[i] for i in range(len(high_level_use_cases))], None)
+        clusters = cluster_use_cases(high_level_use_cases, similarity_threshold=self.use_case_similarity_threshold,
+                                     semantic_model=self.agent2.semantic_model)
+        print(f"Orchestrator: Clustered {len(high_level_use_cases)} use cases into {len(clusters.representatives)}; "
+              f"{clusters.calls_saved} SQL generation calls saved.")
+        return clusters
+
     def process_requirements_to_sql_results(self, requirements_document_text):
         """
         Runs the full pipeline from requirements document to SQL execution results.
@@ -47,20 +116,32 @@ semantic_model:
             dict: A dictionary containing all intermediate and final results.
                   {
                       "high_level_use_cases": list | None,
+                      "use_case_dedup": dict | None,
                       "generated_sql_queries": list | None,
+                      "query_dependencies": list | None,
+                      "sql_validation_report": dict | None,
                       "sql_execution_results": dict | None,
                       "errors": list
                   }
         """
         results = {
             "high_level_use_cases": None,
+            "use_case_dedup": None,
             "generated_sql_queries": None,
+            "query_dependencies": None,
+            "sql_validation_report": None,
             "sql_execution_results": None,
+            "admission_report": None,
             "errors": []
         }
 
+        stage_seconds = {}
+        self.last_stage_seconds = stage_seconds
+
         print("\nOrchestrator: Starting Agent 1 - Requirements Analysis...")
-        high_level_use_cases = self.agent1.analyze_requirements(requirements_document_text)
+        with metrics.span("stage", stage="agent1") as span:
+            high_level_use_cases = self.agent1.analyze_requirements(requirements_document_text)
+        stage_seconds["agent1"] = span.duration
         if high_level_use_cases:
             results["high_level_use_cases"] = high_level_use_cases
             print(f"Orchestrator: Agent 1 completed. Found {len(high_level_use_cases)} use cases.")
@@ -70,10 +151,19 @@ semantic_model:
             results["errors"].append(error_msg)
             return results # Stop processing if Agent 1 fails
 
+        with metrics.span("stage", stage="dedup") as span:
+            clusters = self.cluster_use_cases(high_level_use_cases)
+        stage_seconds["dedup"] = span.duration
         print("\nOrchestrator: Starting Agent 2 - SQL Generation...")
-        generated_sql_queries = self.agent2.generate_sql_queries(high_level_use_cases)
+        with metrics.span("stage", stage="agent2") as span:
+            # Per-run pairs are returned rather than read from agent2.last_generated, which another run
+            # sharing this orchestrator may overwrite.
+            generated_sql_queries, generated_pairs = self.agent2._generate_sql_queries(clusters.representatives)
+        stage_seconds["agent2"] = span.duration
+        results["use_case_dedup"] = self._dedup_report(clusters, dict(generated_pairs))
         if generated_sql_queries:
             results["generated_sql_queries"] = generated_sql_queries
+            results["query_dependencies"] = self._query_dependencies(generated_sql_queries, dict(generated_pairs))
             print(f"Orchestrator: Agent 2 completed. Generated {len(generated_sql_queries)} SQL queries.")
         else:
             error_msg = "Orchestrator: Agent 2 failed to generate SQL queries."
@@ -82,8 +172,30 @@ semantic_model:
             # We can still proceed to show Agent 1 results even if Agent 2 fails
             return results 
 
+        queries_to_execute = generated_sql_queries
+        if self.validate_sql:
+            print("\nOrchestrator: Validating generated SQL offline...")
+            with metrics.span("stage", stage="validation") as span:
+                validator = SQLValidator(self.agent2.semantic_model)
+                queries_to_execute, validation_report = validator.validate_queries(generated_sql_queries)
+            stage_seconds["validation"] = span.duration
+            results["sql_validation_report"] = validation_report
+            if not queries_to_execute:
+                error_msg = f"Orchestrator: All {len(generated_sql_queries)} generated SQL queries were rejected by offline validation."
+                print(error_msg)
+                results["errors"].append(error_msg)
+                return results
+
         print("\nOrchestrator: Starting Agent 3 - SQL Execution...")
-        sql_execution_results = self.agent3.execute_sql_queries(generated_sql_queries)
+        execution_report = {"admission": None}
+        with metrics.span("stage", stage="agent3") as span:
+            if self.checkpoints is not None:
+                sql_execution_results = self._execute_with_checkpoints(queries_to_execute, requirements_document_text,
+                                                                       execution_report)
+            else:
+                sql_execution_results = self.agent3.execute_sql_queries(queries_to_execute, report=execution_report)
+        stage_seconds["agent3"] = span.duration
+        results["admission_report"] = execution_report["admission"]
         if sql_execution_results:
             results["sql_execution_results"] = sql_execution_results
             print(f"Orchestrator: Agent 3 completed. Executed {len(sql_execution_results)} queries.")
@@ -94,6 +206,225 @@ semantic_model:
             
         return results
 
+    def _execute_with_checkpoints(self, sql_queries, requirements_document_text, report=None):
+        """
+        Runs Agent 3 and checkpoints each successful result as soon as its query finishes, under the
+        query's SQL fingerprint, scoped to this run (document and semantic model). A rerun after an
+        interruption or after failed queries executes only the queries without a checkpointed result.
+        Once every query has succeeded, the run's checkpoints are dropped: results depend on the data, so a
+        later run executes the queries again. Sampled results (admission control) are not checkpointed.
+
+        Args:
+            report (dict): Passed to execute_sql_queries; receives the reports of the queries actually executed.
+
+        Returns:
+            dict: The same mapping execute_sql_queries returns.
+        """
+        semantic_model = self.agent2.semantic_model
+        scope = checkpoint_key(requirements_document_text, semantic_model.content_hash if semantic_model else "",
+                               self.agent3.max_rows)
+        if any(not isinstance(sql_query, str) or not sql_query.strip() for sql_query in sql_queries):
+            return self.agent3.execute_sql_queries(sql_queries, report=report) # Agent 3 reports the invalid entries
+        keys = {sql_query: checkpoint_key(scope, fingerprint_sql(sql_query)[0]) for sql_query in sql_queries}
+
+        executed = {}
+        for sql_query, key in keys.items():
+            result = self.checkpoints.get("agent3", key)
+            if result is not None:
+                executed[sql_query] = result
+        pending = [sql_query for sql_query in keys if sql_query not in executed]
+        if executed:
+            metrics.incr("checkpoint_hits", len(executed), agent="agent3")
+            print(f"Orchestrator: Resuming Agent 3 with {len(executed)} of {len(keys)} queries already executed.")
+
+        def checkpoint(sql_query, result):
+            if result["headers"] != ["Error"] and "sample_percent" not in result:
+                self.checkpoints.put("agent3", keys[sql_query], result, scope=scope)
+
+        if pending:
+            results = self.agent3.execute_sql_queries(pending, on_result=checkpoint, report=report)
+            if results is None:
+                return None
+            executed.update(results)
+        if all(result["headers"] != ["Error"] for result in executed.values()):
+            self.checkpoints.discard("agent3", scope=scope)
+        return {sql_query: executed[sql_query] for sql_query in keys}
+
+    def _query_dependencies(self, generated_sql_queries, sql_by_use_case):
+        """
+        Records, for every generated query, the use case it was generated for (None for generic fallbacks)
+        and the tables and columns it references (None when the query cannot be parsed), so a later change
+        to the semantic model can be narrowed down to the queries it affects.
+        """
+        use_case_by_sql = {}
+        for use_case, sql_query in sql_by_use_case.items():
+            if self.agent2.is_specific_sql(sql_query):
+                use_case_by_sql.setdefault(sql_query, use_case)
+        entries = []
+        for sql_query in generated_sql_queries:
+            dependencies = query_dependencies(sql_query, self.agent2.semantic_model) or {"tables": None, "columns": None}
+            entries.append({"use_case": use_case_by_sql.get(sql_query), "sql": sql_query, **dependencies})
+        return entries
+
+    def rerun_for_schema_change(self, previous_results, old_semantic_model):
+        """
+        Brings the results of an earlier run up to date after the semantic model changed. The old model is
+        diffed against the current one; only queries whose recorded dependencies (previous_results
+        ["query_dependencies"]) touch a changed table, column or relationship are regenerated by Agent 2 and
+        re-executed by Agent 3. All other queries keep their SQL and previous results.
+
+        Args:
+            previous_results (dict): Output of process_requirements_to_sql_results for the old model.
+            old_semantic_model (SemanticModel | str): The model the results were generated with, or its YAML path.
+
+        Returns:
+            dict: Results in the same format as process_requirements_to_sql_results, plus
+                  "schema_impact": {"changes": dict, "queries": int, "affected": list, "regenerated": int,
+                                    "re_executed": int, "reused": int}.
+        """
+        results = {
+            "high_level_use_cases": previous_results.get("high_level_use_cases"),
+            "use_case_dedup": previous_results.get("use_case_dedup"),
+            "generated_sql_queries": None,
+            "query_dependencies": None,
+            "sql_validation_report": None,
+            "sql_execution_results": None,
+            "admission_report": None,
+            "schema_impact": None,
+            "errors": []
+        }
+        if isinstance(old_semantic_model, str):
+            old_semantic_model = load_semantic_model(old_semantic_model)
+        new_semantic_model = self.agent2.semantic_model
+        entries = previous_results.get("query_dependencies")
+        if not isinstance(old_semantic_model, SemanticModel) or new_semantic_model is None or not entries:
+            error_msg = "Orchestrator: Schema impact cannot be determined without both semantic models and the previous run's query dependencies; rerun the full pipeline."
+            print(error_msg)
+            results["errors"].append(error_msg)
+            return results
+
+        diff = diff_semantic_models(old_semantic_model, new_semantic_model)
+        affected = {}
+        for index, entry in enumerate(entries):
+            reasons = ["dependencies unknown"] if entry["tables"] is None else diff.affects(entry)
+            if reasons:
+                affected[index] = reasons
+        print(f"\nOrchestrator: Semantic model change affects {len(affected)} of {len(entries)} queries.")
+
+        to_regenerate = [index for index in affected if entries[index]["use_case"] is not None]
+        regenerated = {}
+        if to_regenerate:
+            print("Orchestrator: Regenerating the affected queries with Agent 2...")
+            with metrics.span("stage", stage="agent2"):
+                for position, sql_query in self.agent2.iter_sql_for_use_cases([entries[i]["use_case"] for i in to_regenerate]):
+                    if self.agent2.is_specific_sql(sql_query):
+                        regenerated[to_regenerate[position]] = sql_query
+                    else:
+                        print(f"Warning: Could not regenerate SQL for use case: {entries[to_regenerate[position]]['use_case']}; re-running the previous query.")
+        new_entries = []
+        for index, entry in enumerate(entries):
+            if index in regenerated:
+                dependencies = query_dependencies(regenerated[index], new_semantic_model) or {"tables": None, "columns": None}
+                entry = {"use_case": entry["use_case"], "sql": regenerated[index], **dependencies}
+            new_entries.append(entry)
+        results["generated_sql_queries"] = [entry["sql"] for entry in new_entries]
+        results["query_dependencies"] = new_entries
+        if regenerated and results["use_case_dedup"]:
+            replaced = {entries[index]["sql"]: sql_query for index, sql_query in regenerated.items()}
+            results["use_case_dedup"] = dict(results["use_case_dedup"], sql_by_use_case=[
+                {"use_case": item["use_case"], "sql": replaced.get(item["sql"], item["sql"])}
+                for item in results["use_case_dedup"].get("sql_by_use_case", [])
+            ])
+
+        impact = {
+            "changes": diff.summary(),
+            "queries": len(entries),
+            "affected": [{"use_case": entries[index]["use_case"], "sql": entries[index]["sql"], "reasons": reasons,
+                          "regenerated": index in regenerated} for index, reasons in affected.items()],
+            "regenerated": len(regenerated),
+            "re_executed": 0,
+            "reused": 0,
+        }
+        results["schema_impact"] = impact
+
+        executed_sql = list(results["generated_sql_queries"])
+        if self.validate_sql:
+            validator = SQLValidator(new_semantic_model)
+            start = time.perf_counter()
+            validations = [validator.validate(sql_query) for sql_query in executed_sql]
+            accepted, results["sql_validation_report"] = validator.summarize(validations, (time.perf_counter() - start) * 1000)
+            if not accepted:
+                error_msg = f"Orchestrator: All {len(executed_sql)} generated SQL queries were rejected by offline validation."
+                print(error_msg)
+                results["errors"].append(error_msg)
+                return results
+            executed_sql = [v.sql if v.status != "rejected" else None for v in validations]
+
+        previous_execution = previous_results.get("sql_execution_results") or {}
+        reused, to_execute = {}, []
+        for index, sql_query in enumerate(executed_sql):
+            if sql_query is None:
+                continue
+            if index not in affected and sql_query in previous_execution:
+                reused[sql_query] = previous_execution[sql_query]
+            elif sql_query not in to_execute:
+                to_execute.append(sql_query)
+        executed, execution_report = {}, {"admission": None}
+        if to_execute:
+            print(f"Orchestrator: Re-executing {len(to_execute)} queries with Agent 3; reusing {len(reused)} previous results.")
+            with metrics.span("stage", stage="agent3"):
+                executed = self.agent3.execute_sql_queries(to_execute, report=execution_report) or {}
+        results["admission_report"] = execution_report["admission"] # Covers the re-executed queries only
+        sql_execution_results = {}
+        for sql_query in executed_sql:
+            if sql_query is not None and sql_query not in sql_execution_results:
+                result = executed.get(sql_query, reused.get(sql_query))
+                if result is not None:
+                    sql_execution_results[sql_query] = result
+        if sql_execution_results:
+            results["sql_execution_results"] = sql_execution_results
+        else:
+            error_msg = "Orchestrator: Agent 3 failed to execute SQL queries or process results."
+            print(error_msg)
+            results["errors"].append(error_msg)
+
+        impact["re_executed"] = len(executed)
+        impact["reused"] = len(reused)
+        metrics.incr("schema_impact_queries_reused", len(reused))
+        print(f"Orchestrator: Schema change handled with {len(regenerated)} regenerated and {len(executed)} re-executed queries; "
+              f"{len(reused)} results reused.")
+        return results
+
+    @staticmethod
+    def _dedup_report(clusters, sql_by_representative):
+        """
+        The clustering report plus each use case's generated SQL (None where generation failed),
+        fanned out from its cluster's representative.
+        """
+        report = clusters.report()
+        representative_sql = [sql_by_representative.get(r) if isinstance(r, str) else None for r in clusters.representatives]
+        report["sql_by_use_case"] = [
+            {"use_case": use_case, "sql": sql}
+            for use_case, sql in zip(clusters.use_cases, clusters.fan_out(representative_sql))
+        ]
+        return report
+
+    def stream_requirements_to_sql_results(self, requirements_document_text, queue_size=4):
+        """
+        Streaming variant of process_requirements_to_sql_results: Agent 3 executes each query as soon as
+        Agent 2 produces it. A query budget still applies, admitted in arrival order; scan sharing, async
+        execution and Agent 3 checkpoints do not (see PipelineStream).
+
+        Args:
+            requirements_document_text (str): The content of the requirements document.
+            queue_size (int): Capacity of the bounded queues between stages.
+
+        Returns:
+            PipelineStream: Iterate it for (use_case, sql, result) events; afterwards its `results`
+                            attribute holds the same dict process_requirements_to_sql_results returns.
+        """
+        return PipelineStream(self, requirements_document_text, queue_size=queue_size)
+
 # --- Example Usage (Conceptual) ---
 if __name__ == "__main__":
     print("Starting Main Orchestrator example...")
@@ -116,12 +447,24 @@ User accounts need to be managed, including registration and login functionality
         print("\nHigh-Level Use Cases:")
         for i, uc in enumerate(final_results["high_level_use_cases"]):
             print(f"{i+1}. {uc}")
+
+    if final_results["use_case_dedup"]:
+        dedup = final_results["use_case_dedup"]
+        print(f"\nUse case deduplication: {dedup['use_cases']} use cases -> {dedup['clusters']} clusters, "
+              f"{dedup['generation_calls_saved']} SQL generation calls saved")
     
     if final_results["generated_sql_queries"]:
         print("\nGenerated SQL Queries:")
         for i, sql in enumerate(final_results["generated_sql_queries"]):
             print(f"\nQuery {i+1}:\n{sql}")
 
+    if final_results["sql_validation_report"]:
+        validation_report = final_results["sql_validation_report"]
+        print(f"\nSQL Validation: {validation_report['valid']} valid, {len(validation_report['repaired'])} repaired, "
+              f"{len(validation_report['rejected'])} rejected ({validation_report['elapsed_ms']:.2f} ms)")
+        for rejected in validation_report["rejected"]:
+            print(f"- Rejected: {rejected['sql'][:80]!r}: {'; '.join(rejected['reasons'])}")
+
     if final_results["sql_execution_results"]:
         print("\nSQL Execution Results:")
         for query, result_data in final_results["sql_execution_results"].items():
@@ -139,5 +482,22 @@ User accounts need to be managed, including registration and login functionality
         for err in final_results["errors"]:
             print(f"- {err}")
             
+    # Per-stage spans, counters and latency histograms collected during the runs above.
+    import tempfile
+    report_path = os.path.join(tempfile.gettempdir(), "pipeline_metrics.json")
+    metrics.write_report(report_path)
+    print(f"\nMetrics run report written to {report_path}; LLM calls: "
+          f"{metrics.counter_value('llm_calls', agent='agent1')} (Agent 1), {metrics.counter_value('llm_calls', agent='agent2')} (Agent 2)")
+    print("\n".join(line for line in metrics.to_prometheus().splitlines() if "_bucket" not in line))
+
+    # Streaming: results arrive per query while later use cases are still being turned into SQL.
+    print("\n--- Streaming run ---")
+    stream = orchestrator.stream_requirements_to_sql_results(sample_requirements_doc_orchestrator)
+    for use_case, sql, result in stream:
+        status = f"{len(result['data'])} rows" if result else "not executed"
+        print(f"[stream] {str(use_case)[:60]!r}: {status}")
+    print(f"First result after {stream.first_result_seconds or 0:.3f}s, run finished after {stream.elapsed_seconds or 0:.3f}s. "
+          f"Same aggregate as the batch run: {stream.results['sql_execution_results'] == final_results['sql_execution_results']}")
+
     print("\nMain Orchestrator example finished.")
 
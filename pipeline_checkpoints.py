@@ -0,0 +1,123 @@
+# pipeline_checkpoints.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from columnar_results import from_json, to_json
+
+def checkpoint_key(*parts):
+    """
+    Returns the content address of a stage input: a SHA-256 over the parts (converted to str).
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+class PipelineCheckpointStore:
+    """
+    Persistent, SQLite-backed store of pipeline stage outputs, addressed by a hash of each stage's inputs
+    (see checkpoint_key). A rerun looks its inputs up and only redoes the work whose inputs are new, so a
+    pipeline that failed halfway resumes where it stopped instead of repaying every LLM call.
+
+    Entries can carry a `scope` (e.g. one pipeline run) so short-lived checkpoints can be dropped together.
+    Values are stored as JSON (see columnar_results.to_json), so a store file never runs code when read.
+    The store is safe to share between threads and, through SQLite's locking, between processes.
+    """
+
+    def __init__(self, db_path="pipeline_checkpoints.sqlite"):
+        """
+        Initializes the store, creating the database file if needed.
+        db_path (str): Path of the SQLite database file.
+        """
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            " stage TEXT NOT NULL,"
+            " checkpoint_key TEXT NOT NULL,"
+            " scope TEXT NOT NULL,"
+            " value BLOB NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (stage, checkpoint_key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_checkpoints_scope ON checkpoints (stage, scope)")
+        self._conn.commit()
+
+    def get(self, stage, key):
+        """
+        Returns the stored output for a stage input, or None if there is none (or it cannot be decoded).
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM checkpoints WHERE stage = ? AND checkpoint_key = ?", (stage, key)
+            ).fetchone()
+        try:
+            value = from_json(row[0]) if row is not None else None
+        except (ValueError, TypeError, KeyError):
+            value = None # Written by an older version of the store
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def put(self, stage, key, value, scope=""):
+        """
+        Stores the output of a stage for an input, replacing any earlier output.
+        """
+        blob = to_json(value)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (stage, checkpoint_key, scope, value, created_at) VALUES (?, ?, ?, ?, ?)",
+                (stage, key, scope, blob, time.time()),
+            )
+            self._conn.commit()
+            self.stores += 1
+
+    def discard(self, stage, scope=None):
+        """
+        Drops the checkpoints of a stage, or only those stored under `scope`.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        with self._lock:
+            if scope is None:
+                removed = self._conn.execute("DELETE FROM checkpoints WHERE stage = ?", (stage,)).rowcount
+            else:
+                removed = self._conn.execute("DELETE FROM checkpoints WHERE stage = ? AND scope = ?", (stage, scope)).rowcount
+            self._conn.commit()
+        return max(removed, 0)
+
+    def stats(self):
+        with self._lock:
+            entries = dict(self._conn.execute("SELECT stage, COUNT(*) FROM checkpoints GROUP BY stage").fetchall())
+        return {"hits": self.hits, "misses": self.misses, "stores": self.stores, "entries": entries}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# --- Example Usage ---
+if __name__ == "__main__":
+    import tempfile
+    store = PipelineCheckpointStore(db_path=os.path.join(tempfile.mkdtemp(), "pipeline_checkpoints.sqlite"))
+    key = checkpoint_key("llama3.1-70b", "The system must track claims.")
+    print(f"Before: {store.get('agent1', key)}")
+    store.put("agent1", key, ["Verify every claim references a policy."])
+    print(f"After: {store.get('agent1', key)}")
+    store.put("agent3", checkpoint_key("run-1", "select 1"), (["1"], [[1]]), scope="run-1")
+    print(f"Discarded run-1: {store.discard('agent3', scope='run-1')}; stats: {store.stats()}")
+    store.close()
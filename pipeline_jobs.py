@@ -0,0 +1,88 @@
+# pipeline_jobs.py
+
+import threading
+import time
+import uuid
+
+class PipelineJob:
+    """
+    Runs one streaming orchestrator pipeline on a background thread and records its events, so a UI
+    can poll progress (and survive its own reruns) without restarting the pipeline.
+    """
+
+    def __init__(self, orchestrator, requirements_document_text, queue_size=4):
+        """
+        orchestrator (MainOrchestrator): A (typically cached, warm) orchestrator.
+        requirements_document_text (str): The content of the requirements document.
+        queue_size (int): Capacity of the queues between pipeline stages.
+        """
+        self.job_id = uuid.uuid4().hex
+        self.status = "pending" # pending -> running -> completed | failed
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._stream = orchestrator.stream_requirements_to_sql_results(requirements_document_text, queue_size=queue_size)
+        self._events = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"pipeline-job-{self.job_id[:8]}", daemon=True)
+
+    def start(self):
+        with self._lock:
+            if self.status != "pending":
+                return self
+            self.status = "running"
+            self.started_at = time.time()
+        self._thread.start()
+        return self
+
+    def _run(self):
+        try:
+            for use_case, sql, result in self._stream:
+                with self._lock:
+                    self._events.append({"use_case": use_case, "sql": sql, "result": result})
+            status, error = "completed", None
+        except Exception as e:
+            print(f"Error: Pipeline job {self.job_id} failed: {e}")
+            status, error = "failed", str(e)
+        with self._lock:
+            self.status, self.error = status, error
+            self.finished_at = time.time()
+
+    @property
+    def is_running(self):
+        return self.status in ("pending", "running")
+
+    def wait(self, timeout=None):
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def snapshot(self):
+        """
+        Returns a consistent copy of the job's progress:
+            {"job_id", "status", "error", "elapsed_seconds", "high_level_use_cases", "events", "results"}
+        `results` is the final aggregate dict once the job has completed, else None.
+        """
+        with self._lock:
+            partial = self._stream.results or {}
+            end = self.finished_at or time.time()
+            return {
+                "job_id": self.job_id,
+                "status": self.status,
+                "error": self.error,
+                "elapsed_seconds": end - self.started_at if self.started_at else 0.0,
+                "high_level_use_cases": partial.get("high_level_use_cases"),
+                "events": list(self._events),
+                "results": partial if self.status == "completed" else None,
+            }
+
+# --- Example Usage ---
+if __name__ == "__main__":
+    from main_orchestrator import MainOrchestrator
+    orchestrator = MainOrchestrator(conceptual_semantic_model_path="semantic_model.yaml")
+    job = PipelineJob(orchestrator, "Claims must be paid to valid claimants. Policies need active coverages.").start()
+    while job.is_running:
+        progress = job.snapshot()
+        print(f"[{progress['status']}] {len(progress['events'])} events after {progress['elapsed_seconds']:.2f}s")
+        time.sleep(0.2)
+    final = job.snapshot()
+    print(f"Job {final['status']}: {len(final['events'])} events, errors: {final['results']['errors'] if final['results'] else final['error']}")
@@ -0,0 +1,359 @@
+# query_admission.py
+
+from sql_validator import KEYWORDS, iter_sql_tokens, referenced_tables
+
+# Approximate stored bytes per value, used when only row counts are known.
+_TYPE_WIDTHS = {"VARCHAR": 24, "STRING": 24, "TEXT": 24, "CHAR": 8, "DATE": 4, "BOOLEAN": 1}
+_DEFAULT_WIDTH = 8
+_UNKNOWN_ROW_WIDTH = 100
+_SIGNIFICANT_SKIP = ("ws", "line_comment", "block_comment")
+
+class QueryEstimate:
+    """
+    Estimated cost of one query.
+      scanned_bytes: bytes read from the tables (EXPLAIN's bytesAssigned, or the tables' sizes);
+      join_rows:     rows produced by joining the tables along their foreign keys;
+      cost_bytes:    scanned_bytes plus the bytes of join output beyond the largest input, the figure
+                     that is ordered on and charged against the budget.
+    """
+    __slots__ = ("sql", "tables", "scanned_bytes", "join_rows", "cost_bytes", "source")
+
+    def __init__(self, sql, tables, scanned_bytes, join_rows, cost_bytes, source):
+        self.sql = sql
+        self.tables = tables
+        self.scanned_bytes = scanned_bytes
+        self.join_rows = join_rows
+        self.cost_bytes = cost_bytes
+        self.source = source # "explain" or "statistics"
+
+    def __repr__(self):
+        return f"QueryEstimate({self.cost_bytes:,} bytes from {self.source}, tables={self.tables})"
+
+class ScheduledQuery:
+    """
+    One query's admission decision: action is "run", "sample" (run sql_to_run, which reads a sample
+    of sample_percent percent) or "defer" (not run in this run).
+    """
+    __slots__ = ("index", "sql", "estimate", "action", "sql_to_run", "sample_percent")
+
+    def __init__(self, index, sql, estimate, action="run", sql_to_run=None, sample_percent=None):
+        self.index = index
+        self.sql = sql
+        self.estimate = estimate
+        self.action = action
+        self.sql_to_run = sql_to_run or sql
+        self.sample_percent = sample_percent
+
+def add_table_sample(sql_query, percent):
+    """
+    Rewrites a query over a single table to read a block sample of it:
+    `FROM Claims c` -> `FROM Claims c SAMPLE SYSTEM (10)`. Block sampling skips micro-partitions, so it
+    lowers the bytes scanned (row sampling would still read the whole table).
+
+    Returns:
+        str: The rewritten query, or None if the query does not read exactly one table through a single
+             top-level FROM clause (joins, subqueries and existing samples are left alone).
+    """
+    tables = referenced_tables(sql_query)
+    if not tables or len(tables) != 1:
+        return None
+    tokens = list(iter_sql_tokens(sql_query))
+    significant = [i for i, (kind, _) in enumerate(tokens) if kind not in _SIGNIFICANT_SKIP]
+    lowers = [tokens[i][1].lower() for i in significant]
+    if any(word in ("sample", "tablesample", "join", "select") for word in lowers[1:]) or lowers.count("from") != 1:
+        return None
+    position = lowers.index("from") + 1
+    # Table name, possibly qualified (db.schema.table)
+    if position >= len(significant) or tokens[significant[position]][0] not in ("ident", "quoted"):
+        return None
+    while position + 2 < len(significant) and lowers[position + 1] == "." \
+            and tokens[significant[position + 2]][0] in ("ident", "quoted"):
+        position += 2
+    # Optional alias, with or without AS
+    following = position + 1
+    if following + 1 < len(significant) and lowers[following] == "as":
+        position = following + 1
+    elif following < len(significant) and tokens[significant[following]][0] in ("ident", "quoted") \
+            and lowers[following] not in KEYWORDS:
+        position = following
+    insert_at = significant[position] + 1
+    return "".join(text for _, text in tokens[:insert_at]) + f" SAMPLE SYSTEM ({percent:g})" + \
+           "".join(text for _, text in tokens[insert_at:])
+
+class QueryAdmissionController:
+    """
+    Cost-aware admission control in front of Agent 3. For each run it estimates every query's cost,
+    orders the queries shortest-job-first so cheap checks are not stuck behind an expensive join, and
+    admits them against a per-run budget. Queries that no longer fit are deferred, or with
+    over_budget="sample" rewritten to read a block sample small enough to fit.
+
+    Costs come from Snowflake's EXPLAIN (bytes assigned to each table scan, after partition pruning;
+    compiled without running) when the connection supports it, otherwise from table statistics
+    (INFORMATION_SCHEMA.TABLES, or COUNT(*) per table). Join output is estimated from the semantic
+    model's foreign keys: joining a parent keeps the row count, joining a child multiplies it by the
+    average number of children per parent, and joining a table with no key path multiplies it by the
+    table's rows (a cross join).
+    """
+
+    def __init__(self, semantic_model=None, max_bytes=None, max_credits=None, over_budget="defer",
+                 min_sample_percent=1.0, use_explain=True, warehouse_credits_per_hour=1.0,
+                 scan_bytes_per_second=200_000_000):
+        """
+        semantic_model (SemanticModel): Foreign keys for join fan-out and column types for row widths.
+                                        Without it joins are assumed to be many-to-one.
+        max_bytes (int): Per-run budget of estimated bytes processed. None for no byte budget.
+        max_credits (float): Per-run budget in warehouse credits, converted to bytes with the two settings
+                             below. With both budgets, the smaller applies.
+        over_budget (str): "defer" skips queries that do not fit the remaining budget; "sample" first tries
+                           to run single-table queries on a SAMPLE SYSTEM block sample that fits.
+        min_sample_percent (float): Smallest sample worth running; smaller fits are deferred.
+        use_explain (bool): If True, EXPLAIN is used where the connection supports it.
+        warehouse_credits_per_hour (float): Credit rate of the warehouse (1 for X-Small).
+        scan_bytes_per_second (int): Assumed scan throughput of the warehouse.
+        """
+        if over_budget not in ("defer", "sample"):
+            raise ValueError(f"over_budget must be 'defer' or 'sample', not {over_budget!r}.")
+        self.semantic_model = semantic_model
+        self.over_budget = over_budget
+        self.min_sample_percent = min_sample_percent
+        self.use_explain = use_explain
+        self.warehouse_credits_per_hour = warehouse_credits_per_hour
+        self.scan_bytes_per_second = scan_bytes_per_second
+        budgets = [b for b in (max_bytes, self.credits_to_bytes(max_credits) if max_credits is not None else None)
+                   if b is not None]
+        self.budget_bytes = min(budgets) if budgets else None
+        self.last_report = None
+        self._statistics = {} # table name (lower) -> (rows, bytes); kept across runs, see refresh_statistics()
+        self._information_schema = None
+        self._explain_available = None
+
+    def credits_to_bytes(self, credits):
+        return int(credits / self.warehouse_credits_per_hour * 3600 * self.scan_bytes_per_second)
+
+    def bytes_to_credits(self, cost_bytes):
+        return cost_bytes / self.scan_bytes_per_second / 3600 * self.warehouse_credits_per_hour
+
+    def refresh_statistics(self):
+        """
+        Forgets the cached table statistics, e.g. after a data load.
+        """
+        self._statistics = {}
+
+    @staticmethod
+    def _fetch(connection, sql_query):
+        cursor = connection.cursor()
+        try:
+            cursor.execute(sql_query)
+            headers = [d[0] for d in cursor.description] if cursor.description else []
+            return headers, cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def _row_width(self, table_name):
+        table = self.semantic_model.get_table(table_name) if self.semantic_model is not None else None
+        if table is None:
+            return _UNKNOWN_ROW_WIDTH
+        return sum(_TYPE_WIDTHS.get((c.data_type or "VARCHAR").upper().split("(")[0], _DEFAULT_WIDTH)
+                   for c in table.columns) or _UNKNOWN_ROW_WIDTH
+
+    def _load_statistics(self, connection, tables):
+        """
+        Fills the statistics cache for the given tables: from INFORMATION_SCHEMA.TABLES (one metadata query)
+        when available, else with a COUNT(*) per table and the semantic model's row width.
+        """
+        missing = [t for t in tables if t.lower() not in self._statistics]
+        if missing and self._information_schema is not False:
+            try:
+                _, rows = self._fetch(connection, "SELECT TABLE_NAME, ROW_COUNT, BYTES FROM INFORMATION_SCHEMA.TABLES "
+                                                  "WHERE TABLE_SCHEMA = CURRENT_SCHEMA()")
+                for name, row_count, size in rows:
+                    self._statistics[str(name).lower()] = (int(row_count or 0), int(size or 0))
+                self._information_schema = True
+            except Exception:
+                self._information_schema = False
+        for table in missing:
+            if table.lower() in self._statistics:
+                continue
+            try:
+                _, rows = self._fetch(connection, f"SELECT COUNT(*) FROM {table}")
+                row_count = int(rows[0][0] or 0)
+                self._statistics[table.lower()] = (row_count, row_count * self._row_width(table))
+            except Exception:
+                self._statistics[table.lower()] = (0, 0) # Unknown table: the query fails fast, so it costs nothing
+
+    def _explain_bytes(self, connection, sql_query):
+        """
+        Bytes assigned to the table scans of the query's plan, or None if EXPLAIN is unavailable.
+        """
+        if not self.use_explain or self._explain_available is False:
+            return None
+        if self._explain_available is None:
+            try:
+                self._fetch(connection, "EXPLAIN USING TABULAR SELECT 1")
+                self._explain_available = True
+            except Exception:
+                self._explain_available = False
+                print("Admission control: EXPLAIN is not available on this connection; estimating costs from table statistics.")
+                return None
+        try:
+            headers, rows = self._fetch(connection, f"EXPLAIN USING TABULAR {sql_query.strip().rstrip(';')}")
+        except Exception:
+            return None # e.g. the query does not compile; statistics still give an estimate
+        columns = {h.lower(): i for i, h in enumerate(headers)}
+        if "bytesassigned" not in columns:
+            return None
+        operation = columns.get("operation")
+        return sum(int(row[columns["bytesassigned"]] or 0) for row in rows
+                   if operation is None or str(row[operation]).lower() == "tablescan")
+
+    def _join_rows(self, tables):
+        """
+        Estimated rows produced by joining the tables along the semantic model's foreign keys. Tables are
+        joined in query order, except that a table with a key path to the tables joined so far goes first.
+        """
+        rows_of = lambda t: self._statistics.get(t.lower(), (0, 0))[0]
+        rows = rows_of(tables[0])
+        joined = [tables[0].lower()]
+        pending = [t.lower() for t in tables[1:]]
+        while pending:
+            if self.semantic_model is None:
+                rows = max(rows, rows_of(pending.pop(0)))
+                continue
+            key = next((t for t in pending if any(j in self.semantic_model.adjacency.get(t, {}) for j in joined)), pending[0])
+            pending.remove(key)
+            neighbours = self.semantic_model.adjacency.get(key, {})
+            partner = next((t for t in joined if t in neighbours), None)
+            if partner is None:
+                rows *= max(1, rows_of(key)) # No key path: every row meets every row
+            elif any(r.from_table.lower() == key for r in neighbours[partner]):
+                rows = rows * rows_of(key) / max(1, rows_of(partner)) # Child: fan-out of children per parent
+            # Parent: each row matches one parent row, so the count is unchanged
+            joined.append(key)
+        return int(rows)
+
+    def estimate(self, connection, sql_query):
+        """
+        Returns a QueryEstimate for one query.
+        """
+        tables = referenced_tables(sql_query) or []
+        self._load_statistics(connection, tables)
+        scanned = self._explain_bytes(connection, sql_query)
+        source = "explain"
+        if scanned is None:
+            scanned = sum(self._statistics[t.lower()][1] for t in tables)
+            source = "statistics"
+        if not tables:
+            return QueryEstimate(sql_query, tables, scanned, 0, scanned, source)
+        join_rows = self._join_rows(tables)
+        sizes = [self._statistics[t.lower()] for t in tables]
+        largest = max(rows for rows, _ in sizes)
+        row_width = sum(size for _, size in sizes) / max(1, sum(rows for rows, _ in sizes))
+        cost = scanned + int(max(0, join_rows - largest) * row_width)
+        return QueryEstimate(sql_query, tables, scanned, join_rows, cost, source)
+
+    def schedule(self, connection, sql_queries):
+        """
+        Estimates, orders and admits one run's queries.
+
+        Args:
+            connection: Open connection used for statistics and EXPLAIN (no query is executed).
+            sql_queries (list): Query strings.
+
+        Returns:
+            list: ScheduledQuery per query, in execution order (cheapest first; ties keep input order).
+                  last_report summarizes the decisions.
+        """
+        schedule, self.last_report = self.plan(connection, sql_queries)
+        return schedule
+
+    def plan(self, connection, sql_queries):
+        """
+        Same as schedule(), but returns the run's report instead of storing it in last_report, so one
+        controller can admit concurrent runs without them reading each other's report.
+
+        Returns:
+            tuple: (ScheduledQuery list in execution order, report dict).
+        """
+        estimates = [self.estimate(connection, sql_query) for sql_query in sql_queries]
+        order = sorted(range(len(sql_queries)), key=lambda i: estimates[i].cost_bytes)
+        remaining = self.budget_bytes
+        schedule = []
+        for index in order:
+            entry, remaining = self.admit(index, sql_queries[index], estimates[index], remaining)
+            schedule.append(entry)
+        return schedule, self.report(schedule)
+
+    def admit(self, index, sql_query, estimate, remaining):
+        """
+        Decides whether one estimated query runs, runs on a sample or is deferred.
+
+        Args:
+            index (int): Position of the query in its run.
+            sql_query (str): The query.
+            estimate (QueryEstimate): Its estimate.
+            remaining (int): Bytes left in the run's budget, or None for no budget.
+
+        Returns:
+            tuple: (ScheduledQuery, bytes left in the budget after this query).
+        """
+        entry = ScheduledQuery(index, sql_query, estimate)
+        if remaining is not None and estimate.cost_bytes > remaining:
+            entry.action = "defer"
+            percent = int(remaining / estimate.cost_bytes * 10000) / 100 # Rounded down to 0.01%
+            if self.over_budget == "sample" and percent >= self.min_sample_percent:
+                sampled_sql = add_table_sample(sql_query, percent)
+                if sampled_sql is not None:
+                    entry.action, entry.sql_to_run, entry.sample_percent = "sample", sampled_sql, percent
+                    remaining -= int(estimate.cost_bytes * percent / 100)
+        elif remaining is not None:
+            remaining -= estimate.cost_bytes
+        return entry, remaining
+
+    def report(self, schedule):
+        """
+        Summarizes one run's admission decisions.
+
+        Args:
+            schedule (list): ScheduledQuery entries, in the order they were admitted.
+
+        Returns:
+            dict: The report (not stored on the controller; schedule() keeps its latest one in last_report).
+        """
+        estimates = [e.estimate for e in schedule]
+        admitted = [e for e in schedule if e.action != "defer"]
+        admitted_bytes = sum(e.estimate.cost_bytes if e.action == "run" else int(e.estimate.cost_bytes * e.sample_percent / 100)
+                             for e in admitted)
+        report = {
+            "queries": len(schedule),
+            "budget_bytes": self.budget_bytes,
+            "estimated_bytes": sum(e.cost_bytes for e in estimates),
+            "admitted_bytes": admitted_bytes,
+            "admitted_credits": round(self.bytes_to_credits(admitted_bytes), 6),
+            "run": sum(1 for e in schedule if e.action == "run"),
+            "sampled": [{"sql": e.sql, "sample_percent": e.sample_percent, "estimated_bytes": e.estimate.cost_bytes}
+                        for e in schedule if e.action == "sample"],
+            "deferred": [{"sql": e.sql, "estimated_bytes": e.estimate.cost_bytes} for e in schedule if e.action == "defer"],
+            "estimate_sources": {source: sum(1 for e in estimates if e.source == source) for source in ("explain", "statistics")},
+        }
+        if report["sampled"] or report["deferred"]:
+            print(f"Admission control: {len(admitted)} of {len(schedule)} queries fit the budget of {self.budget_bytes:,} bytes "
+                  f"({len(report['sampled'])} sampled, {len(report['deferred'])} deferred).")
+        return report
+
+# --- Example Usage ---
+if __name__ == "__main__":
+    import os
+    from local_backend import LocalSnowflakeBackend
+    from semantic_model import load_semantic_model
+    model = load_semantic_model(os.path.join(os.path.dirname(os.path.abspath(__file__)), "semantic_model_pc_insurance.yaml"))
+    queries = [
+        "SELECT c.ClaimID, p.PolicyID FROM Claims c JOIN Policies p ON p.PolicyID = c.PolicyID WHERE c.DateOfLoss < p.EffectiveDate;",
+        "SELECT COUNT(*) FROM Customers c, ClaimPayments p;", # Accidental cross join
+        "SELECT COUNT(*) FROM Users WHERE Role IS NULL;",
+        "SELECT AVG(PaymentAmount) AS AvgPayment FROM ClaimPayments cp WHERE PaymentAmount > 0;",
+    ]
+    connection = LocalSnowflakeBackend().connect()
+    controller = QueryAdmissionController(semantic_model=model, max_bytes=2_000, over_budget="sample")
+    for entry in controller.schedule(connection, queries):
+        print(f"{entry.action:>6} {entry.estimate!r}: {entry.sql_to_run[:90]}")
+    print(controller.last_report)
@@ -0,0 +1,322 @@
+# query_result_cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from columnar_results import from_json, to_json
+from sql_validator import iter_sql_tokens, referenced_tables
+
+# Columns tried, in order, as a table's data version when the "max_column" strategy is used.
+DEFAULT_VERSION_COLUMNS = ("LastUpdatedDate", "LastModifiedDate", "ModifiedDate", "UpdatedDate", "UpdatedAt")
+
+# Functions and clauses whose value changes without any table changing: the clock, random values and
+# sampling. Results of queries using them are never cached.
+VOLATILE_FUNCTIONS = frozenset("""
+current_timestamp current_date current_time localtimestamp localtime sysdate getdate systimestamp now
+convert_timezone random randstr uniform normal zipf uuid_string seq1 seq2 seq4 seq8 sample tablesample
+""".split())
+
+def is_deterministic(sql_query):
+    """
+    True if the query's result depends only on table data, i.e. it uses none of VOLATILE_FUNCTIONS.
+    """
+    return not any(kind == "ident" and text.lower() in VOLATILE_FUNCTIONS for kind, text in iter_sql_tokens(sql_query or ""))
+
+def fingerprint_sql(sql_query, parameterize_literals=False):
+    """
+    Canonicalizes a query so that formatting differences do not defeat caching: comments are
+    dropped, whitespace is normalized, unquoted identifiers and keywords are lower-cased and
+    trailing semicolons are removed. Quoted identifiers and string literals are kept verbatim.
+
+    With parameterize_literals=True, string and numeric literals are replaced by "?" and returned
+    separately, so queries differing only in constants share a fingerprint.
+
+    Returns:
+        tuple: (fingerprint, literals)
+    """
+    parts, literals = [], []
+    for kind, text in iter_sql_tokens(sql_query or ""):
+        if kind in ("ws", "line_comment", "block_comment"):
+            continue
+        if kind == "ident":
+            parts.append(text.lower())
+        elif parameterize_literals and kind in ("string", "number"):
+            literals.append(text)
+            parts.append("?")
+        else:
+            parts.append(text)
+    while parts and parts[-1] == ";":
+        parts.pop()
+    return " ".join(parts), tuple(literals)
+
+class CacheLookup:
+    """
+    Outcome of QueryResultCache.lookup(): `result` is (headers, data) on a hit. On a miss it carries the
+    table versions read before execution, for QueryResultCache.store().
+    """
+    __slots__ = ("key", "fingerprint", "tables", "versions", "result")
+
+    def __init__(self, key, fingerprint, tables, versions, result=None):
+        self.key = key
+        self.fingerprint = fingerprint
+        self.tables = tables
+        self.versions = versions
+        self.result = result
+
+    @property
+    def hit(self):
+        return self.result is not None
+
+class QueryResultCache:
+    """
+    Persistent cache of Agent 3 query results keyed by a canonical SQL fingerprint.
+
+    Each entry records the data version of every table the query reads, probed on the same
+    connection before the query ran. A cached result is served only while all of those versions
+    are unchanged:
+      - "max_column" (default): COUNT(*) and MAX(<version column>) per table, using the first of
+        `version_columns` the table has (per the semantic model), or else the table's LAST_ALTERED time
+        from INFORMATION_SCHEMA.TABLES;
+      - "change_commit_time": Snowflake's SYSTEM$LAST_CHANGE_COMMIT_TIME('<table>') change token.
+    A row count alone would miss updates, so queries reading a table with no change token, and queries
+    that read the clock or random values (see VOLATILE_FUNCTIONS), are neither looked up nor stored.
+    Entries are stored as JSON (see columnar_results.to_json).
+    Version probes are memoized for `version_ttl_seconds`; Agent 3 expires them at the start of
+    every execute_sql_queries() run so each run re-checks its tables once.
+    """
+
+    def __init__(self, db_path="query_result_cache.sqlite", semantic_model=None, version_strategy="max_column",
+                 version_columns=DEFAULT_VERSION_COLUMNS, version_ttl_seconds=5.0, max_entries=5000,
+                 parameterize_literals=False):
+        """
+        Initializes the cache.
+        db_path (str): Path of the SQLite database file.
+        semantic_model (SemanticModel): Used to pick each table's version column.
+        version_strategy (str): "max_column" or "change_commit_time".
+        version_columns (tuple): Candidate version column names for "max_column".
+        version_ttl_seconds (float): How long a probed table version is trusted without re-probing.
+        max_entries (int): Least recently used entries beyond this count are evicted.
+        parameterize_literals (bool): Fingerprint queries with literals replaced by "?" (literal values
+                                      still take part in the cache key).
+        """
+        if version_strategy not in ("max_column", "change_commit_time"):
+            raise ValueError(f"Unknown version strategy: {version_strategy}")
+        self.db_path = db_path
+        self.semantic_model = semantic_model
+        self.version_strategy = version_strategy
+        self.version_columns = tuple(version_columns)
+        self.version_ttl_seconds = version_ttl_seconds
+        self.max_entries = max_entries
+        self.parameterize_literals = parameterize_literals
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.stores = 0
+        self.uncacheable = 0
+        self.invalidations = 0
+        self.version_probes = 0
+        self._versions = {} # table (lower) -> (probed_at, version)
+        self._probe_sql = {} # table (lower) -> probe query known to work
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS query_results ("
+            " cache_key TEXT PRIMARY KEY,"
+            " fingerprint TEXT NOT NULL,"
+            " tables TEXT NOT NULL,"
+            " versions BLOB NOT NULL,"
+            " result BLOB NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def cache_key(self, sql_query):
+        """
+        Returns (cache_key, fingerprint) for a query.
+        """
+        fingerprint, literals = fingerprint_sql(sql_query, self.parameterize_literals)
+        key = hashlib.sha256("\x00".join((fingerprint,) + literals).encode("utf-8")).hexdigest()
+        return key, fingerprint
+
+    def _version_candidates(self, table):
+        if self.version_strategy == "change_commit_time":
+            return [f"SELECT SYSTEM$LAST_CHANGE_COMMIT_TIME('{table}')"]
+        candidates = []
+        model_table = self.semantic_model.get_table(table) if self.semantic_model is not None else None
+        columns = [c for c in self.version_columns if model_table is not None and model_table.get_column(c)]
+        if model_table is None:
+            columns = list(self.version_columns[:1]) # Unknown schema: try the conventional column, then fall back
+        for column in columns[:1]:
+            candidates.append(f"SELECT COUNT(*), MAX({column}) FROM {table}")
+        if "." not in table:
+            candidates.append("SELECT LAST_ALTERED, ROW_COUNT FROM INFORMATION_SCHEMA.TABLES "
+                              f"WHERE TABLE_SCHEMA = CURRENT_SCHEMA() AND TABLE_NAME = '{table.upper()}'")
+        return candidates
+
+    def table_versions(self, tables, run_query):
+        """
+        Returns {table (lower): version} for the tables, probing through `run_query(sql) -> rows` where the
+        memoized version is missing or expired, or None if any table's version cannot be determined.
+        """
+        versions = {}
+        now = time.monotonic()
+        for table in tables:
+            name = table.lower()
+            with self._lock:
+                memo = self._versions.get(name)
+                probe_sql = self._probe_sql.get(name)
+            if memo and now - memo[0] <= self.version_ttl_seconds:
+                versions[name] = memo[1]
+                continue
+            version = None
+            for candidate in ([probe_sql] if probe_sql else self._version_candidates(table)):
+                try:
+                    version = repr(tuple(run_query(candidate)[0]))
+                except Exception:
+                    continue
+                with self._lock:
+                    self._probe_sql[name] = candidate
+                    self.version_probes += 1
+                break
+            if version is None:
+                with self._lock:
+                    self._probe_sql.pop(name, None)
+                return None
+            with self._lock:
+                self._versions[name] = (time.monotonic(), version)
+            versions[name] = version
+        return versions
+
+    def lookup(self, sql_query, run_query):
+        """
+        Looks up a query's result, checking the data version of the tables it reads.
+
+        Args:
+            sql_query (str): The query about to be executed.
+            run_query (callable): run_query(sql) -> list of rows, executing version probes on the
+                                  connection the query will run on.
+
+        Returns:
+            CacheLookup: `hit` is True when `result` holds the cached (headers, data). For a query that is
+                         not deterministic or reads a table without a change token, a miss without table
+                         versions, so store() skips it.
+        """
+        key, fingerprint = self.cache_key(sql_query)
+        tables = referenced_tables(sql_query) if is_deterministic(sql_query) else None
+        versions = self.table_versions(tables, run_query) if tables is not None else None
+        if versions is None:
+            with self._lock:
+                self.uncacheable += 1
+            return CacheLookup(key, fingerprint, tables, None)
+        with self._lock:
+            row = self._conn.execute("SELECT versions, result FROM query_results WHERE cache_key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return CacheLookup(key, fingerprint, tables, versions)
+            try:
+                cached_versions, result = from_json(row[0]), from_json(row[1])
+            except (ValueError, TypeError, KeyError):
+                cached_versions, result = None, None # Written by an older version of the cache
+            if cached_versions != versions:
+                self._conn.execute("DELETE FROM query_results WHERE cache_key = ?", (key,))
+                self._conn.commit()
+                self.stale += 1
+                self.misses += 1
+                return CacheLookup(key, fingerprint, tables, versions)
+            self._conn.execute("UPDATE query_results SET last_used_at = ? WHERE cache_key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return CacheLookup(key, fingerprint, tables, versions, result=tuple(result))
+
+    def store(self, lookup, headers, data):
+        """
+        Caches a successful result under the table versions recorded by the preceding lookup().
+        Results of queries whose tables or versions could not be determined are not cached.
+        """
+        if lookup.hit or lookup.versions is None or lookup.tables is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_results (cache_key, fingerprint, tables, versions, result, created_at, last_used_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (lookup.key, lookup.fingerprint, json.dumps(sorted(t.lower() for t in lookup.tables)),
+                 to_json(lookup.versions), to_json((headers, data)), now, now),
+            )
+            self.stores += 1
+            count = self._conn.execute("SELECT COUNT(*) FROM query_results").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM query_results WHERE cache_key IN ("
+                    " SELECT cache_key FROM query_results ORDER BY last_used_at ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def expire_versions(self):
+        """
+        Forgets memoized table versions so the next lookups re-probe them.
+        """
+        with self._lock:
+            self._versions.clear()
+
+    def invalidate(self, tables=None):
+        """
+        Drops cached results that read any of the given tables, or every cached result when tables is None.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        with self._lock:
+            if tables is None:
+                removed = self._conn.execute("DELETE FROM query_results").rowcount
+                self._versions.clear()
+            else:
+                targets = {t.lower() for t in tables}
+                keys = [key for key, entry_tables in self._conn.execute("SELECT cache_key, tables FROM query_results")
+                        if targets & set(json.loads(entry_tables))]
+                self._conn.executemany("DELETE FROM query_results WHERE cache_key = ?", [(k,) for k in keys])
+                removed = len(keys)
+                for table in targets:
+                    self._versions.pop(table, None)
+            self._conn.commit()
+            self.invalidations += max(removed, 0)
+            return max(removed, 0)
+
+    def invalidate_query(self, sql_query):
+        """
+        Drops the cached result of one query (matched by fingerprint). Returns True if an entry was removed.
+        """
+        key, _ = self.cache_key(sql_query)
+        with self._lock:
+            removed = self._conn.execute("DELETE FROM query_results WHERE cache_key = ?", (key,)).rowcount
+            self._conn.commit()
+            self.invalidations += removed
+            return removed > 0
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM query_results").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "uncacheable": self.uncacheable,
+            "invalidations": self.invalidations,
+            "version_probes": self.version_probes,
+            "entries": entries,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
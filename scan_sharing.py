@@ -0,0 +1,278 @@
+# scan_sharing.py
+
+from columnar_results import ColumnarResult
+from sql_validator import KEYWORDS, iter_sql_tokens
+
+AGGREGATES = frozenset(("count", "count_if", "sum", "min", "max", "avg"))
+# Top-level clauses that make a query return something other than one aggregate row over its FROM clause.
+_UNSHAREABLE = frozenset(("with", "group", "having", "order", "limit", "offset", "fetch", "qualify", "union", "intersect",
+                          "except", "minus", "distinct", "top", "sample", "tablesample", "connect", "start", "pivot",
+                          "unpivot", "match_recognize", "over"))
+
+class _Tok:
+    __slots__ = ("kind", "text", "lower", "depth")
+
+    def __init__(self, kind, text, depth):
+        self.kind = kind
+        self.text = text
+        self.lower = text.lower() if kind in ("ident", "quoted") else text
+        self.depth = depth
+
+def _lex(sql_query):
+    """
+    Significant tokens with their parenthesis depth; the original text (including quoting) is kept.
+    Returns None for unbalanced parentheses.
+    """
+    tokens, depth = [], 0
+    for kind, text in iter_sql_tokens(sql_query):
+        if kind in ("ws", "line_comment", "block_comment"):
+            continue
+        if text == ")":
+            depth -= 1
+            if depth < 0:
+                return None
+        tokens.append(_Tok(kind, text, depth))
+        if text == "(":
+            depth += 1
+    return tokens if depth == 0 else None
+
+def render(tokens):
+    """
+    Joins tokens back into SQL text with conventional spacing.
+    """
+    parts = []
+    previous = None
+    for token in tokens:
+        if previous is not None and not (
+                token.text in (",", ")", ".", "::") or previous.text in ("(", ".", "::") or
+                (token.text == "(" and previous.kind in ("ident", "quoted") and previous.lower not in KEYWORDS)):
+            parts.append(" ")
+        parts.append(token.text)
+        previous = token
+    return "".join(parts)
+
+def _split_top_level(tokens, separator=","):
+    items, current = [], []
+    base = tokens[0].depth if tokens else 0
+    for token in tokens:
+        if token.text == separator and token.depth == base:
+            items.append(current)
+            current = []
+        else:
+            current.append(token)
+    items.append(current)
+    return items
+
+class _SelectItem:
+    __slots__ = ("tokens", "header", "calls")
+
+    def __init__(self, tokens, header, calls):
+        self.tokens = tokens # expression tokens
+        self.header = header # output column name
+        self.calls = calls   # [(start, end)] token ranges of the aggregate calls, end exclusive
+
+def _parse_select_item(tokens):
+    if not tokens:
+        return None
+    header = None
+    if len(tokens) > 2 and tokens[-2].lower == "as" and tokens[-1].kind in ("ident", "quoted"):
+        header, tokens = tokens[-1].text, tokens[:-2]
+    elif len(tokens) > 1 and tokens[-1].kind in ("ident", "quoted") and tokens[-1].lower not in KEYWORDS \
+            and (tokens[-2].text == ")" or tokens[-2].kind in ("ident", "quoted", "number", "string")):
+        header, tokens = tokens[-1].text, tokens[:-1] # implicit alias, e.g. "COUNT(*) total"
+    if header is not None and header.startswith('"'):
+        header = header[1:-1].replace('""', '"')
+    calls = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        if token.kind == "ident" and token.lower in AGGREGATES and following is not None and following.text == "(":
+            end = i + 2
+            while tokens[end].text != ")" or tokens[end].depth != following.depth:
+                end += 1
+            arguments = tokens[i + 2:end]
+            if not arguments or any(t.lower in AGGREGATES or t.lower == "select" for t in arguments) \
+                    or len(_split_top_level(arguments)) != 1:
+                return None # nested aggregates, subqueries or multi-argument forms are not rewritten
+            calls.append((i, end + 1))
+            i = end + 1
+            continue
+        if token.kind == "quoted" or (token.kind == "ident" and token.lower not in KEYWORDS and
+                                      not (following is not None and following.text == "(")):
+            return None # a column outside an aggregate would need GROUP BY
+        i += 1
+    if not calls:
+        return None
+    return _SelectItem(tokens, header if header is not None else render(tokens), calls)
+
+class AggregateQuery:
+    """
+    A query of the form SELECT <aggregates> FROM <source> [WHERE <predicate>], which returns exactly one row
+    and can therefore share a scan with other such queries over the same source.
+    """
+    __slots__ = ("sql", "source", "source_key", "predicate", "items")
+
+    def __init__(self, sql, source, predicate, items):
+        self.sql = sql
+        self.source = source                  # FROM clause text (table, or tables with their joins)
+        self.source_key = " ".join(source.lower().split())
+        self.predicate = predicate            # WHERE clause text or None
+        self.items = items                    # [_SelectItem]
+
+    @property
+    def headers(self):
+        return [item.header for item in self.items]
+
+    def conditional_expressions(self):
+        """
+        The select expressions with every aggregate restricted to this query's predicate, so they can be
+        computed over a scan that also feeds other queries:
+        COUNT(*) -> COUNT_IF(p), COUNT_IF(c) -> COUNT_IF((p) AND (c)), AGG(x) -> AGG(CASE WHEN p THEN x END).
+        """
+        expressions = []
+        for item in self.items:
+            if self.predicate is None:
+                expressions.append(render(item.tokens))
+                continue
+            parts, position = [], 0
+            for start, end in item.calls:
+                parts.append(render(item.tokens[position:start]))
+                name = item.tokens[start].text
+                arguments = item.tokens[start + 2:end - 1]
+                distinct = arguments[0].lower == "distinct"
+                argument = render(arguments[1:] if distinct else arguments)
+                if item.tokens[start].lower == "count" and argument == "*":
+                    parts.append(f"COUNT_IF({self.predicate})")
+                elif item.tokens[start].lower == "count_if":
+                    parts.append(f"{name}(({self.predicate}) AND ({argument}))")
+                else:
+                    parts.append(f"{name}({'DISTINCT ' if distinct else ''}CASE WHEN {self.predicate} THEN {argument} END)")
+                position = end
+            parts.append(render(item.tokens[position:]))
+            expressions.append(" ".join(p for p in parts if p).replace("( ", "(").replace(" )", ")"))
+        return expressions
+
+def parse_aggregate_query(sql_query):
+    """
+    Returns an AggregateQuery if the query can share a scan, otherwise None.
+    """
+    if not isinstance(sql_query, str):
+        return None
+    tokens = _lex(sql_query)
+    if not tokens:
+        return None
+    while tokens and tokens[-1].text == ";":
+        tokens.pop()
+    if not tokens or tokens[0].lower != "select" or any(t.text == ";" for t in tokens):
+        return None
+    if any(t.lower in _UNSHAREABLE and (t.depth == 0 or t.lower == "over") for t in tokens if t.kind == "ident"):
+        return None
+    from_index = next((i for i, t in enumerate(tokens) if t.depth == 0 and t.lower == "from"), None)
+    if from_index is None or from_index == 1:
+        return None
+    where_index = next((i for i, t in enumerate(tokens) if i > from_index and t.depth == 0 and t.lower == "where"), None)
+    source = tokens[from_index + 1:where_index]
+    if not source or any(t.text == "(" for t in source):
+        return None # derived tables and table functions are left alone
+    predicate = tokens[where_index + 1:] if where_index is not None else None
+    if where_index is not None and not predicate:
+        return None
+    items = [_parse_select_item(item) for item in _split_top_level(tokens[1:from_index])]
+    if not items or any(item is None for item in items):
+        return None
+    return AggregateQuery(sql_query, render(source), f"({render(predicate)})" if predicate else None, items)
+
+class ScanGroup:
+    """
+    Several aggregate queries over the same source answered by one combined query.
+    """
+    __slots__ = ("source", "members", "queries", "sql", "slices")
+
+    def __init__(self, source, members, queries):
+        self.source = source
+        self.members = members # indices into the planned query list
+        self.queries = queries # AggregateQuery per member
+        columns, self.slices = [], []
+        for number, query in enumerate(queries):
+            start = len(columns)
+            columns.extend(f"{expression} AS Q{number}_C{position}"
+                           for position, expression in enumerate(query.conditional_expressions()))
+            self.slices.append((start, len(columns)))
+        predicates = []
+        for query in queries:
+            if query.predicate is None:
+                predicates = None # One member needs every row
+                break
+            if query.predicate not in predicates:
+                predicates.append(query.predicate)
+        where = f"\nWHERE {' OR '.join(predicates)}" if predicates else ""
+        self.sql = "SELECT " + ",\n       ".join(columns) + f"\nFROM {self.source}{where}"
+
+    def split(self, headers, data):
+        """
+        Splits the combined one-row result into one (headers, data) result per member, in member order.
+        Returns None if the combined result does not have the expected shape.
+        """
+        if headers == ["Error"] or len(data) != 1 or len(headers) != self.slices[-1][1]:
+            return None
+        row = list(data[0])
+        return [(query.headers, ColumnarResult.from_rows(query.headers, [row[start:end]]))
+                for query, (start, end) in zip(self.queries, self.slices)]
+
+def plan_shared_scans(sql_queries, max_group_size=20):
+    """
+    Groups single-row aggregate queries (counts, NULL checks, sums, ...) that read the same table or join.
+
+    Args:
+        sql_queries (list): Query strings.
+        max_group_size (int): Maximum number of queries combined into one scan.
+
+    Returns:
+        tuple: (groups, standalone) where groups is a list of ScanGroup (each with two or more members) and
+               standalone lists the indices of queries to execute on their own.
+    """
+    by_source = {}
+    standalone = []
+    for index, sql_query in enumerate(sql_queries):
+        query = parse_aggregate_query(sql_query)
+        if query is None:
+            standalone.append(index)
+        else:
+            by_source.setdefault(query.source_key, []).append((index, query))
+    groups = []
+    for members in by_source.values():
+        for start in range(0, len(members), max(2, max_group_size)):
+            chunk = members[start:start + max(2, max_group_size)]
+            if len(chunk) == 1:
+                standalone.append(chunk[0][0])
+            else:
+                groups.append(ScanGroup(chunk[0][1].source, [i for i, _ in chunk], [q for _, q in chunk]))
+    standalone.sort()
+    return groups, standalone
+
+# --- Example Usage ---
+if __name__ == "__main__":
+    from local_backend import LocalSnowflakeBackend
+    queries = [
+        "SELECT COUNT(*) FROM Customers WHERE EmailAddress IS NULL;",
+        "SELECT COUNT(*) AS MissingPhone FROM Customers WHERE PhoneNumber IS NULL",
+        "SELECT COUNT(*) AS Customers, COUNT(DISTINCT State) AS States FROM Customers;",
+        "SELECT SUM(TotalPremium) AS ActivePremium, AVG(TotalPremium) AS AvgPremium FROM Policies WHERE Status = 'Active';",
+        "SELECT MAX(ExpirationDate) FROM Policies WHERE PolicyType = 'Auto';",
+        "SELECT PolicyID FROM Policies WHERE TotalPremium < 0;",
+    ]
+    groups, standalone = plan_shared_scans(queries)
+    connection = LocalSnowflakeBackend().connect()
+    for group in groups:
+        print(f"\n{len(group.members)} queries on {group.source} share one scan:\n{group.sql}")
+        cursor = connection.cursor()
+        cursor.execute(group.sql)
+        combined = ([d[0] for d in cursor.description], cursor.fetchall())
+        for member, (headers, data) in zip(group.members, group.split(*combined)):
+            cursor.execute(queries[member])
+            expected = cursor.fetchall()
+            print(f"  {queries[member][:60]!r}: {headers} {data.to_rows()} (alone: {expected})")
+            assert data.to_rows() == [list(row) for row in expected]
+    print(f"\nStandalone: {[queries[i] for i in standalone]}")
+    print(f"Scans saved: {sum(len(g.members) for g in groups) - len(groups)}")
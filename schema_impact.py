@@ -0,0 +1,213 @@
+# schema_impact.py
+
+from sql_validator import DATA_TYPES, KEYWORDS, SQLValidator, strip_comments, tokenize_sql
+
+def query_dependencies(sql_query, semantic_model=None):
+    """
+    Lists the tables and columns a query references. Qualified references (alias.column) are resolved
+    through the query's aliases; a bare column is attributed to the query's tables that have it in the
+    semantic model, or to all of them when none does. SELECT * and alias.* are recorded as "Table.*".
+    Names are reported with the semantic model's spelling where the table or column is known.
+
+    Args:
+        sql_query (str): The query.
+        semantic_model (SemanticModel): Optional model used to resolve bare columns and spell names.
+
+    Returns:
+        dict: {"tables": [str], "columns": ["Table.Column", ...]}, or None if the query cannot be tokenized.
+    """
+    try:
+        tokens = tokenize_sql(strip_comments(sql_query or ""))
+    except ValueError:
+        return None
+    if not tokens:
+        return None
+    cte_names = SQLValidator._cte_names(tokens)
+    table_refs, aliases, derived_aliases = SQLValidator._table_references(tokens, cte_names)
+
+    def table_name(name):
+        table = semantic_model.get_table(name) if semantic_model is not None else None
+        return table.name if table is not None else name
+
+    tables = []
+    for name in table_refs:
+        if name.lower() not in cte_names and table_name(name) not in tables:
+            tables.append(table_name(name))
+    output_aliases = {token.lower for i, token in enumerate(tokens)
+                      if token.kind == "ident" and i and tokens[i - 1].lower == "as"}
+    columns = []
+
+    def add(table, column):
+        if column != "*" and semantic_model is not None:
+            known = semantic_model.get_column(table, column)
+            column = known.name if known is not None else column
+        reference = f"{table}.{column}"
+        if reference not in columns:
+            columns.append(reference)
+
+    n = len(tokens)
+    i = 0
+    while i < n:
+        token = tokens[i]
+        previous = tokens[i - 1] if i else None
+        after_table_keyword = previous is not None and (previous.lower == "join" or previous.lower == "from"
+                                                        and SQLValidator._is_clause_from(tokens, i - 1))
+        following = tokens[i + 1] if i + 1 < n else None
+        if token.value == "*" and previous is not None and (previous.lower in ("select", "distinct") or previous.value == ","):
+            for table in tables:
+                add(table, "*")
+            i += 1
+            continue
+        if token.kind != "ident":
+            i += 1
+            continue
+        if following is not None and following.value == "." and i + 2 < n and tokens[i + 2].value != "(":
+            if i + 3 < n and tokens[i + 3].value == "." or after_table_keyword:
+                i += 3 # database.schema.table or a qualified table name
+                continue
+            qualifier, column = token.lower, tokens[i + 2].value
+            if qualifier in aliases and qualifier not in derived_aliases and qualifier not in cte_names \
+                    and (tokens[i + 2].kind == "ident" or column == "*"):
+                add(table_name(aliases[qualifier]), column)
+            i += 3
+            continue
+        if token.lower in KEYWORDS or token.lower in DATA_TYPES or (following is not None and following.value == "("):
+            i += 1
+            continue
+        if previous is not None and (after_table_keyword or previous.lower == "as" or previous.value in ("::", ".")):
+            i += 1
+            continue
+        if previous is not None and (previous.kind in ("ident", "number", "string") and previous.lower not in KEYWORDS
+                                     or previous.value == ")"):
+            i += 1 # implicit alias, e.g. "FROM Orders o" or "SUM(x) total"
+            continue
+        if token.lower in aliases or token.lower in output_aliases or token.lower in cte_names:
+            i += 1
+            continue
+        owners = [t for t in tables if semantic_model is not None and semantic_model.get_column(t, token.value) is not None]
+        for table in owners or tables:
+            add(table, token.value)
+        i += 1
+    return {"tables": tables, "columns": columns}
+
+def _column_signature(column):
+    return {"data type": column.data_type, "primary key": column.is_primary_key, "foreign key": column.references,
+            "description": column.description, "synonyms": column.synonyms}
+
+def _relationship_key(relationship):
+    return (relationship.from_table.lower(), relationship.from_column.lower(),
+            relationship.to_table.lower(), relationship.to_column.lower())
+
+class SchemaDiff:
+    """
+    Differences between two semantic models, at the granularity queries depend on:
+      - table_changes: table (lower) -> reasons affecting every query on the table (table added or removed,
+        columns added, description or synonyms changed);
+      - column_changes: (table, column) (lower) -> reasons affecting queries that reference the column
+        (removed, or its type, keys, description or synonyms changed);
+      - relationship_changes: [(table, table, reason)] affecting queries that read both tables.
+    """
+
+    def __init__(self, table_changes, column_changes, relationship_changes):
+        self.table_changes = table_changes
+        self.column_changes = column_changes
+        self.relationship_changes = relationship_changes
+
+    @property
+    def is_empty(self):
+        return not (self.table_changes or self.column_changes or self.relationship_changes)
+
+    def affects(self, dependencies):
+        """
+        Returns the reasons a query with these dependencies (see query_dependencies) must be regenerated,
+        or an empty list if it is unaffected.
+        """
+        tables = {t.lower() for t in dependencies.get("tables") or ()}
+        reasons = []
+        for table in tables:
+            reasons.extend(self.table_changes.get(table, ()))
+        for reference in dependencies.get("columns") or ():
+            table, _, column = reference.lower().rpartition(".")
+            if column == "*":
+                reasons.extend(reason for (t, _), changes in self.column_changes.items() if t == table for reason in changes)
+            else:
+                reasons.extend(self.column_changes.get((table, column), ()))
+        for first, second, reason in self.relationship_changes:
+            if first in tables and second in tables:
+                reasons.append(reason)
+        return list(dict.fromkeys(reasons))
+
+    def summary(self):
+        return {
+            "tables": {table: list(reasons) for table, reasons in self.table_changes.items()},
+            "columns": {f"{table}.{column}": list(reasons) for (table, column), reasons in self.column_changes.items()},
+            "relationships": [reason for _, _, reason in self.relationship_changes],
+        }
+
+def diff_semantic_models(old_model, new_model):
+    """
+    Compares two compiled semantic models and returns a SchemaDiff.
+    """
+    table_changes, column_changes, relationship_changes = {}, {}, []
+    for key in old_model.tables.keys() | new_model.tables.keys():
+        old_table, new_table = old_model.tables.get(key), new_model.tables.get(key)
+        if old_table is None:
+            table_changes[key] = [f"table {new_table.name} added"]
+            continue
+        if new_table is None:
+            table_changes[key] = [f"table {old_table.name} removed"]
+            continue
+        reasons = []
+        if old_table.description != new_table.description:
+            reasons.append(f"{new_table.name} description changed")
+        if old_table.synonyms != new_table.synonyms:
+            reasons.append(f"{new_table.name} synonyms changed")
+        for column_key, new_column in new_table.column_index.items():
+            old_column = old_table.column_index.get(column_key)
+            if old_column is None:
+                reasons.append(f"column {new_table.name}.{new_column.name} added")
+                continue
+            old_signature, new_signature = _column_signature(old_column), _column_signature(new_column)
+            changed = [f"{new_table.name}.{new_column.name} {field} changed" for field in new_signature
+                       if old_signature[field] != new_signature[field]]
+            if changed:
+                column_changes[(key, column_key)] = changed
+        for column_key, old_column in old_table.column_index.items():
+            if column_key not in new_table.column_index:
+                column_changes[(key, column_key)] = [f"column {old_table.name}.{old_column.name} removed"]
+        if reasons:
+            table_changes[key] = reasons
+    old_relationships = {_relationship_key(r): r for r in old_model.relationships}
+    new_relationships = {_relationship_key(r): r for r in new_model.relationships}
+    for key in old_relationships.keys() ^ new_relationships.keys():
+        change = "added" if key in new_relationships else "removed"
+        relationship = new_relationships.get(key) or old_relationships[key]
+        relationship_changes.append((key[0], key[2], f"relationship {relationship.from_table}.{relationship.from_column} -> "
+                                                     f"{relationship.to_table}.{relationship.to_column} {change}"))
+    return SchemaDiff(table_changes, column_changes, relationship_changes)
+
+# --- Example Usage ---
+if __name__ == "__main__":
+    import copy
+    import os
+    import yaml
+    from semantic_model import compile_semantic_model
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "semantic_model_pc_insurance.yaml")
+    with open(path) as f:
+        raw = yaml.safe_load(f)
+    old_model = compile_semantic_model(raw)
+    edited = copy.deepcopy(raw)
+    body = edited.get("semantic_model", edited)
+    claims = next(t for t in body["tables"] if t["name"] == "Claims")
+    claims["columns"].append({"name": "CatastropheCode", "data_type": "VARCHAR"})
+    new_model = compile_semantic_model(edited)
+
+    diff = diff_semantic_models(old_model, new_model)
+    print(f"Changes: {diff.summary()}")
+    for sql_query in [
+        "SELECT c.ClaimID, c.DateOfLoss, p.EffectiveDate FROM Claims c JOIN Policies p ON p.PolicyID = c.PolicyID WHERE c.DateOfLoss < p.EffectiveDate;",
+        "SELECT CustomerID, EmailAddress FROM Customers WHERE EmailAddress IS NULL;",
+        "SELECT COUNT(*) AS Negative FROM ClaimPayments WHERE PaymentAmount < 0;",
+    ]:
+        dependencies = query_dependencies(sql_query, old_model)
+        print(f"\n{sql_query}\n  depends on {dependencies}\n  affected by: {diff.affects(dependencies) or 'nothing'}")
@@ -0,0 +1,288 @@
+# schema_pruning.py
+
+import math
+import re
+import threading
+from collections import deque
+import yaml
+from text_similarity import tokenize
+
+_IDENTIFIER_PART = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+def identifier_tokens(identifier):
+    """
+    Splits a CamelCase / snake_case identifier into matching tokens,
+    e.g. "PolicyCoverageID" -> ["policy", "coverage", "id"].
+    """
+    return tokenize(" ".join(_IDENTIFIER_PART.findall(identifier or "")))
+
+def schema_terms(semantic_model):
+    """
+    Returns the tokens of the model's table and column names and synonyms, e.g. {"policy", "effective",
+    "date", ...}. Two use cases that differ in one of these words are about different schema objects.
+    """
+    terms = set()
+    if semantic_model is None:
+        return frozenset()
+    for table in semantic_model.tables.values():
+        terms.update(identifier_tokens(table.name))
+        for synonym in table.synonyms:
+            terms.update(tokenize(synonym))
+        for column in table.columns:
+            terms.update(identifier_tokens(column.name))
+            for synonym in column.synonyms:
+                terms.update(tokenize(synonym))
+    return frozenset(terms)
+
+def _occurrences(tokens, sequence):
+    n = len(sequence)
+    return [i for i in range(len(tokens) - n + 1) if tokens[i:i + n] == sequence] if n else []
+
+def estimate_tokens(text):
+    """
+    Rough LLM token estimate (about 4 characters per token for English and YAML).
+    """
+    return (len(text) + 3) // 4
+
+class PrunedSchema:
+    """
+    The outcome of pruning the semantic model for one use case.
+    """
+    __slots__ = ("use_case", "seed_tables", "tables", "relationships", "sub_model", "sub_model_yaml",
+                 "full_tokens", "pruned_tokens")
+
+    def __init__(self, use_case, seed_tables, tables, relationships, sub_model, sub_model_yaml, full_tokens, pruned_tokens):
+        self.use_case = use_case
+        self.seed_tables = seed_tables
+        self.tables = tables
+        self.relationships = relationships
+        self.sub_model = sub_model
+        self.sub_model_yaml = sub_model_yaml
+        self.full_tokens = full_tokens
+        self.pruned_tokens = pruned_tokens
+
+    @property
+    def tokens_saved(self):
+        return max(self.full_tokens - self.pruned_tokens, 0)
+
+    @property
+    def is_pruned(self):
+        return bool(self.tables)
+
+class SchemaPruner:
+    """
+    Works out which tables a use case touches and emits a sub-model containing only those tables,
+    closed over the FK graph so every selected table stays joinable.
+
+    Seed tables are found by matching use-case tokens against table names and synonyms (all tokens of
+    the name must appear), then, if nothing matched by name, against column names and synonyms weighted
+    by inverse document frequency so generic columns such as CreatedDate do not pull tables in.
+    Seeds are connected with a shortest-path Steiner tree approximation over `relationships`.
+    """
+
+    def __init__(self, semantic_model, column_match_ratio=0.6):
+        """
+        semantic_model (SemanticModel): The compiled model from semantic_model.load_semantic_model.
+        column_match_ratio (float): When falling back to column matches, keep tables scoring at least
+                                    this fraction of the best table's score.
+        """
+        self.model = semantic_model
+        self.column_match_ratio = column_match_ratio
+        self._table_phrases = [] # (frozenset(tokens), table key)
+        self._column_terms = {}  # token -> set of table keys
+        self._name_terms = {}    # token -> set of table keys whose name contains it
+        for key, table in semantic_model.tables.items():
+            for term in identifier_tokens(table.name):
+                self._name_terms.setdefault(term, set()).add(key)
+            for phrase in (table.name,) + tuple(table.synonyms):
+                tokens = frozenset(identifier_tokens(phrase) if phrase == table.name else tokenize(phrase))
+                if tokens:
+                    self._table_phrases.append((tokens, key))
+            for column in table.columns:
+                terms = set(identifier_tokens(column.name))
+                for synonym in column.synonyms:
+                    terms.update(tokenize(synonym))
+                for term in terms:
+                    self._column_terms.setdefault(term, set()).add(key)
+        table_count = max(len(semantic_model.tables), 1)
+        self._idf = {term: math.log(table_count / len(keys)) for term, keys in self._column_terms.items()}
+        self.full_model_yaml = self._dump(self._sub_model(list(semantic_model.tables), list(semantic_model.relationships)))
+        self.full_tokens = estimate_tokens(self.full_model_yaml)
+
+    def seed_tables(self, use_case):
+        """
+        Returns the table keys directly referenced by the use case wording.
+        """
+        tokens = set(tokenize(use_case))
+        matched = [(phrase, key) for phrase, key in self._table_phrases if phrase <= tokens]
+        seeds = {key for _, key in matched}
+        if seeds:
+            # Drop a table whose name is only a fragment of another matched table's name,
+            # e.g. Claims when the use case is about ClaimPayments, unless "claims" stands on its own.
+            seeds = {key for key in seeds if not self._is_shadowed(key, seeds, use_case)}
+            # Words left unexplained by the matched names may still name a table partially,
+            # e.g. "payments" alongside "reserves" -> ClaimPayments.
+            explained = set().union(*(phrase for phrase, _ in matched))
+            for term in tokens - explained:
+                candidates = self._name_terms.get(term, set())
+                if len(candidates) == 1:
+                    seeds |= candidates
+            return seeds
+        scores = {}
+        for term in tokens:
+            weight = self._idf.get(term, 0.0)
+            if weight <= 0:
+                continue
+            for key in self._column_terms.get(term, ()):
+                scores[key] = scores.get(key, 0.0) + weight
+        if not scores:
+            return set()
+        best = max(scores.values())
+        return {key for key, score in scores.items() if score >= best * self.column_match_ratio}
+
+    def _is_shadowed(self, key, seeds, use_case):
+        """
+        True when every mention of this table's name in the use case is part of a mention of a longer
+        matched table name, e.g. "claim" inside "claim payment" when ClaimPayments is also a seed.
+        """
+        use_case_tokens = tokenize(use_case)
+        own = identifier_tokens(self.model.tables[key].name)
+        own_positions = _occurrences(use_case_tokens, own)
+        if not own_positions:
+            return False
+        covered = set()
+        for other in seeds:
+            other_tokens = identifier_tokens(self.model.tables[other].name)
+            if other == key or len(other_tokens) <= len(own) or not set(own) < set(other_tokens):
+                continue
+            for start in _occurrences(use_case_tokens, other_tokens):
+                covered.update(range(start, start + len(other_tokens)))
+        return all(set(range(p, p + len(own))) <= covered for p in own_positions)
+
+    def connect(self, seeds):
+        """
+        Closes a set of table keys over the FK graph: repeatedly attaches the nearest remaining seed
+        to the growing tree through its shortest path. Returns (table keys, relationships).
+        """
+        seeds = [s for s in sorted(seeds) if s in self.model.tables]
+        if not seeds:
+            return [], []
+        tree = {seeds[0]}
+        remaining = set(seeds[1:])
+        while remaining:
+            path = self._shortest_path_to_any(tree, remaining)
+            if path is None:
+                # Disconnected seeds are kept on their own.
+                tree.update(remaining)
+                break
+            tree.update(path)
+            remaining -= tree
+        # Include every relationship among the selected tables so join keys are all present.
+        selected = set(tree)
+        relationships = [r for r in self.model.relationships
+                         if r.from_table.lower() in selected and r.to_table.lower() in selected]
+        return [k for k in self.model.tables if k in selected], relationships
+
+    def _shortest_path_to_any(self, sources, targets):
+        previous = {s: None for s in sources}
+        queue = deque(sources)
+        while queue:
+            current = queue.popleft()
+            for neighbour in self.model.adjacency.get(current, {}):
+                if neighbour in previous or neighbour not in self.model.tables:
+                    continue
+                previous[neighbour] = current
+                if neighbour in targets:
+                    nodes, node = [], neighbour
+                    while previous[node] is not None:
+                        nodes.append(node)
+                        node = previous[node]
+                    return nodes
+                queue.append(neighbour)
+        return None
+
+    def prune(self, use_case):
+        """
+        Returns a PrunedSchema for the use case. When no table can be identified, the PrunedSchema has
+        no tables and callers should fall back to the full semantic model.
+        """
+        seeds = self.seed_tables(use_case)
+        table_keys, relationships = self.connect(seeds)
+        if not table_keys:
+            return PrunedSchema(use_case, [], [], [], None, None, self.full_tokens, self.full_tokens)
+        sub_model = self._sub_model(table_keys, relationships)
+        sub_model_yaml = self._dump(sub_model)
+        names = [self.model.tables[k].name for k in table_keys]
+        seed_names = [self.model.tables[k].name for k in table_keys if k in seeds]
+        return PrunedSchema(use_case, seed_names, names, relationships, sub_model, sub_model_yaml,
+                            self.full_tokens, estimate_tokens(sub_model_yaml))
+
+    def _sub_model(self, table_keys, relationships):
+        tables = []
+        selected = set(table_keys)
+        for key in table_keys:
+            table = self.model.tables[key]
+            columns = []
+            for c in table.columns:
+                column = {"name": c.name, "data_type": c.data_type}
+                if c.is_primary_key:
+                    column["is_primary_key"] = True
+                if c.references and c.references[0].lower() in selected:
+                    # References to tables outside the sub-model are dropped to keep it self-contained.
+                    column["is_foreign_key"] = True
+                    column["references"] = f"{c.references[0]}.{c.references[1]}"
+                if c.synonyms:
+                    column["synonyms"] = list(c.synonyms)
+                columns.append(column)
+            entry = {"name": table.name}
+            if table.synonyms:
+                entry["synonyms"] = list(table.synonyms)
+            entry["columns"] = columns
+            tables.append(entry)
+        return {
+            "version": 1,
+            "semantic_model": {
+                "name": self.model.name,
+                "description": self.model.description,
+                "tables": tables,
+                "relationships": [
+                    {"from_table": r.from_table, "from_column": r.from_column, "to_table": r.to_table, "to_column": r.to_column}
+                    for r in relationships
+                ],
+            },
+        }
+
+    @staticmethod
+    def _dump(sub_model):
+        return yaml.safe_dump(sub_model, sort_keys=False, default_flow_style=None, width=1000)
+
+_pruners = {}
+_pruners_lock = threading.Lock()
+
+def get_schema_pruner(semantic_model):
+    """
+    Returns a SchemaPruner for the model, built once per model content hash.
+    """
+    key = semantic_model.content_hash or id(semantic_model)
+    with _pruners_lock:
+        pruner = _pruners.get(key)
+        if pruner is None:
+            pruner = SchemaPruner(semantic_model)
+            _pruners[key] = pruner
+        return pruner
+
+# --- Example Usage ---
+if __name__ == "__main__":
+    import os
+    from semantic_model import load_semantic_model
+    model = load_semantic_model(os.path.join(os.path.dirname(os.path.abspath(__file__)), "semantic_model.yaml"))
+    pruner = get_schema_pruner(model)
+    for use_case in [
+        "Check that every claim payment is made to a valid claimant on the claim.",
+        "Verify that the total premium of each policy equals the sum of its coverage premiums.",
+        "Ensure that customers with active policies have a valid email address.",
+        "Validate that billing schedule amounts due add up to the policy total premium.",
+    ]:
+        pruned = pruner.prune(use_case)
+        print(f"{use_case}\n  seeds={pruned.seed_tables} tables={pruned.tables} "
+              f"tokens {pruned.full_tokens} -> {pruned.pruned_tokens} (saved {pruned.tokens_saved})")
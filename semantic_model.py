@@ -0,0 +1,389 @@
+# semantic_model.py
+
+import hashlib
+import json
+import os
+import stat
+import threading
+from collections import deque
+import yaml
+
+# Bump when the compiled classes change shape so stale binary caches are ignored.
+COMPILED_FORMAT_VERSION = 2
+# Per-user, so no other account can plant a cache entry for a model it can predict the hash of.
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                                 "semantic_model_cache")
+# The libyaml-backed loader is an order of magnitude faster on large models when available.
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+class _Compact:
+    """
+    Base for the compiled model classes: pickles slot values as a plain tuple, which keeps models
+    small when they are sent to worker processes.
+    """
+    __slots__ = ()
+
+    def __getstate__(self):
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state):
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
+
+class Column(_Compact):
+    """
+    A compiled semantic model column.
+    """
+    __slots__ = ("name", "table", "data_type", "is_primary_key", "is_foreign_key", "references",
+                 "description", "synonyms")
+
+    def __init__(self, name, table, data_type=None, is_primary_key=False, is_foreign_key=False,
+                 references=None, description=None, synonyms=()):
+        self.name = name
+        self.table = table
+        self.data_type = data_type
+        self.is_primary_key = is_primary_key
+        self.is_foreign_key = is_foreign_key
+        self.references = references # (table_name, column_name) or None
+        self.description = description
+        self.synonyms = tuple(synonyms)
+
+    def __repr__(self):
+        return f"Column({self.table}.{self.name}, {self.data_type})"
+
+class Table(_Compact):
+    """
+    A compiled semantic model table with a case-insensitive column index.
+    """
+    __slots__ = ("name", "columns", "column_index", "primary_key", "description", "synonyms")
+
+    def __init__(self, name, columns, description=None, synonyms=()):
+        self.name = name
+        self.columns = tuple(columns)
+        self.column_index = {c.name.lower(): c for c in self.columns}
+        self.primary_key = tuple(c.name for c in self.columns if c.is_primary_key)
+        self.description = description
+        self.synonyms = tuple(synonyms)
+
+    def get_column(self, column_name):
+        return self.column_index.get(column_name.lower())
+
+    def __repr__(self):
+        return f"Table({self.name}, {len(self.columns)} columns)"
+
+class Relationship(_Compact):
+    """
+    A foreign key edge: from_table.from_column references to_table.to_column.
+    """
+    __slots__ = ("from_table", "from_column", "to_table", "to_column")
+
+    def __init__(self, from_table, from_column, to_table, to_column):
+        self.from_table = from_table
+        self.from_column = from_column
+        self.to_table = to_table
+        self.to_column = to_column
+
+    def __repr__(self):
+        return f"Relationship({self.from_table}.{self.from_column} -> {self.to_table}.{self.to_column})"
+
+class SemanticModel(_Compact):
+    """
+    A parsed, indexed semantic model. Lookups are case-insensitive dictionary hits.
+
+    Indexes:
+        tables:              table name -> Table
+        columns_by_name:     column name -> tuple of Columns with that name (across tables)
+        primary_keys:        table name -> tuple of primary key column names
+        foreign_keys:        table name -> tuple of Relationships leaving that table
+        referenced_by:       table name -> tuple of Relationships pointing at that table
+        adjacency:           table name -> {neighbour table name: tuple of Relationships}, undirected
+    """
+    __slots__ = ("name", "description", "content_hash", "tables", "relationships", "columns_by_name",
+                 "primary_keys", "foreign_keys", "referenced_by", "adjacency")
+
+    def __init__(self, name, description, tables, relationships, content_hash=None):
+        self.name = name
+        self.description = description
+        self.content_hash = content_hash
+        self.tables = {t.name.lower(): t for t in tables}
+        self.relationships = tuple(relationships)
+
+        columns_by_name = {}
+        for table in tables:
+            for column in table.columns:
+                columns_by_name.setdefault(column.name.lower(), []).append(column)
+        self.columns_by_name = {k: tuple(v) for k, v in columns_by_name.items()}
+        self.primary_keys = {t.name.lower(): t.primary_key for t in tables}
+
+        foreign_keys, referenced_by, adjacency = {}, {}, {k: {} for k in self.tables}
+        for rel in self.relationships:
+            src, dst = rel.from_table.lower(), rel.to_table.lower()
+            foreign_keys.setdefault(src, []).append(rel)
+            referenced_by.setdefault(dst, []).append(rel)
+            adjacency.setdefault(src, {}).setdefault(dst, []).append(rel)
+            adjacency.setdefault(dst, {}).setdefault(src, []).append(rel)
+        self.foreign_keys = {k: tuple(v) for k, v in foreign_keys.items()}
+        self.referenced_by = {k: tuple(v) for k, v in referenced_by.items()}
+        self.adjacency = {k: {n: tuple(r) for n, r in v.items()} for k, v in adjacency.items()}
+
+    def get_table(self, table_name):
+        return self.tables.get(table_name.lower())
+
+    def has_table(self, table_name):
+        return table_name.lower() in self.tables
+
+    def get_column(self, table_name, column_name):
+        table = self.tables.get(table_name.lower())
+        return table.get_column(column_name) if table else None
+
+    def tables_with_column(self, column_name):
+        """
+        Returns the names of all tables that have a column with this name.
+        """
+        return tuple(c.table for c in self.columns_by_name.get(column_name.lower(), ()))
+
+    def neighbours(self, table_name):
+        """
+        Returns the names of tables directly joined to this one by a relationship.
+        """
+        return tuple(self.tables[n].name for n in self.adjacency.get(table_name.lower(), {}) if n in self.tables)
+
+    def join_path(self, from_table, to_table):
+        """
+        Returns the shortest list of Relationships connecting two tables (breadth-first over the
+        FK graph), [] if they are the same table, or None if they are not connected.
+        """
+        start, goal = from_table.lower(), to_table.lower()
+        if start == goal:
+            return []
+        previous = {start: None}
+        queue = deque([start])
+        while queue:
+            current = queue.popleft()
+            for neighbour, rels in self.adjacency.get(current, {}).items():
+                if neighbour in previous:
+                    continue
+                previous[neighbour] = (current, rels[0])
+                if neighbour == goal:
+                    path = []
+                    node = goal
+                    while previous[node] is not None:
+                        node, rel = previous[node]
+                        path.append(rel)
+                    return list(reversed(path))
+                queue.append(neighbour)
+        return None
+
+    def summary(self):
+        return f"{self.name}: {len(self.tables)} tables, {sum(len(t.columns) for t in self.tables.values())} columns, {len(self.relationships)} relationships"
+
+def _parse_reference(reference):
+    if not reference or "." not in str(reference):
+        return None
+    table_name, column_name = str(reference).rsplit(".", 1)
+    return table_name.strip(), column_name.strip()
+
+def _mapping_entries(entries, section):
+    """
+    Yields the mappings in a list section of the model, warning about (and skipping) anything else.
+    """
+    if not isinstance(entries, list):
+        print(f"Warning: Ignoring semantic model '{section}': expected a list, got {type(entries).__name__}.")
+        return
+    for entry in entries:
+        if isinstance(entry, dict):
+            yield entry
+        else:
+            print(f"Warning: Skipping semantic model '{section}' entry {entry!r}: expected a mapping.")
+
+def compile_semantic_model(raw, content_hash=None):
+    """
+    Compiles the parsed YAML document of a semantic model into a SemanticModel.
+    Relationships come from the `relationships` section; column-level `references` fill in any
+    foreign keys the section does not list.
+
+    Returns:
+        SemanticModel, or None if the document is not a mapping.
+    """
+    raw = {} if raw is None else raw # An empty file is an empty model
+    if not isinstance(raw, dict):
+        return None
+    body = raw.get("semantic_model", raw) or {}
+    if not isinstance(body, dict):
+        return None
+    tables = []
+    for raw_table in _mapping_entries(body.get("tables") or [], "tables"):
+        table_name = raw_table.get("name")
+        if not table_name:
+            continue
+        columns = []
+        for raw_column in _mapping_entries(raw_table.get("columns") or [], f"{table_name}.columns"):
+            if not raw_column.get("name"):
+                continue
+            columns.append(Column(
+                name=raw_column["name"],
+                table=table_name,
+                data_type=raw_column.get("data_type"),
+                is_primary_key=bool(raw_column.get("is_primary_key")),
+                is_foreign_key=bool(raw_column.get("is_foreign_key") or raw_column.get("references")),
+                references=_parse_reference(raw_column.get("references")),
+                description=raw_column.get("description"),
+                synonyms=raw_column.get("synonyms") or (),
+            ))
+        tables.append(Table(table_name, columns, description=raw_table.get("description"),
+                            synonyms=raw_table.get("synonyms") or ()))
+
+    relationships = []
+    seen = set()
+    for raw_rel in _mapping_entries(body.get("relationships") or [], "relationships"):
+        rel = Relationship(raw_rel.get("from_table"), raw_rel.get("from_column"),
+                           raw_rel.get("to_table"), raw_rel.get("to_column"))
+        if not all((rel.from_table, rel.from_column, rel.to_table, rel.to_column)):
+            continue
+        seen.add((rel.from_table.lower(), rel.from_column.lower(), rel.to_table.lower(), rel.to_column.lower()))
+        relationships.append(rel)
+    for table in tables:
+        for column in table.columns:
+            if column.references:
+                key = (table.name.lower(), column.name.lower(), column.references[0].lower(), column.references[1].lower())
+                if key not in seen:
+                    seen.add(key)
+                    relationships.append(Relationship(table.name, column.name, *column.references))
+
+    return SemanticModel(body.get("name"), body.get("description"), tables, relationships, content_hash=content_hash)
+
+_memo = {}
+_memo_lock = threading.Lock()
+
+def load_semantic_model(path, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Loads and compiles a semantic model YAML file, once per process.
+
+    The compiled model is memoized in-process by (path, mtime, size), so repeated calls cost a
+    stat(). So are misses: a missing or unparsable file is reported once, not on every call. Across processes a compiled copy is kept in `cache_dir` under the file's content hash,
+    as plain JSON data the model is rebuilt from, so an unchanged model skips YAML parsing. The
+    directory must belong to the current user and not be writable by others; otherwise the cache
+    is not used. Pass cache_dir=None to disable it.
+
+    Returns:
+        SemanticModel, or None if the file does not exist or cannot be parsed.
+    """
+    abs_path = os.path.abspath(path)
+    try:
+        st = os.stat(abs_path)
+    except OSError:
+        with _memo_lock:
+            reported = _memo.get(abs_path) == (None, None)
+            _memo[abs_path] = (None, None)
+        if not reported:
+            print(f"Warning: Semantic model not found at {path}.")
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _memo_lock:
+        cached = _memo.get(abs_path)
+        if cached and cached[0] == stamp:
+            return cached[1] # None for a file already reported as unparsable
+
+    with open(abs_path, "rb") as f:
+        content = f.read()
+    content_hash = hashlib.sha256(content).hexdigest()
+    if cached and cached[1] is not None and cached[1].content_hash == content_hash:
+        model = cached[1] # Touched but unchanged
+    else:
+        model = _load_binary_cache(cache_dir, content_hash)
+        if model is None:
+            try:
+                raw = yaml.load(content.decode("utf-8"), Loader=_YAML_LOADER)
+            except (yaml.YAMLError, UnicodeDecodeError) as e:
+                print(f"Error parsing semantic model {path}: {e}")
+            else:
+                model = compile_semantic_model(raw, content_hash=content_hash)
+                if model is None:
+                    print(f"Error parsing semantic model {path}: expected a mapping at the top level.")
+            if model is None:
+                with _memo_lock:
+                    _memo[abs_path] = (stamp, None)
+                return None
+            _store_binary_cache(cache_dir, content_hash, model)
+    with _memo_lock:
+        _memo[abs_path] = (stamp, model)
+    return model
+
+def _binary_cache_path(cache_dir, content_hash):
+    return os.path.join(cache_dir, f"{content_hash}.v{COMPILED_FORMAT_VERSION}.json")
+
+def is_private(st):
+    """
+    True if a file or directory belongs to the current user and only the owner can write to it.
+    """
+    if not hasattr(os, "getuid"):
+        return True # No ownership model to check (Windows); the default directory is per-user
+    return st.st_uid == os.getuid() and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+def _model_to_data(model):
+    return {
+        "name": model.name,
+        "description": model.description,
+        "tables": [[t.name, t.description, list(t.synonyms),
+                    [[c.name, c.data_type, c.is_primary_key, c.is_foreign_key, list(c.references) if c.references else None,
+                      c.description, list(c.synonyms)] for c in t.columns]]
+                   for t in model.tables.values()],
+        "relationships": [[r.from_table, r.from_column, r.to_table, r.to_column] for r in model.relationships],
+    }
+
+def _model_from_data(data, content_hash):
+    tables = []
+    for name, description, synonyms, columns in data["tables"]:
+        tables.append(Table(name, [Column(column_name, name, data_type, bool(is_primary_key), bool(is_foreign_key),
+                                          tuple(references) if references else None, column_description, column_synonyms)
+                                   for column_name, data_type, is_primary_key, is_foreign_key, references,
+                                       column_description, column_synonyms in columns],
+                            description=description, synonyms=synonyms))
+    relationships = [Relationship(*relationship) for relationship in data["relationships"]]
+    return SemanticModel(data["name"], data["description"], tables, relationships, content_hash=content_hash)
+
+def _load_binary_cache(cache_dir, content_hash):
+    if not cache_dir:
+        return None
+    try:
+        if not is_private(os.stat(cache_dir)):
+            return None
+        with open(_binary_cache_path(cache_dir, content_hash), "rb") as f:
+            if not is_private(os.fstat(f.fileno())):
+                return None
+            return _model_from_data(json.load(f), content_hash)
+    except (OSError, ValueError, TypeError, KeyError, AttributeError, ImportError):
+        return None
+
+def _store_binary_cache(cache_dir, content_hash, model):
+    if not cache_dir:
+        return
+    try:
+        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+        if not is_private(os.stat(cache_dir)):
+            print(f"Warning: Not caching the semantic model in {cache_dir}: the directory is shared with other users.")
+            return
+        target = _binary_cache_path(cache_dir, content_hash)
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+            json.dump(_model_to_data(model), f, separators=(",", ":"))
+        os.replace(tmp_path, target)
+    except OSError as e:
+        print(f"Warning: Could not write semantic model cache: {e}")
+
+# --- Example Usage ---
+if __name__ == "__main__":
+    import time
+    model_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "semantic_model.yaml")
+    start = time.perf_counter()
+    model = load_semantic_model(model_path)
+    first_load = time.perf_counter() - start
+    start = time.perf_counter()
+    load_semantic_model(model_path)
+    warm_load = time.perf_counter() - start
+    print(model.summary())
+    print(f"First load: {first_load * 1000:.2f} ms, warm load: {warm_load * 1e6:.1f} us")
+    print(f"Primary key of Claims: {model.primary_keys['claims']}")
+    print(f"Tables with a PolicyID column: {model.tables_with_column('PolicyID')}")
+    print(f"Neighbours of ClaimPayments: {model.neighbours('ClaimPayments')}")
+    print(f"Join path ClaimPayments -> Customers: {model.join_path('ClaimPayments', 'Customers')}")
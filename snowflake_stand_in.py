@@ -0,0 +1,318 @@
+# snowflake_stand_in.py
+
+import enum
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+_CANCEL_QUERY = re.compile(r"^\s*SELECT\s+SYSTEM\$CANCEL_QUERY\s*\(\s*'([^']*)'\s*\)\s*;?\s*$", re.IGNORECASE)
+
+class QueryStatus(enum.Enum):
+    """Mirrors snowflake.connector.constants.QueryStatus (the states the stand-in reports)."""
+    QUEUED = "Queued"
+    RUNNING = "Running"
+    SUCCESS = "Success"
+    FAILED_WITH_ERROR = "Failed with error"
+    ABORTED = "Aborted"
+
+class _AsyncQuery:
+    """
+    Server-side state of a query submitted with execute_async.
+    """
+
+    def __init__(self, sfqid, sql_query, connection):
+        self.sfqid = sfqid
+        self.sql_query = sql_query
+        self.connection = connection
+        self.status = QueryStatus.QUEUED
+        self.description = None
+        self.rows = None
+        self.error = None
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+
+class StandInCursor:
+    """
+    Cursor mirroring the subset of snowflake.connector's cursor API used by the agents.
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._cursor = connection._db.cursor()
+        self.description = None
+        self.sfqid = None
+        self._rows = None # Buffered result of get_results_from_sfqid, served by the fetch methods
+        self._position = 0
+
+    def execute(self, sql_query, timeout=None):
+        """
+        Executes a query. `timeout` (seconds) mirrors the connector's statement timeout:
+        the query is interrupted and an Error is raised once it runs longer than that.
+        SELECT SYSTEM$CANCEL_QUERY('<query id>') cancels a query submitted with execute_async.
+        """
+        self._rows = None
+        cancel = _CANCEL_QUERY.match(sql_query)
+        if cancel:
+            message = self._connection.connector._cancel_query(cancel.group(1))
+            self.description = [(f"SYSTEM$CANCEL_QUERY('{cancel.group(1)}')",) + (None,) * 6]
+            self._rows, self._position = [(message,)], 0
+            return self
+        if self._connection.query_latency_seconds:
+            time.sleep(self._connection.query_latency_seconds)
+        db = self._connection._db
+        with self._connection._db_lock:
+            if timeout:
+                deadline = time.monotonic() + timeout
+                db.set_progress_handler(lambda: 1 if time.monotonic() > deadline else 0, 1000)
+            try:
+                self._cursor.execute(self._connection.connector.translate(sql_query))
+            except sqlite3.OperationalError as e:
+                if timeout and "interrupted" in str(e):
+                    raise StandInConnector.Error(f"Statement reached its statement timeout of {timeout} seconds and was canceled.") from e
+                raise StandInConnector.Error(str(e)) from e
+            except sqlite3.Error as e:
+                raise StandInConnector.Error(str(e)) from e
+            finally:
+                if timeout:
+                    db.set_progress_handler(None, 0)
+        self.description = self._cursor.description
+        with self._connection.connector._lock:
+            self._connection.connector.queries_executed += 1
+        return self
+
+    def execute_async(self, sql_query):
+        """
+        Submits a query without waiting for it, like the connector's execute_async. The query runs on the
+        stand-in warehouse; its ID is returned and kept in `sfqid` for get_query_status / get_results_from_sfqid.
+        """
+        self._rows = None
+        self.description = None
+        self.sfqid = self._connection.connector._submit(self._connection, sql_query)
+        return {"queryId": self.sfqid}
+
+    def get_results_from_sfqid(self, sfqid):
+        """
+        Waits for an asynchronously submitted query and makes its result available to the fetch methods.
+        Raises Error if the query failed or was canceled.
+        """
+        query = self._connection.connector._get_query(sfqid)
+        query.done.wait()
+        if query.status is not QueryStatus.SUCCESS:
+            raise StandInConnector.Error(query.error)
+        self.sfqid = sfqid
+        self.description = query.description
+        self._rows, self._position = query.rows, 0
+
+    def fetchmany(self, size=1):
+        if self._rows is not None:
+            batch = self._rows[self._position:self._position + size]
+            self._position += len(batch)
+            return batch
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        if self._rows is not None:
+            return self.fetchmany(len(self._rows))
+        return self._cursor.fetchall()
+
+    def fetchone(self):
+        if self._rows is not None:
+            batch = self.fetchmany(1)
+            return batch[0] if batch else None
+        return self._cursor.fetchone()
+
+    def close(self):
+        self._cursor.close()
+
+class StandInConnection:
+    """
+    Connection mirroring the subset of snowflake.connector's connection API used by the agents.
+    """
+
+    def __init__(self, connector, db, query_latency_seconds=0.0):
+        self.connector = connector
+        self._db = db
+        self._db_lock = threading.Lock() # Statements from execute() and asynchronous queries share the database
+        self._closed = False
+        self.query_latency_seconds = query_latency_seconds
+
+    def cursor(self):
+        return StandInCursor(self)
+
+    def get_query_status(self, sfqid):
+        """
+        Returns the QueryStatus of a query submitted with execute_async.
+        """
+        return self.connector._get_query(sfqid).status
+
+    def get_query_status_throw_if_error(self, sfqid):
+        """
+        Returns the QueryStatus of a query, raising Error if it failed or was canceled.
+        """
+        query = self.connector._get_query(sfqid)
+        if self.is_an_error(query.status):
+            raise StandInConnector.Error(query.error)
+        return query.status
+
+    @staticmethod
+    def is_still_running(status):
+        return status in (QueryStatus.QUEUED, QueryStatus.RUNNING)
+
+    @staticmethod
+    def is_an_error(status):
+        return status in (QueryStatus.FAILED_WITH_ERROR, QueryStatus.ABORTED)
+
+    def is_closed(self):
+        return self._closed
+
+    def close(self):
+        if not self._closed:
+            self.connector._cancel_connection_queries(self)
+            with self._db_lock:
+                self._db.close()
+                self._closed = True
+            self.connector.connections_closed += 1
+
+class StandInConnector:
+    """
+    Local, in-process stand-in for the snowflake.connector module, backed by SQLite.
+    Pass an instance wherever a `connector` is expected to exercise the executor offline.
+    Every connection gets its own database initialized from `setup_sql`.
+
+    Queries submitted with execute_async run on a pool of `max_concurrent_queries` threads standing in for the
+    warehouse, so the client only polls their status; queries beyond that limit wait in the QUEUED state.
+    """
+
+    class Error(Exception):
+        """Mirrors snowflake.connector.Error."""
+
+    def __init__(self, setup_sql=None, connect_latency_seconds=0.0, query_latency_seconds=0.0, max_concurrent_queries=64):
+        """
+        setup_sql (str): Optional SQL script run on every new connection (DDL and sample data).
+        connect_latency_seconds (float): Simulated connection setup and authentication cost.
+        query_latency_seconds (float): Simulated round trip added to every execute(), and run time of every
+                                       asynchronous query.
+        max_concurrent_queries (int): Asynchronous queries the stand-in warehouse runs at once.
+        """
+        self.setup_sql = setup_sql
+        self.connect_latency_seconds = connect_latency_seconds
+        self.query_latency_seconds = query_latency_seconds
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        self.connections_closed = 0
+        self.queries_executed = 0
+        self.queries_cancelled = 0
+        self.max_concurrent_queries = max(1, int(max_concurrent_queries or 1))
+        self._queries = {} # sfqid -> _AsyncQuery
+        self._warehouse = None
+
+    def translate(self, sql_query):
+        """
+        Hook for rewriting Snowflake SQL into SQLite SQL before execution. The base stand-in runs queries as-is.
+        """
+        return sql_query
+
+    def _open_database(self):
+        """
+        Hook returning the sqlite3 connection backing a new stand-in connection.
+        """
+        db = sqlite3.connect(":memory:", check_same_thread=False)
+        if self.setup_sql:
+            db.executescript(self.setup_sql)
+        return db
+
+    def connect(self, **connection_params):
+        if self.connect_latency_seconds:
+            time.sleep(self.connect_latency_seconds)
+        db = self._open_database()
+        with self._lock:
+            self.connections_opened += 1
+        return StandInConnection(self, db, self.query_latency_seconds)
+
+    def _submit(self, connection, sql_query):
+        """
+        Registers an asynchronous query and schedules it on the warehouse threads. Returns its query ID.
+        """
+        query = _AsyncQuery(str(uuid.uuid4()), sql_query, connection)
+        with self._lock:
+            if self._warehouse is None:
+                self._warehouse = ThreadPoolExecutor(max_workers=self.max_concurrent_queries,
+                                                     thread_name_prefix="stand-in-warehouse")
+            self._queries[query.sfqid] = query
+        self._warehouse.submit(self._run_async, query)
+        return query.sfqid
+
+    def _get_query(self, sfqid):
+        with self._lock:
+            query = self._queries.get(sfqid)
+        if query is None:
+            raise self.Error(f"Query {sfqid} does not exist or is not authorized.")
+        return query
+
+    def _finish(self, query, status, error=None):
+        with self._lock:
+            if query.done.is_set():
+                return
+            query.status = status
+            query.error = error
+            if status is QueryStatus.SUCCESS:
+                self.queries_executed += 1
+            elif status is QueryStatus.ABORTED:
+                self.queries_cancelled += 1
+        query.done.set()
+
+    def _run_async(self, query):
+        """
+        Runs one asynchronous query on its connection's database. Cancellation is checked while the query
+        waits for a slot, during its simulated run time and, through SQLite's progress handler, while it executes.
+        """
+        with self._lock:
+            if query.cancelled.is_set():
+                return
+            query.status = QueryStatus.RUNNING
+        if query.connection.query_latency_seconds and query.cancelled.wait(query.connection.query_latency_seconds):
+            return
+        db = query.connection._db
+        with query.connection._db_lock:
+            if query.cancelled.is_set() or query.connection.is_closed():
+                return
+            db.set_progress_handler(lambda: 1 if query.cancelled.is_set() else 0, 1000)
+            try:
+                cursor = db.cursor()
+                try:
+                    cursor.execute(self.translate(query.sql_query))
+                    query.description = cursor.description
+                    query.rows = cursor.fetchall()
+                finally:
+                    cursor.close()
+            except sqlite3.OperationalError as e:
+                if not (query.cancelled.is_set() and "interrupted" in str(e)):
+                    self._finish(query, QueryStatus.FAILED_WITH_ERROR, str(e))
+                return
+            except sqlite3.Error as e:
+                self._finish(query, QueryStatus.FAILED_WITH_ERROR, str(e))
+                return
+            finally:
+                db.set_progress_handler(None, 0)
+        self._finish(query, QueryStatus.SUCCESS)
+
+    def _cancel_query(self, sfqid):
+        """
+        Implements SYSTEM$CANCEL_QUERY: aborts a queued or running asynchronous query.
+        """
+        query = self._get_query(sfqid)
+        if query.done.is_set():
+            raise self.Error("Identified SQL statement is not currently executing.")
+        query.cancelled.set()
+        self._finish(query, QueryStatus.ABORTED, f"SQL execution canceled (query {sfqid}).")
+        return f"query [{sfqid}] terminated."
+
+    def _cancel_connection_queries(self, connection):
+        with self._lock:
+            pending = [q for q in self._queries.values() if q.connection is connection and not q.done.is_set()]
+        for query in pending:
+            query.cancelled.set()
+            self._finish(query, QueryStatus.ABORTED, "SQL execution canceled: the session was closed.")
@@ -0,0 +1,180 @@
+# sql_generation_cache.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from schema_pruning import schema_terms
+from semantic_model import load_semantic_model
+from text_similarity import normalize_text, shingles, jaccard, conflicting_terms, MinHasher, LSHIndex
+
+SHINGLE_SIZE = 2 # Word bigrams, so a changed word breaks the phrases around it
+
+def hash_file(path):
+    """
+    Returns the sha256 hex digest of a file's content, or "missing" if the file does not exist.
+    """
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return "missing"
+
+class SQLGenerationCache:
+    """
+    Persistent cache mapping use-case text to the SQL generated for it, scoped to the content hash
+    of the semantic model. Lookups first try the normalized use-case text, then a MinHash/LSH
+    near-duplicate search over word bigrams so reworded variants of a cached use case reuse its SQL.
+    A near-duplicate is rejected when the two use cases differ in a word naming a table, column or
+    synonym of the semantic model, a status value or a number ("missing effective date" is not a
+    rewording of "missing expiration date").
+    When the semantic model file changes, entries generated against the old model are purged.
+    """
+
+    def __init__(self, semantic_model_path, db_path="sql_generation_cache.sqlite", similarity_threshold=0.75,
+                 num_perm=64, bands=16):
+        """
+        Initializes the cache.
+        semantic_model_path (str): Semantic model the cached SQL was generated against.
+        db_path (str): Path of the SQLite database file.
+        similarity_threshold (float): Minimum word-bigram Jaccard similarity for a near-duplicate hit.
+        num_perm (int), bands (int): MinHash/LSH parameters.
+        """
+        self.semantic_model_path = semantic_model_path
+        self.db_path = db_path
+        self.similarity_threshold = similarity_threshold
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._hasher = MinHasher(num_perm=num_perm)
+        self._index = LSHIndex(num_perm=num_perm, bands=bands)
+        self._shingles = {}
+        self._sql = {}
+        self._lock = threading.Lock()
+        self._model_stat = None
+        self.model_hash = None
+        self._schema_terms = frozenset()
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS use_case_sql ("
+            " model_hash TEXT NOT NULL,"
+            " normalized_use_case TEXT NOT NULL,"
+            " use_case TEXT NOT NULL,"
+            " sql_query TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (model_hash, normalized_use_case))"
+        )
+        self._conn.commit()
+        with self._lock:
+            self._refresh_model_locked()
+
+    def _refresh_model_locked(self):
+        """
+        Re-hashes the semantic model when its mtime or size changed and drops stale entries.
+        """
+        try:
+            st = os.stat(self.semantic_model_path)
+            model_stat = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            model_stat = None
+        if self.model_hash is not None and model_stat == self._model_stat:
+            return
+        self._model_stat = model_stat
+        model_hash = hash_file(self.semantic_model_path)
+        if model_hash == self.model_hash:
+            return
+        cursor = self._conn.execute("DELETE FROM use_case_sql WHERE model_hash != ?", (model_hash,))
+        if cursor.rowcount > 0:
+            self.invalidations += cursor.rowcount
+            print(f"SQL generation cache: semantic model changed, invalidated {cursor.rowcount} cached queries.")
+        self._conn.commit()
+        self.model_hash = model_hash
+        self._schema_terms = schema_terms(load_semantic_model(self.semantic_model_path)) if model_hash != "missing" else frozenset()
+        self._index.clear()
+        self._shingles.clear()
+        self._sql.clear()
+        for normalized, sql_query in self._conn.execute(
+            "SELECT normalized_use_case, sql_query FROM use_case_sql WHERE model_hash = ?", (model_hash,)
+        ):
+            self._add_to_index_locked(normalized, sql_query)
+
+    def _add_to_index_locked(self, normalized, sql_query):
+        shingle_set = shingles(normalized, size=SHINGLE_SIZE)
+        self._shingles[normalized] = shingle_set
+        self._sql[normalized] = sql_query
+        self._index.add(normalized, self._hasher.signature(shingle_set))
+
+    def get(self, use_case):
+        """
+        Looks up SQL for a use case.
+
+        Returns:
+            tuple: (sql_query, match_type, similarity) where match_type is "exact" or "near",
+                   or None on a miss.
+        """
+        normalized = normalize_text(use_case)
+        with self._lock:
+            self._refresh_model_locked()
+            sql_query = self._sql.get(normalized)
+            if sql_query is not None:
+                self.exact_hits += 1
+                return sql_query, "exact", 1.0
+            shingle_set = shingles(normalized, size=SHINGLE_SIZE)
+            best_key, best_similarity = None, 0.0
+            for candidate in self._index.query(self._hasher.signature(shingle_set)):
+                similarity = jaccard(shingle_set, self._shingles[candidate])
+                if similarity > best_similarity and not conflicting_terms(normalized, candidate, self._schema_terms):
+                    best_key, best_similarity = candidate, similarity
+            if best_key is not None and best_similarity >= self.similarity_threshold:
+                self.near_hits += 1
+                return self._sql[best_key], "near", best_similarity
+            self.misses += 1
+            return None
+
+    def put(self, use_case, sql_query):
+        """
+        Stores the SQL generated for a use case under the current semantic model.
+        """
+        normalized = normalize_text(use_case)
+        with self._lock:
+            self._refresh_model_locked()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO use_case_sql (model_hash, normalized_use_case, use_case, sql_query, created_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (self.model_hash, normalized, use_case, sql_query, time.time()),
+            )
+            self._conn.commit()
+            self._add_to_index_locked(normalized, sql_query)
+
+    def invalidate(self):
+        """
+        Drops every cached query.
+        """
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM use_case_sql")
+            self._conn.commit()
+            self.invalidations += max(cursor.rowcount, 0)
+            self._index.clear()
+            self._shingles.clear()
+            self._sql.clear()
+
+    def stats(self):
+        lookups = self.exact_hits + self.near_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.near_hits) / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "entries": len(self._sql),
+            "model_hash": self.model_hash,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,415 @@
+# sql_templates.py
+
+import os
+import threading
+import yaml
+from schema_pruning import identifier_tokens
+from sql_validator import iter_sql_tokens, referenced_tables
+from text_similarity import STATUS_TERMS, tokenize
+
+DEFAULT_TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sql_templates.yaml")
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# Durations, comparisons, quantities and value-shape checks that narrow a check beyond what a rule's SQL
+# encodes. A use case with one the matched rule does not list ("reported within 30 days after the date of
+# loss", "valid email format") goes to the LLM instead, as do use cases with numbers or status values.
+QUALIFIER_TERMS = frozenset(tokenize("""
+second seconds minute minutes hour hours day days week weeks month months quarter quarters year years
+daily weekly monthly quarterly yearly annual annually business calendar
+within before after prior earlier later since until exceed exceeds greater less more fewer least most
+above below over under between maximum minimum max min limit threshold percent percentage ratio
+one two three four five six seven eight nine ten twelve hundred thousand million half twice double
+format formatted pattern regex syntax length character digit unique uniqueness duplicate duplicated distinct
+""")) | STATUS_TERMS
+
+class TokenMatcher:
+    """
+    Aho-Corasick automaton over token sequences. All patterns are found in one left-to-right pass over
+    a text's tokens, however many patterns there are.
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]] # node -> [(pattern_id, length)]
+        self._built = False
+
+    def add(self, tokens, pattern_id):
+        node = 0
+        for token in tokens:
+            next_node = self._goto[node].get(token)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][token] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append((pattern_id, len(tokens)))
+        self._built = False
+
+    def build(self):
+        queue = list(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(token, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+        self._built = True
+
+    def find(self, tokens):
+        """
+        Returns [(pattern_id, start, end)] for every occurrence, end exclusive.
+        """
+        if not self._built:
+            self.build()
+        hits = []
+        node = 0
+        for position, token in enumerate(tokens):
+            while node and token not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(token, 0)
+            for pattern_id, length in self._output[node]:
+                hits.append((pattern_id, position + 1 - length, position + 1))
+        return hits
+
+class TemplateMatch:
+    """
+    A template rule that matched a use case, with its rendered SQL.
+    """
+    __slots__ = ("rule", "sql", "score", "tables")
+
+    def __init__(self, rule, sql, score, tables):
+        self.rule = rule
+        self.sql = sql
+        self.score = score
+        self.tables = tables
+
+    def __repr__(self):
+        return f"TemplateMatch({self.rule!r}, score={self.score})"
+
+class _Rule:
+    __slots__ = ("name", "all_groups", "any_group", "tables", "entities", "priority", "sql", "read_tables", "terms")
+
+    def __init__(self, name, all_groups, any_group, tables, entities, priority, sql, read_tables, terms):
+        self.name = name
+        self.all_groups = all_groups # list of sets of phrase ids; each set needs one hit
+        self.any_group = any_group   # set of phrase ids; one hit needed when non-empty
+        self.tables = tables         # table keys that must be mentioned
+        self.entities = entities     # number of mentioned tables bound to {table}, {parent}
+        self.priority = priority
+        self.sql = sql
+        self.read_tables = read_tables # tables the fixed SQL reads
+        self.terms = terms           # qualifier tokens the rule accounts for (from its phrases and `allow`)
+
+class TemplateLibrary:
+    """
+    Declarative use-case-to-SQL rules compiled into one multi-pattern matcher.
+
+    Each rule lists keyword phrases (`all`: every entry must match, `a|b` gives alternatives; `any`: at
+    least one must match), optionally `tables` the use case must mention (by name or synonym) and a
+    number of `entities` to bind from the tables mentioned, in order, to the {table} and {parent}
+    placeholders. Phrases and table names are matched on normalized, stemmed tokens by a single
+    Aho-Corasick pass; only rules whose phrases were seen are evaluated.
+
+    SQL placeholders: {table}, {table_pk}, {parent}, {parent_pk} and {join_fk} (the column of {table}
+    referencing {parent}; rules using it only match tables with a direct foreign key).
+    A use case is answered only when exactly one best-scoring rule matches; ambiguous or unmatched use
+    cases return None so the caller can fall back to the LLM. So do use cases that ask for more than the
+    rule's SQL checks:
+      - a number or a QUALIFIER_TERMS word (durations, comparisons, formats, status values) that the rule's
+        phrases or `allow` list do not contain: "reported within 30 days after the date of loss" is not the
+        rule's "reported before the date of loss", nor are "closed claims" the rule's open ones;
+      - a column (by name or synonym) the rule's SQL does not read: "customer email addresses are unique"
+        is not a duplicate-CustomerID check. Generic `entities` rules only match use cases naming no column
+        and using no word of a column name that is not also a table word ("customer emails").
+    """
+
+    def __init__(self, rules, semantic_model=None, strict=True):
+        """
+        rules (list): Rule dicts as found under `templates:` in the YAML file.
+        semantic_model (SemanticModel): Resolves table mentions and placeholders. Rules that need tables the
+                                        model does not have are skipped and listed in self.skipped.
+        strict (bool): If False, rules match on their phrases and tables alone, without the qualifier and
+                       column checks (for keyword lookups such as canned responses).
+        """
+        self.semantic_model = semantic_model
+        self.strict = strict
+        self._matcher = TokenMatcher()
+        self._phrase_ids = {}     # token tuple -> phrase id
+        self._rules_by_phrase = {} # phrase id -> [rule index]
+        self._table_patterns = {} # pattern id -> table key
+        self._column_patterns = {} # pattern id -> lower-case names of the columns the phrase names
+        self._column_words = frozenset() # words of column names that are not table words, e.g. "email"
+        self.rules = []
+        self.skipped = []
+        for raw in rules or []:
+            rule = self._compile_rule(raw)
+            if rule is not None:
+                self.rules.append(rule)
+        self._rules_by_table = {}
+        for index, rule in enumerate(self.rules):
+            for phrase_id in set().union(rule.any_group, *rule.all_groups):
+                self._rules_by_phrase.setdefault(phrase_id, []).append(index)
+            for table in rule.tables:
+                self._rules_by_table.setdefault(table, []).append(index)
+        if semantic_model is not None:
+            column_words, table_words = set(), {"id"}
+            for key, table in semantic_model.tables.items():
+                for phrase in (table.name,) + tuple(table.synonyms):
+                    tokens = identifier_tokens(phrase) if phrase == table.name else tokenize(phrase)
+                    if tokens:
+                        self._table_patterns[self._phrase_id(tokens)] = key
+                        table_words.update(tokens)
+                for column in table.columns:
+                    for phrase in (column.name,) + tuple(column.synonyms):
+                        tokens = identifier_tokens(phrase) if phrase == column.name else tokenize(phrase)
+                        if tokens:
+                            self._column_patterns.setdefault(self._phrase_id(tokens), set()).add(column.name.lower())
+                            column_words.update(tokens)
+            self._column_words = frozenset(column_words - table_words)
+        self._matcher.build()
+
+    def _phrase_id(self, tokens):
+        key = tuple(tokens)
+        phrase_id = self._phrase_ids.get(key)
+        if phrase_id is None:
+            phrase_id = self._phrase_ids[key] = len(self._phrase_ids)
+            self._matcher.add(key, phrase_id)
+        return phrase_id
+
+    def _phrase_group(self, entry, terms=None):
+        group = set()
+        for alternative in str(entry).split("|"):
+            tokens = tokenize(alternative)
+            if tokens:
+                group.add(self._phrase_id(tokens))
+                if terms is not None:
+                    terms.update(tokens)
+        return group
+
+    def _compile_rule(self, raw):
+        """
+        Returns the compiled _Rule, or None (recording the reason in self.skipped) if the rule is unusable
+        with this semantic model.
+        """
+        name = raw.get("name") or "unnamed"
+        sql = (raw.get("sql") or "").strip()
+        if not sql:
+            self.skipped.append((name, "no SQL"))
+            return None
+        tables = []
+        for table_name in raw.get("tables") or []:
+            if self.semantic_model is None or not self.semantic_model.has_table(table_name):
+                self.skipped.append((name, f"unknown table {table_name}"))
+                return None
+            tables.append(table_name.lower())
+        entities = int(raw.get("entities") or 0)
+        if entities and self.semantic_model is None:
+            self.skipped.append((name, "entity placeholders need a semantic model"))
+            return None
+        read_tables = [] if entities else referenced_tables(sql) or []
+        if self.semantic_model is not None:
+            unknown = [t for t in read_tables if not self.semantic_model.has_table(t)]
+            if unknown:
+                self.skipped.append((name, f"unknown table {', '.join(unknown)}"))
+                return None
+        terms = set()
+        all_groups = [group for group in (self._phrase_group(entry, terms) for entry in raw.get("all") or []) if group]
+        any_group = set().union(*(self._phrase_group(entry, terms) for entry in raw.get("any") or []))
+        if not all_groups and not any_group and not tables:
+            self.skipped.append((name, "nothing to match on"))
+            return None
+        for entry in raw.get("allow") or []:
+            terms.update(tokenize(str(entry)))
+        return _Rule(name, all_groups, any_group, set(tables), entities, int(raw.get("priority") or 0), sql, read_tables,
+                     frozenset(terms))
+
+    def _mentioned_tables(self, hits):
+        """
+        Table keys mentioned in the use case in order of first mention. Where mentions overlap, the
+        longest wins, so "claim payments" names ClaimPayments rather than Claims.
+        """
+        spans = sorted(((start, end, self._table_patterns[pid]) for pid, start, end in hits if pid in self._table_patterns),
+                       key=lambda span: (span[0], -(span[1] - span[0])))
+        mentioned, covered_until = [], 0
+        for start, end, key in spans:
+            if start < covered_until:
+                continue
+            covered_until = end
+            if key not in mentioned:
+                mentioned.append(key)
+        return mentioned
+
+    def _mentioned_columns(self, hits):
+        """
+        Columns named in the use case, one set of candidate column names (lower case) per mention.
+        Overlapping mentions resolve as in _mentioned_tables, and a phrase naming a table is a table
+        mention ("policy" is not a column even if some column is called Policy).
+        """
+        spans = sorted(((start, end, pid) for pid, start, end in hits
+                        if pid in self._table_patterns or pid in self._column_patterns),
+                       key=lambda span: (span[0], -(span[1] - span[0])))
+        mentioned, covered_until = [], 0
+        for start, end, pid in spans:
+            if start < covered_until:
+                continue
+            covered_until = end
+            if pid not in self._table_patterns:
+                mentioned.append(self._column_patterns[pid])
+        return mentioned
+
+    @staticmethod
+    def _read_identifiers(sql):
+        return {text.strip('"').lower() for kind, text in iter_sql_tokens(sql) if kind in ("ident", "quoted")}
+
+    def match(self, use_case):
+        """
+        Returns the TemplateMatch for a use case, or None when no rule (or more than one equally good
+        rule) matches.
+        """
+        tokens = tokenize(use_case)
+        hits = self._matcher.find(tokens)
+        if not hits:
+            return None
+        seen = {pid for pid, _, _ in hits}
+        qualifiers, columns, column_words = set(), [], False
+        if self.strict:
+            qualifiers = {token for token in tokens if token.isdigit() or token in QUALIFIER_TERMS}
+            columns = self._mentioned_columns(hits)
+            column_words = any(token in self._column_words for token in tokens)
+        mentioned = self._mentioned_tables(hits) if self.semantic_model is not None else []
+        candidates = set()
+        for phrase_id in seen:
+            candidates.update(self._rules_by_phrase.get(phrase_id, ()))
+        for table in mentioned:
+            candidates.update(self._rules_by_table.get(table, ()))
+        best, best_key, tied = None, None, False
+        for index in candidates:
+            rule = self.rules[index]
+            if not all(group & seen for group in rule.all_groups):
+                continue
+            if rule.any_group and not rule.any_group & seen:
+                continue
+            if not rule.tables <= set(mentioned):
+                continue
+            if not qualifiers <= rule.terms:
+                continue # The use case asks for more than the rule checks
+            if rule.entities and (columns or column_words):
+                continue # A generic rule only knows the tables' keys, not the named columns
+            sql, bound = self._render(rule, mentioned)
+            if sql is None:
+                continue
+            if columns:
+                read = self._read_identifiers(sql)
+                if not all(names & read for names in columns):
+                    continue # The use case is about a column the rule's SQL does not look at
+            score = len(rule.all_groups) + len(rule.any_group & seen) + len(rule.tables) + rule.entities
+            key = (rule.priority, score)
+            if best is None or key > best_key:
+                best, best_key, tied = TemplateMatch(rule.name, sql, score, bound), key, False
+            elif key == best_key and sql != best.sql:
+                tied = True
+        return None if tied else best
+
+    def _render(self, rule, mentioned):
+        if not rule.entities:
+            return rule.sql, rule.read_tables
+        if len(mentioned) < rule.entities or self.semantic_model is None:
+            return None, None
+        tables = [self.semantic_model.get_table(key) for key in mentioned[:rule.entities]]
+        values = {"table": tables[0].name, "table_pk": _primary_key(tables[0])}
+        if len(tables) > 1:
+            child, parent = tables[0], tables[1]
+            join_fk = _foreign_key(self.semantic_model, child, parent)
+            if join_fk is None and "{join_fk}" in rule.sql:
+                # "customers referenced by policies exist" names the parent first; bind the tables the other way round.
+                child, parent = parent, child
+                join_fk = _foreign_key(self.semantic_model, child, parent)
+                if join_fk is None:
+                    return None, None
+            values.update(table=child.name, table_pk=_primary_key(child), parent=parent.name,
+                          parent_pk=_primary_key(parent), join_fk=join_fk)
+            tables = [child, parent]
+        try:
+            return rule.sql.format(**values), [t.name for t in tables]
+        except (KeyError, IndexError):
+            return None, None
+
+def _primary_key(table):
+    if table.primary_key:
+        return table.primary_key[0]
+    return table.columns[0].name if table.columns else "*"
+
+def _foreign_key(semantic_model, child, parent):
+    for relationship in semantic_model.foreign_keys.get(child.name.lower(), ()):
+        if relationship.to_table.lower() == parent.name.lower():
+            return relationship.from_column
+    return None
+
+_libraries = {}
+_libraries_lock = threading.Lock()
+
+def load_template_library(path=DEFAULT_TEMPLATES_PATH, semantic_model=None):
+    """
+    Loads and compiles a template YAML file. The compiled library is kept per process and rebuilt only
+    when the file changes or a different semantic model is used.
+    Returns None if the file is missing or cannot be parsed.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    model_key = (semantic_model.content_hash or id(semantic_model)) if semantic_model is not None else None
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, model_key)
+    with _libraries_lock:
+        library = _libraries.get(key)
+    if library is not None:
+        return library
+    try:
+        with open(path, encoding="utf-8") as f:
+            raw = yaml.load(f, Loader=_YAML_LOADER) or {}
+    except (OSError, yaml.YAMLError, UnicodeDecodeError) as e:
+        print(f"Error loading SQL templates {path}: {e}")
+        return None
+    library = TemplateLibrary(raw.get("templates") or [], semantic_model)
+    if library.skipped:
+        print(f"Warning: {len(library.skipped)} SQL template rule(s) in {path} do not fit the semantic model and were skipped: "
+              + "; ".join(f"{name} ({reason})" for name, reason in library.skipped))
+    with _libraries_lock:
+        _libraries[key] = library
+    return library
+
+# --- Example Usage ---
+if __name__ == "__main__":
+    import time
+    from semantic_model import load_semantic_model
+    model = load_semantic_model("semantic_model.yaml")
+    library = load_template_library(DEFAULT_TEMPLATES_PATH, model)
+    print(f"{len(library.rules)} rules compiled, {len(library.skipped)} skipped")
+    use_cases = [
+        "Verify that claim payments never exceed the claim reserves.",
+        "Check that every claim references an existing policy.",
+        "Ensure policyholders have an email address.",
+        "Validate that billing installments add up to the policy total premium.",
+        "Verify that historical sales data can be queried for monthly reporting.",
+        "Check that no claim is reported before its date of loss.",
+        "Check that claims are reported within 30 days after the date of loss.",
+        "Verify that customer email addresses are unique.",
+        "Check for duplicate customer emails.",
+        "Ensure that closed claims have an assigned adjuster.",
+        "Ensure customers have a valid email format.",
+    ]
+    for use_case in use_cases:
+        started = time.perf_counter()
+        result = library.match(use_case)
+        elapsed_us = (time.perf_counter() - started) * 1e6
+        print(f"{use_case}\n  -> {result} in {elapsed_us:.0f} us\n{result.sql if result else '  (falls through to Cortex)'}")
@@ -0,0 +1,629 @@
+# sql_validator.py
+
+import re
+import time
+
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<line_comment>--[^\n]*)
+  | (?P<block_comment>/\*.*?\*/)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<dollar>\$\$.*?\$\$)
+  | (?P<quoted>"(?:[^"]|"")*")
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<ident>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<cast>::)
+  | (?P<op><>|!=|>=|<=|\|\||[=<>+\-*/%])
+  | (?P<punct>[(),.;])
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+KEYWORDS = frozenset("""
+select from where and or not null is in exists between like ilike rlike as on join inner left right full outer
+cross natural group by order having limit offset asc desc distinct case when then else end union all intersect
+except minus with recursive true false interval current_date current_timestamp current_time localtimestamp
+over partition rows range unbounded preceding following current row qualify nulls first last using sample
+tablesample fetch next only top lateral escape any some both leading trailing for
+day days month months year years hour hours minute minutes second seconds week weeks quarter
+""".split())
+
+# Snowflake data types, which appear after AS in CAST(... AS type) and after ::.
+DATA_TYPES = frozenset("""
+date time timestamp timestamp_ntz timestamp_ltz timestamp_tz datetime varchar char string text number numeric
+decimal int integer bigint smallint float double real boolean variant object array binary
+""".split())
+
+READ_ONLY_STARTS = frozenset(("select", "with"))
+PLACEHOLDER_PATTERN = re.compile(r"some_table|condition_related_to_|placeholder", re.IGNORECASE)
+_CLAUSE_END = frozenset(("where", "group", "order", "having", "limit", "qualify", "union", "intersect", "except", "minus", "join",
+                         "inner", "left", "right", "full", "cross", "natural", "on", "using", "offset", "fetch"))
+
+_JOIN_WORDS = frozenset(("join", "inner", "left", "right", "full", "cross", "natural", "on", "using"))
+
+class Token:
+    __slots__ = ("kind", "value", "lower", "depth")
+
+    def __init__(self, kind, value, depth):
+        self.kind = kind
+        self.value = value
+        self.lower = value.lower()
+        self.depth = depth
+
+    def __repr__(self):
+        return f"Token({self.kind}, {self.value!r}, depth={self.depth})"
+
+class ValidationResult:
+    """
+    Outcome of validating one query: status is "valid", "repaired" or "rejected".
+    `sql` is the query to execute (the repaired text when status is "repaired").
+    """
+    __slots__ = ("original_sql", "sql", "status", "issues", "tables")
+
+    def __init__(self, original_sql, sql, status, issues, tables):
+        self.original_sql = original_sql
+        self.sql = sql
+        self.status = status
+        self.issues = issues
+        self.tables = tables
+
+    @property
+    def accepted(self):
+        return self.status != "rejected"
+
+def iter_sql_tokens(sql):
+    """
+    Yields (kind, text) for every lexical token of the SQL, including whitespace and comments,
+    so that joining the texts reproduces the input exactly.
+    """
+    for match in _TOKEN_RE.finditer(sql):
+        yield match.lastgroup, match.group()
+
+def tokenize_sql(sql):
+    """
+    Splits SQL into tokens, dropping whitespace and comments. Each token records its parenthesis depth.
+    Raises ValueError on unbalanced parentheses.
+    """
+    tokens = []
+    depth = 0
+    for match in _TOKEN_RE.finditer(sql):
+        kind = match.lastgroup
+        value = match.group()
+        if kind in ("ws", "line_comment", "block_comment"):
+            continue
+        if kind == "quoted":
+            kind, value = "ident", value[1:-1].replace('""', '"')
+        if value == ")":
+            depth -= 1
+            if depth < 0:
+                raise ValueError("unbalanced parentheses")
+        tokens.append(Token(kind, value, depth))
+        if value == "(":
+            depth += 1
+    if depth != 0:
+        raise ValueError("unbalanced parentheses")
+    return tokens
+
+def strip_comments(sql):
+    """
+    Returns the SQL with comments removed and whitespace preserved otherwise.
+    """
+    return "".join(
+        m.group() for m in _TOKEN_RE.finditer(sql) if m.lastgroup not in ("line_comment", "block_comment")
+    ).strip()
+
+class SQLValidator:
+    """
+    Offline gate between SQL generation (Agent 2) and execution (Agent 3).
+
+    Each query is tokenized and checked locally:
+      * it must be a single read-only SELECT / WITH statement without placeholder identifiers;
+      * every table in FROM / JOIN must exist in the semantic model;
+      * qualified (alias.column) and bare column references must exist on the referenced tables;
+      * joins must have a join condition (no cartesian products).
+    An unbounded SELECT * (no LIMIT) is repaired by appending a LIMIT. Everything else that fails is rejected.
+    When the semantic model has no tables, only the structural checks run.
+    """
+
+    def __init__(self, semantic_model=None, select_star_limit=100):
+        """
+        semantic_model (SemanticModel): Compiled model to check references against, or None.
+        select_star_limit (int): LIMIT appended to repair an unbounded SELECT *.
+        """
+        self.semantic_model = semantic_model
+        self.select_star_limit = select_star_limit
+        self.check_references = bool(semantic_model is not None and semantic_model.tables)
+
+    def validate(self, sql_query):
+        """
+        Validates a single query and returns a ValidationResult.
+        """
+        issues = []
+        if not isinstance(sql_query, str) or not strip_comments(sql_query).strip(" ;\n\t"):
+            return ValidationResult(sql_query, sql_query, "rejected", ["empty query or comments only"], [])
+        try:
+            tokens = tokenize_sql(sql_query)
+        except ValueError as e:
+            return ValidationResult(sql_query, sql_query, "rejected", [f"unparseable SQL: {e}"], [])
+
+        statements = self._split_statements(tokens)
+        if len(statements) != 1:
+            return ValidationResult(sql_query, sql_query, "rejected", [f"expected one statement, found {len(statements)}"], [])
+        tokens = statements[0]
+        if tokens[0].lower not in READ_ONLY_STARTS:
+            return ValidationResult(sql_query, sql_query, "rejected", [f"not a read-only query (starts with {tokens[0].value.upper()})"], [])
+
+        placeholders = sorted({t.value for t in tokens if t.kind == "ident" and PLACEHOLDER_PATTERN.search(t.value)})
+        if placeholders:
+            issues.append(f"placeholder identifiers: {', '.join(placeholders)}")
+
+        cte_names = self._cte_names(tokens)
+        table_refs, aliases, derived_aliases = self._table_references(tokens, cte_names)
+        issues.extend(self._cartesian_issues(tokens))
+
+        referenced_tables = []
+        if self.check_references:
+            for name in table_refs:
+                if name.lower() in cte_names:
+                    continue
+                if not self.semantic_model.has_table(name):
+                    issues.append(f"unknown table: {name}")
+                else:
+                    referenced_tables.append(self.semantic_model.get_table(name).name)
+            if not any(i.startswith("unknown table") for i in issues):
+                issues.extend(self._column_issues(tokens, aliases, derived_aliases, cte_names, table_refs))
+        else:
+            referenced_tables = list(table_refs)
+
+        if issues:
+            return ValidationResult(sql_query, sql_query, "rejected", issues, referenced_tables)
+
+        if self._is_unbounded_select_star(tokens):
+            repaired = strip_comments(sql_query).rstrip().rstrip(";").rstrip()
+            repaired = f"{repaired}\nLIMIT {self.select_star_limit};"
+            return ValidationResult(sql_query, repaired, "repaired",
+                                    [f"unbounded SELECT *: added LIMIT {self.select_star_limit}"], referenced_tables)
+        return ValidationResult(sql_query, sql_query, "valid", [], referenced_tables)
+
+    def validate_queries(self, sql_queries):
+        """
+        Validates a batch of queries.
+
+        Returns:
+            tuple: (accepted_queries, report) where accepted_queries is the list of queries to execute
+                   (repaired where needed, in input order) and report is a dict:
+                   {"checked": int, "valid": int, "repaired": list, "rejected": list, "elapsed_ms": float}
+                   with repaired/rejected entries of the form {"sql": str, "reasons": list}.
+        """
+        start = time.perf_counter()
+        results = [self.validate(sql_query) for sql_query in sql_queries or []]
+        return self.summarize(results, (time.perf_counter() - start) * 1000)
+
+    def summarize(self, results, elapsed_ms):
+        """
+        Builds the validate_queries() outcome from ValidationResults already computed one query at a time,
+        e.g. by a streaming pipeline.
+
+        Returns:
+            tuple: (accepted_queries, report), as for validate_queries.
+        """
+        accepted, repaired, rejected = [], [], []
+        valid_count = 0
+        for result in results:
+            sql_query = result.original_sql
+            if result.status == "rejected":
+                rejected.append({"sql": sql_query, "reasons": result.issues})
+                print(f"SQL Validator: Rejected query: {str(sql_query)[:80]!r} -> {'; '.join(result.issues)}")
+                continue
+            if result.status == "repaired":
+                repaired.append({"sql": sql_query, "repaired_sql": result.sql, "reasons": result.issues})
+                print(f"SQL Validator: Repaired query: {sql_query[:80]!r} -> {'; '.join(result.issues)}")
+            else:
+                valid_count += 1
+            accepted.append(result.sql)
+        report = {
+            "checked": len(results),
+            "valid": valid_count,
+            "repaired": repaired,
+            "rejected": rejected,
+            "elapsed_ms": elapsed_ms,
+        }
+        print(f"SQL Validator: {report['checked']} checked, {valid_count} valid, {len(repaired)} repaired, "
+              f"{len(rejected)} rejected in {report['elapsed_ms']:.2f} ms.")
+        return accepted, report
+
+    @staticmethod
+    def _split_statements(tokens):
+        statements, current = [], []
+        for token in tokens:
+            if token.value == ";" and token.depth == 0:
+                if current:
+                    statements.append(current)
+                current = []
+            else:
+                current.append(token)
+        if current:
+            statements.append(current)
+        return statements
+
+    @staticmethod
+    def _cte_names(tokens):
+        names = set()
+        if tokens[0].lower != "with":
+            return names
+        for i, token in enumerate(tokens[:-2]):
+            # WITH name AS ( ... ), name AS ( ... )
+            if token.depth == 0 and token.kind == "ident" and tokens[i + 1].lower == "as" and tokens[i + 2].value == "(":
+                names.add(token.lower)
+        return names
+
+    @staticmethod
+    def _is_clause_from(tokens, i):
+        """
+        True if the FROM at index i starts a table list, i.e. it belongs to a SELECT at its own
+        parenthesis depth rather than to a function call such as EXTRACT(YEAR FROM d) or TRIM(BOTH FROM s).
+        """
+        depth = tokens[i].depth
+        for j in range(i - 1, -1, -1):
+            if tokens[j].depth < depth:
+                return False # Reached the opening parenthesis first: FROM is a function argument
+            if tokens[j].depth == depth and tokens[j].lower in ("select", "delete"):
+                return True
+        return False
+
+    @staticmethod
+    def _table_references(tokens, cte_names):
+        """
+        Returns (table names in FROM/JOIN, alias -> table name, aliases of derived tables).
+        """
+        table_refs, aliases, derived = [], {}, set()
+        i = 0
+        n = len(tokens)
+        while i < n:
+            token = tokens[i]
+            if token.lower in ("from", "join") and token.kind == "ident" \
+                    and (token.lower == "join" or SQLValidator._is_clause_from(tokens, i)):
+                depth = token.depth
+                i += 1
+                while i < n:
+                    if tokens[i].value == "(":
+                        # Derived table: record its alias, then keep scanning inside it for nested FROM/JOIN.
+                        open_index, inner_depth = i, tokens[i].depth
+                        j = i + 1
+                        while j < n and not (tokens[j].value == ")" and tokens[j].depth == inner_depth):
+                            j += 1
+                        alias, _ = SQLValidator._read_alias(tokens, j + 1)
+                        if alias:
+                            derived.add(alias)
+                        i = open_index + 1
+                        break
+                    elif tokens[i].kind == "ident" and tokens[i].lower not in KEYWORDS:
+                        parts = [tokens[i].value]
+                        i += 1
+                        while i + 1 < n and tokens[i].value == "." and tokens[i + 1].kind == "ident":
+                            parts.append(tokens[i + 1].value)
+                            i += 2
+                        if i < n and tokens[i].value == "(":
+                            # Table function such as TABLE(FLATTEN(...)); treat like a derived table.
+                            continue
+                        name = parts[-1]
+                        table_refs.append(name)
+                        aliases[name.lower()] = name
+                        alias, i = SQLValidator._read_alias(tokens, i)
+                        if alias:
+                            aliases[alias] = name
+                    else:
+                        break
+                    if i < n and tokens[i].value == "," and tokens[i].depth == depth:
+                        i += 1
+                        continue
+                    break
+                continue
+            i += 1
+        return table_refs, aliases, derived
+
+    @staticmethod
+    def _read_alias(tokens, i):
+        if i < len(tokens) and tokens[i].lower == "as":
+            i += 1
+        if i < len(tokens) and tokens[i].kind == "ident" and tokens[i].lower not in KEYWORDS:
+            return tokens[i].lower, i + 1
+        return None, i
+
+    @staticmethod
+    def _cartesian_issues(tokens):
+        issues = []
+        n = len(tokens)
+        for i, token in enumerate(tokens):
+            if token.lower == "join":
+                previous = tokens[i - 1].lower if i else ""
+                if previous in ("cross", "natural"):
+                    if previous == "cross":
+                        issues.append("cartesian join: CROSS JOIN")
+                    continue
+                has_condition = False
+                j = i + 1
+                while j < n and tokens[j].depth >= token.depth:
+                    if tokens[j].depth == token.depth:
+                        if tokens[j].lower in ("on", "using"):
+                            has_condition = True
+                            break
+                        if tokens[j].lower in _CLAUSE_END or tokens[j].value == ",":
+                            break
+                    j += 1
+                if not has_condition:
+                    issues.append("cartesian join: JOIN without ON/USING condition")
+            elif token.lower == "from" and SQLValidator._is_clause_from(tokens, i):
+                # Comma-separated FROM list: every table must be connected to the others by an equality
+                # between columns of different tables (in WHERE, or in the ON of a later JOIN).
+                depth = token.depth
+                items, item_of = [set()], {}
+                expect_table = True
+                j = i + 1
+                while j < n and tokens[j].depth >= depth:
+                    current = tokens[j]
+                    if current.depth == depth:
+                        if current.lower in _CLAUSE_END and current.lower not in _JOIN_WORDS:
+                            break
+                        if current.value == "," or current.lower == "join":
+                            if current.value == ",":
+                                items.append(set())
+                            expect_table = True
+                        elif expect_table:
+                            names, after = SQLValidator._item_names(tokens, j)
+                            for name in names:
+                                item_of[name] = len(items) - 1
+                            items[-1].update(names)
+                            expect_table = False
+                            j = max(after, j + 1)
+                            continue
+                    j += 1
+                if len(items) < 2 or not all(items):
+                    continue # Unnamed items (e.g. LATERAL FLATTEN) cannot be checked
+                end = j
+                if j < n and tokens[j].lower == "where":
+                    end = j + 1
+                    while end < n and tokens[end].depth >= depth:
+                        if tokens[end].depth == depth and tokens[end].lower in ("group", "order", "having", "limit", "qualify",
+                                                                                "union", "intersect", "except", "minus"):
+                            break
+                        end += 1
+                parent = list(range(len(items)))
+
+                def find(x):
+                    while parent[x] != x:
+                        x = parent[x]
+                    return x
+
+                unresolved = False
+                for k in range(i + 1, end):
+                    if tokens[k].value != "=":
+                        continue
+                    left, right = SQLValidator._column_operand(tokens, k, -1), SQLValidator._column_operand(tokens, k, 1)
+                    if left is None or right is None:
+                        continue
+                    left_item, right_item = item_of.get(left), item_of.get(right)
+                    if left_item is None or right_item is None:
+                        unresolved = True # Bare column names: cannot tell which tables they belong to
+                    elif left_item != right_item:
+                        parent[find(left_item)] = find(right_item)
+                if not unresolved and len({find(x) for x in range(len(items))}) > 1:
+                    issues.append("cartesian join: comma-separated tables without a join predicate")
+        return issues
+
+    @staticmethod
+    def _item_names(tokens, i):
+        """
+        Reads the table (or derived table) starting at index i of a FROM list and returns
+        ({lower-case name and alias}, index after it).
+        """
+        n = len(tokens)
+        names = set()
+        if i < n and tokens[i].value == "(":
+            depth = tokens[i].depth
+            i += 1
+            while i < n and not (tokens[i].value == ")" and tokens[i].depth == depth):
+                i += 1
+            i += 1
+        elif i < n and tokens[i].kind == "ident" and tokens[i].lower not in KEYWORDS:
+            name = tokens[i].lower
+            i += 1
+            while i + 1 < n and tokens[i].value == "." and tokens[i + 1].kind == "ident":
+                name = tokens[i + 1].lower
+                i += 2
+            names.add(name)
+        else:
+            return names, i
+        alias, i = SQLValidator._read_alias(tokens, i)
+        if alias:
+            names.add(alias)
+        return names, i
+
+    @staticmethod
+    def _column_operand(tokens, k, direction):
+        """
+        Returns the lower-case qualifier of a qualified column (alias.column) on one side of the
+        operator at index k, "" for a bare column name, or None if that side is not a column.
+        """
+        n = len(tokens)
+        if direction < 0:
+            if k < 1 or tokens[k - 1].kind != "ident" or tokens[k - 1].lower in KEYWORDS:
+                return None
+            if k >= 3 and tokens[k - 2].value == "." and tokens[k - 3].kind == "ident":
+                if k >= 4 and tokens[k - 4].value == ".":
+                    return None # db.schema.table.column is not used in this dialect's predicates
+                return tokens[k - 3].lower
+            return "" if k < 2 or tokens[k - 2].value not in (".", "::") else None
+        if k + 1 >= n or tokens[k + 1].kind != "ident" or tokens[k + 1].lower in KEYWORDS:
+            return None
+        if k + 3 < n and tokens[k + 2].value == "." and tokens[k + 3].kind == "ident":
+            following = tokens[k + 4] if k + 4 < n else None
+            return None if following is not None and following.value in ("(", ".") else tokens[k + 1].lower
+        following = tokens[k + 2] if k + 2 < n else None
+        return None if following is not None and following.value in ("(", ".", "::") else ""
+
+    def _column_issues(self, tokens, aliases, derived_aliases, cte_names, table_refs):
+        issues = []
+        known_tables = [self.semantic_model.get_table(t) for t in table_refs if self.semantic_model.has_table(t)]
+        all_columns = set()
+        for table in known_tables:
+            all_columns.update(table.column_index)
+        # Bare identifiers can only be checked when every source is a known table.
+        bare_checkable = bool(known_tables) and not derived_aliases and not cte_names
+        output_aliases = set()
+        n = len(tokens)
+        select_depths = set() # depths of the select lists being read
+        for i, token in enumerate(tokens):
+            if token.lower == "select":
+                select_depths.add(token.depth)
+                continue
+            if token.lower == "from":
+                select_depths.discard(token.depth)
+            if token.kind != "ident" or not i:
+                continue
+            previous = tokens[i - 1]
+            if previous.lower == "as":
+                output_aliases.add(token.lower)
+            elif token.depth in select_depths and token.lower not in KEYWORDS \
+                    and (previous.value == ")" or previous.kind in ("ident", "number", "string") and previous.lower not in KEYWORDS):
+                output_aliases.add(token.lower) # implicit alias, e.g. "COUNT(*) n", referenced by ORDER BY n
+
+        reported = set()
+        i = 0
+        while i < n:
+            token = tokens[i]
+            if token.kind != "ident":
+                i += 1
+                continue
+            previous = tokens[i - 1] if i else None
+            following = tokens[i + 1] if i + 1 < n else None
+            # Qualified reference: qualifier.column
+            if following is not None and following.value == "." and i + 2 < n and tokens[i + 2].kind == "ident":
+                qualifier, column = token.lower, tokens[i + 2].value
+                if i + 3 < n and tokens[i + 3].value == "." and i + 4 < n:
+                    i += 3 # database.schema.table or schema.table.column: skip the leading part
+                    continue
+                if previous is not None and previous.lower in ("from", "join"):
+                    i += 3
+                    continue
+                table_name = aliases.get(qualifier)
+                if table_name and qualifier not in derived_aliases and qualifier not in cte_names:
+                    table = self.semantic_model.get_table(table_name)
+                    if table is not None and table.get_column(column) is None and (table.name, column.lower()) not in reported:
+                        reported.add((table.name, column.lower()))
+                        issues.append(f"unknown column: {table.name}.{column}")
+                i += 3
+                continue
+            if not bare_checkable or token.lower in KEYWORDS or token.lower in DATA_TYPES:
+                i += 1
+                continue
+            if following is not None and following.value == "(":
+                i += 1 # function call
+                continue
+            if previous is not None and (previous.lower in ("as", "from", "join") or previous.value in ("::", ".")):
+                i += 1
+                continue
+            if previous is not None and (previous.kind in ("ident", "number", "string") and previous.lower not in KEYWORDS or previous.value == ")"):
+                i += 1 # implicit alias, e.g. "FROM Orders o" or "SUM(x) total"
+                continue
+            name = token.lower
+            if name in aliases or name in output_aliases or name in all_columns or name in reported:
+                i += 1
+                continue
+            reported.add(name)
+            issues.append(f"unknown column: {token.value}")
+            i += 1
+        return issues
+
+    @staticmethod
+    def _is_unbounded_select_star(tokens):
+        has_top_level_limit = any(t.depth == 0 and t.lower in ("limit", "fetch", "top") for t in tokens)
+        if has_top_level_limit:
+            return False
+        for i, token in enumerate(tokens):
+            if token.value == "*" and token.depth == 0 and i:
+                previous = tokens[i - 1]
+                if previous.lower in ("select", "distinct") or previous.value == "," or (
+                        previous.value == "." and i >= 2 and tokens[i - 2].kind == "ident"):
+                    return True
+        return False
+
+def referenced_tables(sql_query):
+    """
+    Returns the distinct names of the tables a query reads (FROM / JOIN targets, excluding CTEs),
+    in order of first appearance, or None if the query cannot be tokenized.
+    """
+    try:
+        tokens = tokenize_sql(strip_comments(sql_query))
+    except ValueError:
+        return None
+    cte_names = SQLValidator._cte_names(tokens)
+    table_refs, _, _ = SQLValidator._table_references(tokens, cte_names)
+    names, seen = [], set()
+    for name in table_refs:
+        if name.lower() not in cte_names and name.lower() not in seen:
+            seen.add(name.lower())
+            names.append(name)
+    return names
+
+def apply_row_limit(sql_query, row_limit):
+    """
+    Pushes a row cap into a read-only query so the warehouse stops producing rows early.
+
+    A top-level LIMIT larger than row_limit is lowered to it; a query without one gets LIMIT row_limit
+    appended (before any trailing comment or semicolon). Queries that are not a single SELECT/WITH
+    statement, or whose top level already uses OFFSET, FETCH, TOP or a non-literal LIMIT, are left as-is.
+
+    Returns:
+        tuple: (sql, applied) where applied is True if the query text was changed.
+    """
+    raw = list(iter_sql_tokens(sql_query or ""))
+    significant = [] # (index into raw, depth, lower-cased text)
+    depth = 0
+    for index, (kind, text) in enumerate(raw):
+        if kind in ("ws", "line_comment", "block_comment"):
+            continue
+        if text == ")":
+            depth -= 1
+        significant.append((index, depth, text.lower() if kind == "ident" else text))
+        if text == "(":
+            depth += 1
+    while significant and significant[-1][2] == ";":
+        significant.pop()
+    if depth != 0 or not significant or significant[0][2] not in READ_ONLY_STARTS:
+        return sql_query, False
+    top_level = [(position, entry) for position, entry in enumerate(significant) if entry[1] == 0]
+    if any(entry[2] in (";", "offset", "fetch", "top") for _, entry in top_level):
+        return sql_query, False
+    limits = [position for position, entry in top_level if entry[2] == "limit"]
+    if limits:
+        value_position = limits[-1] + 1
+        if value_position >= len(significant) or raw[significant[value_position][0]][0] != "number" \
+                or "." in significant[value_position][2]:
+            return sql_query, False
+        raw_index = significant[value_position][0]
+        if int(raw[raw_index][1]) <= row_limit:
+            return sql_query, False
+        raw[raw_index] = ("number", str(row_limit))
+    else:
+        last = significant[-1][0]
+        raw.insert(last + 1, ("ident", f"\nLIMIT {row_limit}"))
+    return "".join(text for _, text in raw), True
+
+# --- Example Usage ---
+if __name__ == "__main__":
+    import os
+    from semantic_model import load_semantic_model
+    model = load_semantic_model(os.path.join(os.path.dirname(os.path.abspath(__file__)), "semantic_model.yaml"))
+    validator = SQLValidator(model)
+    sample_queries = [
+        "SELECT c.ClaimID, SUM(p.PaymentAmount) AS TotalPaid FROM Claims c JOIN ClaimPayments p ON c.ClaimID = p.ClaimID GROUP BY c.ClaimID ORDER BY TotalPaid DESC;",
+        "SELECT * FROM Policies WHERE Status = 'Active';",
+        "SELECT * FROM Some_Table WHERE condition_related_to_'Verify the accuracy of';",
+        "SELECT COUNT(*) FROM Some_Table_Related_To_VERIFY; -- Generic fallback for Verify the accuracy...",
+        "SELECT p.PolicyID, c.ClaimID FROM Policies p, Claims c;",
+        "SELECT PolicyID, PremiumTotal FROM Policies;",
+        "SELECT PolicyType, COUNT(*) n FROM Policies GROUP BY PolicyType ORDER BY n DESC;",
+        "DELETE FROM Claims;",
+    ]
+    accepted_queries, validation_report = validator.validate_queries(sample_queries)
+    print(f"\nAccepted queries: {accepted_queries}")
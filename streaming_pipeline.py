@@ -0,0 +1,356 @@
+# streaming_pipeline.py
+
+import queue
+import threading
+import time
+from instrumentation import metrics
+from sql_validator import SQLValidator
+
+_DONE = object()
+_MAX_QUERIES = 10 # Agent 2 keeps at most this many queries per run
+_EXECUTION_FAILED = (["Error"], [["Query execution failed"]])
+
+class PipelineStream:
+    """
+    One streaming run of the orchestrator pipeline. Iterating it yields (use_case, sql, result) events
+    as soon as each query has been executed, while Agent 2 is still generating the rest:
+
+        Agent 2 (generation) --bounded queue--> Agent 3 workers (execution) --bounded queue--> caller
+
+    Near-duplicate use cases are clustered first (see MainOrchestrator.cluster_use_cases); SQL is generated
+    once per cluster and every event is repeated for each use case in the cluster.
+
+    `result` is {"headers": list, "data": list} for executed queries, or None when no query was run
+    for the use case (generation failed, the query was rejected by validation, or it fell beyond the
+    10-query cap). When Agent 2 has to pad the run with generic fallback queries, they are executed
+    last and reported with the use case they were derived from.
+
+    Bounded queues provide backpressure: when the caller or Agent 3 falls behind, Agent 2 stops starting
+    new Cortex calls. Once iteration finishes, `results` holds the same dict that
+    MainOrchestrator.process_requirements_to_sql_results returns.
+
+    With a query budget, each query is estimated on arrival and charged against the run's budget by Agent 3's
+    admission controller, so it runs, runs on a sample or is deferred as in a batch run. Admission follows
+    arrival order rather than cheapest first, so a budget may admit different queries than the batch path.
+    Scan sharing, async execution and Agent 3 checkpoints do not apply: each query is executed on its own
+    as soon as it arrives.
+    """
+
+    def __init__(self, orchestrator, requirements_document_text, queue_size=4):
+        """
+        orchestrator (MainOrchestrator): Provides the agents and settings.
+        requirements_document_text (str): The content of the requirements document.
+        queue_size (int): Capacity of each queue between stages.
+        """
+        self.orchestrator = orchestrator
+        self.requirements_document_text = requirements_document_text
+        self.queue_size = max(1, int(queue_size or 1))
+        self.results = None
+        self.first_result_seconds = None
+        self.elapsed_seconds = None
+        self._started = False
+
+    def __iter__(self):
+        if self._started:
+            raise RuntimeError("A PipelineStream can only be iterated once.")
+        self._started = True
+        return self._run()
+
+    def consume(self):
+        """
+        Drains the stream and returns the aggregate results dict.
+        """
+        for _ in self:
+            pass
+        return self.results
+
+    def _run(self):
+        start = time.perf_counter()
+        agent1, agent2, agent3 = self.orchestrator.agent1, self.orchestrator.agent2, self.orchestrator.agent3
+        results = {
+            "high_level_use_cases": None,
+            "use_case_dedup": None,
+            "generated_sql_queries": None,
+            "query_dependencies": None,
+            "sql_validation_report": None,
+            "sql_execution_results": None,
+            "admission_report": None,
+            "errors": []
+        }
+        self.results = results
+
+        print("\nOrchestrator (streaming): Starting Agent 1 - Requirements Analysis...")
+        with metrics.span("stage", stage="agent1"):
+            high_level_use_cases = agent1.analyze_requirements(self.requirements_document_text)
+        if not high_level_use_cases:
+            self._fail("Orchestrator: Agent 1 failed to generate use cases.")
+            return
+        results["high_level_use_cases"] = high_level_use_cases
+        print(f"Orchestrator: Agent 1 completed. Found {len(high_level_use_cases)} use cases.")
+
+        clusters = self.orchestrator.cluster_use_cases(high_level_use_cases)
+        representatives = clusters.representatives
+        members = {} # representative -> the use cases its events are fanned out to
+        for index, representative in enumerate(representatives):
+            if isinstance(representative, str):
+                members.setdefault(representative, []).extend(clusters.members_of(index))
+        valid_use_cases = agent2._valid_use_cases(representatives)
+        if valid_use_cases is None:
+            self._fail("Orchestrator: Agent 2 failed to generate SQL queries.")
+            return
+
+        validator = SQLValidator(agent2.semantic_model) if self.orchestrator.validate_sql else None
+        print("\nOrchestrator (streaming): Starting Agent 2 and Agent 3 with overlapped generation and execution...")
+        state = _StreamState(valid_use_cases)
+        admission = agent3.admission if agent3.connection_pool is not None else None
+        if admission is not None:
+            state.remaining_bytes = admission.budget_bytes
+        self._warn_unused_features(agent3)
+        execution_queue = queue.Queue(maxsize=self.queue_size)
+        event_queue = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        workers = [threading.Thread(target=self._generation_stage,
+                                    args=(agent2, validator, state, execution_queue, event_queue, stop, agent3.max_workers),
+                                    name="pipeline-generation", daemon=True)]
+        workers += [threading.Thread(target=self._execution_stage, args=(agent3, state, execution_queue, event_queue, stop),
+                                     name=f"pipeline-execution-{i}", daemon=True) for i in range(agent3.max_workers)]
+        for worker in workers:
+            worker.start()
+        try:
+            finished = 0
+            while finished < len(workers):
+                event = event_queue.get()
+                if event is _DONE:
+                    finished += 1
+                    continue
+                if isinstance(event, BaseException):
+                    raise event
+                if event[3] is not None:
+                    state.outcomes[event[0]] = event[3]
+                    if self.first_result_seconds is None:
+                        self.first_result_seconds = time.perf_counter() - start
+                for use_case in members.get(event[1], [event[1]]):
+                    yield use_case, event[2], self._as_result(event[3], state.sample_percents.get(event[2]))
+        finally:
+            stop.set()
+
+        # Agent 2 output, identical to generate_sql_queries(): admitted queries in order, then generic fallbacks.
+        generated = [state.generated.get(i) for i in range(len(valid_use_cases))]
+        results["use_case_dedup"] = self.orchestrator._dedup_report(clusters, dict(zip(valid_use_cases, generated)))
+        generated_sql_queries = agent2._assemble_sql_queries(representatives, valid_use_cases, generated)
+        if not generated_sql_queries:
+            self._fail("Orchestrator: Agent 2 failed to generate SQL queries.")
+            return
+        results["generated_sql_queries"] = generated_sql_queries
+        results["query_dependencies"] = self.orchestrator._query_dependencies(generated_sql_queries, dict(zip(valid_use_cases, generated)))
+        print(f"Orchestrator: Agent 2 completed. Generated {len(generated_sql_queries)} SQL queries.")
+
+        admitted = sorted(state.admitted)
+        executed = [(state.validations.get(i), state.executed_sql.get(i), state.outcomes.get(i)) for i in admitted]
+        for fallback_sql in generated_sql_queries[len(admitted):]:
+            validation = validator.validate(fallback_sql) if validator else None
+            outcome = None
+            if validation is None or validation.status != "rejected":
+                sql_to_run = validation.sql if validation else fallback_sql
+                outcome = self._execute(agent3, sql_to_run, state)
+                if self.first_result_seconds is None:
+                    self.first_result_seconds = time.perf_counter() - start
+            else:
+                sql_to_run = fallback_sql
+            executed.append((validation, sql_to_run, outcome))
+            fallback_use_case = self._fallback_use_case(representatives, fallback_sql)
+            for use_case in members.get(fallback_use_case, [fallback_use_case]):
+                yield use_case, sql_to_run, self._as_result(outcome, state.sample_percents.get(sql_to_run))
+
+        if admission is not None and state.schedule:
+            results["admission_report"] = admission.report(state.schedule)
+
+        if validator is not None:
+            accepted, validation_report = validator.summarize([v for v, _, _ in executed], state.validation_ms)
+            results["sql_validation_report"] = validation_report
+            if not accepted:
+                self._fail(f"Orchestrator: All {len(generated_sql_queries)} generated SQL queries were rejected by offline validation.")
+                return
+
+        sql_execution_results = {}
+        for validation, sql_query, outcome in executed:
+            if outcome is None:
+                continue
+            sql_execution_results[sql_query] = self._as_result(outcome, state.sample_percents.get(sql_query))
+        if sql_execution_results:
+            results["sql_execution_results"] = sql_execution_results
+            print(f"Orchestrator: Agent 3 completed. Executed {len(sql_execution_results)} queries.")
+        else:
+            self._fail("Orchestrator: Agent 3 failed to execute SQL queries or process results.")
+        self.elapsed_seconds = time.perf_counter() - start
+
+    def _fail(self, error_msg):
+        print(error_msg)
+        self.results["errors"].append(error_msg)
+
+    @staticmethod
+    def _as_result(outcome, sample_percent=None):
+        if outcome is None:
+            return None
+        result = {"headers": outcome[0], "data": outcome[1]}
+        if sample_percent is not None:
+            result["sample_percent"] = sample_percent
+        return result
+
+    def _warn_unused_features(self, agent3):
+        unused = [name for name, enabled in (("scan sharing", agent3.share_scans),
+                                             ("async execution", agent3.async_execution),
+                                             ("Agent 3 checkpoints", self.orchestrator.checkpoints is not None))
+                  if enabled]
+        if unused:
+            print(f"Orchestrator (streaming): Note: {', '.join(unused)} not used; queries execute one by one as they arrive.")
+
+    @staticmethod
+    def _fallback_use_case(high_level_use_cases, fallback_sql):
+        for use_case in high_level_use_cases:
+            if isinstance(use_case, str) and use_case.strip() and f"Generic fallback for {use_case[:30]}" in fallback_sql:
+                return use_case
+        return None
+
+    @staticmethod
+    def _execute(agent3, sql_query, state):
+        """
+        Executes one query, first admitting it against the run's budget when Agent 3 has an admission controller.
+        """
+        try:
+            sql_to_run = sql_query
+            if agent3.admission is not None and agent3.connection_pool is not None:
+                with agent3.connection_pool.connection() as connection:
+                    estimate = agent3.admission.estimate(connection, sql_query)
+                with state.lock:
+                    entry, state.remaining_bytes = agent3.admission.admit(len(state.schedule), sql_query, estimate,
+                                                                          state.remaining_bytes)
+                    state.schedule.append(entry)
+                if entry.action == "defer":
+                    metrics.incr("queries_deferred", agent="agent3")
+                    return agent3._deferred_outcome(entry)
+                if entry.action == "sample":
+                    state.sample_percents[sql_query] = entry.sample_percent
+                sql_to_run = entry.sql_to_run
+            return agent3._execute_single_query_on_snowflake(sql_to_run)
+        except Exception as e:
+            print(f"Warning: SQL query failed: {e}")
+            return _EXECUTION_FAILED
+
+    @staticmethod
+    def _put(target_queue, item, stop):
+        """
+        Blocking put that gives up once the run is stopped (e.g. the caller stopped iterating).
+        """
+        while not stop.is_set():
+            try:
+                target_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _generation_stage(self, agent2, validator, state, execution_queue, event_queue, stop, execution_workers):
+        try:
+            for index, sql_query in agent2.iter_sql_for_use_cases(state.use_cases):
+                state.generated[index] = sql_query
+                state.pending.discard(index)
+                if not agent2.is_specific_sql(sql_query):
+                    state.settled.add(index)
+                    if not self._put(event_queue, (index, state.use_cases[index], sql_query, None), stop):
+                        return
+                for ready in state.release(agent2.is_specific_sql):
+                    if not self._dispatch(ready, validator, state, execution_queue, event_queue, stop):
+                        return
+            for index in state.release(agent2.is_specific_sql, final=True):
+                if not self._dispatch(index, validator, state, execution_queue, event_queue, stop):
+                    return
+        except BaseException as e:
+            self._put(event_queue, e, stop)
+        finally:
+            for _ in range(execution_workers):
+                self._put(execution_queue, _DONE, stop)
+            self._put(event_queue, _DONE, stop)
+
+    def _dispatch(self, index, validator, state, execution_queue, event_queue, stop):
+        """
+        Validates an admitted query and hands it to Agent 3, or reports it as not executed.
+        Returns False when the run has been stopped.
+        """
+        use_case, sql_query = state.use_cases[index], state.generated[index]
+        if index not in state.admitted:
+            return self._put(event_queue, (index, use_case, sql_query, None), stop)
+        sql_to_run = sql_query
+        if validator is not None:
+            started = time.perf_counter()
+            validation = validator.validate(sql_query)
+            state.validation_ms += (time.perf_counter() - started) * 1000
+            state.validations[index] = validation
+            if validation.status == "rejected":
+                state.executed_sql[index] = sql_query
+                return self._put(event_queue, (index, use_case, sql_query, None), stop)
+            sql_to_run = validation.sql
+        state.executed_sql[index] = sql_to_run
+        return self._put(execution_queue, (index, use_case, sql_to_run), stop)
+
+    def _execution_stage(self, agent3, state, execution_queue, event_queue, stop):
+        try:
+            while not stop.is_set():
+                try:
+                    item = execution_queue.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _DONE:
+                    break
+                index, use_case, sql_query = item
+                outcome = self._execute(agent3, sql_query, state)
+                if not self._put(event_queue, (index, use_case, sql_query, outcome), stop):
+                    return
+        except BaseException as e:
+            self._put(event_queue, e, stop)
+        finally:
+            self._put(event_queue, _DONE, stop)
+
+class _StreamState:
+    """
+    Bookkeeping for one streaming run. Agent 2 keeps the first 10 successful queries in use-case order,
+    so a query finished out of order is only released to Agent 3 once it is certain to be among them.
+    """
+
+    def __init__(self, use_cases):
+        self.use_cases = use_cases
+        self.generated = {}
+        self.pending = set(range(len(use_cases)))
+        self.settled = set()      # indices already reported (failed, admitted or cut off)
+        self.admitted = set()     # indices whose query is part of the final list
+        self.validations = {}
+        self.executed_sql = {}
+        self.outcomes = {}
+        self.validation_ms = 0.0
+        self.lock = threading.Lock()  # Guards the admission fields below, shared by the execution workers
+        self.remaining_bytes = None   # Budget left for this run; None for no budget
+        self.schedule = []            # ScheduledQuery per admitted or deferred query, in arrival order
+        self.sample_percents = {}     # executed sql -> sample percent, for queries run on a table sample
+
+    def release(self, is_specific_sql, final=False):
+        """
+        Returns the newly decided indices, each either admitted (within the cap) or cut off.
+        """
+        decided = []
+        successes_before, pending_before = 0, 0
+        for index in range(len(self.use_cases)):
+            if index in self.pending:
+                pending_before += 1
+                continue
+            if not is_specific_sql(self.generated.get(index)):
+                continue
+            if index not in self.settled:
+                if successes_before + pending_before < _MAX_QUERIES:
+                    self.admitted.add(index)
+                    self.settled.add(index)
+                    decided.append(index)
+                elif successes_before >= _MAX_QUERIES or final:
+                    self.settled.add(index)
+                    decided.append(index)
+            successes_before += 1
+        return decided
@@ -0,0 +1,548 @@
+# synthetic_data.py
+
+import argparse
+import csv
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from local_backend import translate_snowflake_sql
+from semantic_model import load_semantic_model
+
+DEFAULT_SEMANTIC_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "semantic_model.yaml")
+MANIFEST_NAME = "manifest.json"
+# Rows per table at scale factor 1; every table scales linearly with the scale factor, as in TPC-H.
+# Tables not listed get 1,000 rows if they have no foreign keys, else twice the rows of their largest parent.
+BASE_ROWS = {
+    "users": 100, "customers": 2000, "policies": 3000, "policycoverages": 7500, "insuredassets": 3600,
+    "policytransactions": 4500, "billingschedules": 12000, "claims": 1200, "claimants": 1500, "claimcoverages": 1500,
+    "claimreserves": 1800, "claimpayments": 3000, "claimsubrogations": 120, "claimnotes": 4800,
+}
+# Primary key prefixes used by sample_snowflake_setup_complete.sql.
+KEY_PREFIXES = {
+    "users": "USER", "customers": "CUST", "policies": "POL", "policycoverages": "PCOV", "insuredassets": "ASST",
+    "policytransactions": "PTX", "billingschedules": "BILL", "claims": "CLM", "claimants": "CLMT",
+    "claimcoverages": "CCOV", "claimreserves": "CRES", "claimpayments": "CPAY", "claimsubrogations": "SUBR",
+    "claimnotes": "CNTE",
+}
+# Categorical values by "table.column", then by column name alone.
+VALUE_DOMAINS = {
+    "users.role": ("ClaimsAdjuster", "Underwriter", "Manager", "Agent"),
+    "policies.status": ("Active", "Active", "Active", "Expired", "Cancelled", "Pending"),
+    "claims.status": ("Open", "Closed", "Closed", "Pending Investigation", "Reopened", "Denied"),
+    "billingschedules.status": ("Paid", "Paid", "Pending", "Overdue"),
+    "customertype": ("Individual", "Individual", "Individual", "Corporate"),
+    "policytype": ("Auto", "Homeowners", "Commercial Property", "General Liability", "Workers Compensation"),
+    "coveragetype": ("Liability", "Collision", "Comprehensive", "Building", "Contents", "Business Income"),
+    "assettype": ("Vehicle", "Vehicle", "Property"),
+    "transactiontype": ("New Business", "Endorsement", "Renewal", "Cancellation"),
+    "causeofloss": ("Collision with another vehicle", "Water Damage", "Fire", "Theft", "Wind/Hail", "Vandalism"),
+    "claimanttype": ("Insured", "Insured", "Third Party"),
+    "reservetype": ("Initial", "Adjustment", "Final"),
+    "status": ("Open", "Closed", "Pending", "Active"),
+    "state": ("CA", "TX", "NY", "FL", "IL", "PA", "OH", "GA", "NC", "MI"),
+    "city": ("New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Philadelphia", "San Antonio", "Dallas"),
+    "firstname": ("James", "Mary", "Robert", "Linda", "Michael", "Patricia", "John", "Jennifer", "David", "Susan"),
+    "lastname": ("Smith", "Johnson", "Williams", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez"),
+    "notetext": ("Initial assessment complete.", "Contacted claimant.", "Estimate obtained.", "Awaiting documents."),
+}
+# Row-local ordering: these columns are generated after the column they name.
+_AFTER = {"expirationdate": "effectivedate", "lastupdateddate": "createddate", "datereported": "dateofloss"}
+_STREETS = ("Maple Dr", "Pine Ln", "Cedar Rd", "Oak St", "Elm Ave", "Main St")
+_EPOCH = date(2018, 1, 1)
+_DATE_SPAN_DAYS = 7 * 365
+_MASK = (1 << 64) - 1
+_SNOWFLAKE_TYPES = {"INTEGER", "INT", "BIGINT", "NUMBER", "DECIMAL", "NUMERIC", "FLOAT", "DOUBLE", "BOOLEAN", "DATE",
+                    "TIMESTAMP", "TIMESTAMP_NTZ", "TIMESTAMP_LTZ", "TIMESTAMP_TZ", "VARCHAR", "STRING", "TEXT"}
+
+def _mix(value):
+    """
+    splitmix64: a fast, well-distributed hash of a 64-bit integer.
+    """
+    value = (value + 0x9E3779B97F4A7C15) & _MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK
+    return value ^ (value >> 31)
+
+def _salt(seed, *names):
+    return _mix(zlib.crc32("\x00".join(names).encode("utf-8")) ^ (seed * 0x100000001B3))
+
+class _ForeignKey:
+    """
+    How a foreign key column picks its parent row. Parent rows are a pure function of the child row, so
+    any process can generate any chunk of any table without looking parent keys up:
+      - hashed: parent row = mix(salt ^ row) mod parent rows;
+      - derived (via is set): the parent row of `via`'s parent, so e.g. Claims.PolicyID is the policy of
+        the claim's InsuredAssetID rather than an unrelated policy.
+    """
+    __slots__ = ("parent", "parent_rows", "salt", "via", "then")
+
+    def __init__(self, parent, parent_rows, salt, via=None, then=None):
+        self.parent = parent
+        self.parent_rows = parent_rows
+        self.salt = salt
+        self.via = via   # _ForeignKey from this table to the intermediate table
+        self.then = then # _ForeignKey from the intermediate table to the parent
+
+    def parent_row(self, row):
+        if self.via is not None:
+            return self.then.parent_row(self.via.parent_row(row))
+        return _mix(self.salt ^ row) % self.parent_rows + 1
+
+class _ColumnSpec:
+    __slots__ = ("name", "data_type", "role", "foreign_key", "key_format", "after")
+
+    def __init__(self, name, data_type, role, foreign_key=None, key_format=None, after=None):
+        self.name = name
+        self.data_type = data_type     # Upper-case base type, e.g. "VARCHAR"
+        self.role = role               # "pk", "fk" or "value"
+        self.foreign_key = foreign_key # _ForeignKey for role "fk"
+        self.key_format = key_format   # (prefix, width) of the referenced key, None for numeric keys
+        self.after = after             # Index of the column this one follows in time
+
+class TablePlan:
+    """
+    Everything a worker process needs to generate rows of one table.
+    """
+    __slots__ = ("name", "rows", "columns", "seed", "dirty_fraction")
+
+    def __init__(self, name, rows, columns, seed, dirty_fraction):
+        self.name = name
+        self.rows = rows
+        self.columns = columns
+        self.seed = seed
+        self.dirty_fraction = dirty_fraction
+
+def _base_type(data_type):
+    base = (data_type or "VARCHAR").upper().split("(")[0].strip()
+    return base if base in _SNOWFLAKE_TYPES else "VARCHAR"
+
+def _key_format(table_name, rows, data_type):
+    if _base_type(data_type) in ("INTEGER", "INT", "BIGINT", "NUMBER"):
+        return None
+    return (KEY_PREFIXES.get(table_name.lower(), table_name[:4].upper()), max(8, len(str(rows))))
+
+def _format_key(key_format, row):
+    return row if key_format is None else f"{key_format[0]}{row:0{key_format[1]}d}"
+
+def _table_order(semantic_model):
+    """
+    Table names (lower) with every table after the tables it references; reference cycles are broken
+    in declaration order.
+    """
+    parents = {key: {c.references[0].lower() for c in table.columns if c.references} - {key}
+               for key, table in semantic_model.tables.items()}
+    for relationship in semantic_model.relationships:
+        child, parent = relationship.from_table.lower(), relationship.to_table.lower()
+        if child in parents and parent in parents and child != parent:
+            parents[child].add(parent)
+    parents = {key: references & parents.keys() for key, references in parents.items()}
+    order, placed = [], set()
+    while len(order) < len(parents):
+        ready = [key for key in parents if key not in placed and parents[key] <= placed]
+        if not ready:
+            ready = [next(key for key in parents if key not in placed)]
+        for key in ready:
+            order.append(key)
+            placed.add(key)
+    return order
+
+def plan_tables(semantic_model, scale_factor=1, seed=0, dirty_fraction=0.01):
+    """
+    Builds a TablePlan per table of the semantic model, in load order (parents before children).
+
+    Args:
+        semantic_model (SemanticModel): Compiled semantic model (tables, keys, relationships).
+        scale_factor (float): Multiplier of the base row counts (BASE_ROWS).
+        seed (int): Seed for all generated values; the same seed and scale factor give the same data.
+        dirty_fraction (float): Fraction of rows with a data-quality defect (a NULL, a negative amount or
+                                dates out of order), so validation queries have something to find.
+
+    Returns:
+        list: TablePlan objects.
+    """
+    order = _table_order(semantic_model)
+    references = {key: {c.name.lower(): c.references for c in table.columns if c.references}
+                  for key, table in semantic_model.tables.items()}
+    for relationship in semantic_model.relationships:
+        columns = references.get(relationship.from_table.lower())
+        if columns is not None:
+            columns.setdefault(relationship.from_column.lower(), (relationship.to_table, relationship.to_column))
+
+    base_rows = {}
+    for key in order:
+        parent_rows = [base_rows[t.lower()] for t, _ in references[key].values() if t.lower() in base_rows and t.lower() != key]
+        base_rows[key] = BASE_ROWS.get(key, 2 * max(parent_rows) if parent_rows else 1000)
+    rows = {key: max(1, int(round(base * scale_factor))) for key, base in base_rows.items()}
+
+    def primary_key(key):
+        table = semantic_model.tables[key]
+        return table.get_column(table.primary_key[0]) if len(table.primary_key) == 1 else None
+
+    foreign_keys = {}
+    for key in order:
+        for column_key, (parent, parent_column) in references[key].items():
+            parent_key = parent.lower()
+            pk = primary_key(parent_key) if parent_key in semantic_model.tables else None
+            if pk is not None and pk.name.lower() == parent_column.lower():
+                foreign_keys[(key, column_key)] = _ForeignKey(parent_key, rows[parent_key], _salt(seed, key, column_key))
+    # A foreign key is derived through a sibling foreign key when the sibling's parent references the same table.
+    for (key, column_key), foreign_key in list(foreign_keys.items()):
+        for (other_key, other_column), via in foreign_keys.items():
+            if other_key != key or other_column == column_key or via.parent == key:
+                continue
+            then = next((fk for (t, _), fk in foreign_keys.items() if t == via.parent and fk.parent == foreign_key.parent
+                         and fk.via is None), None)
+            if then is not None and via.via is None:
+                foreign_keys[(key, column_key)] = _ForeignKey(foreign_key.parent, foreign_key.parent_rows, foreign_key.salt,
+                                                              via=via, then=then)
+                break
+
+    plans = []
+    for key in order:
+        table = semantic_model.tables[key]
+        pk = primary_key(key)
+        names = [c.name.lower() for c in table.columns]
+        columns = []
+        for column in table.columns:
+            column_key = column.name.lower()
+            if pk is not None and column is pk:
+                columns.append(_ColumnSpec(column.name, _base_type(column.data_type), "pk",
+                                           key_format=_key_format(table.name, rows[key], column.data_type)))
+            elif (key, column_key) in foreign_keys:
+                foreign_key = foreign_keys[(key, column_key)]
+                parent = semantic_model.tables[foreign_key.parent]
+                columns.append(_ColumnSpec(column.name, _base_type(column.data_type), "fk", foreign_key=foreign_key,
+                                           key_format=_key_format(parent.name, rows[foreign_key.parent],
+                                                                  primary_key(foreign_key.parent).data_type)))
+            else:
+                source = _AFTER.get(column_key)
+                columns.append(_ColumnSpec(column.name, _base_type(column.data_type), "value",
+                                           after=names.index(source) if source in names else None))
+        plans.append(TablePlan(table.name, rows[key], columns, seed, dirty_fraction))
+    return plans
+
+def _value_function(table_name, spec):
+    """
+    Returns f(rng, row, values) generating the column's value for a row; `values` holds the row's
+    columns generated so far.
+    """
+    name = spec.name.lower()
+    domain = VALUE_DOMAINS.get(f"{table_name.lower()}.{name}") or VALUE_DOMAINS.get(name)
+    data_type = spec.data_type
+    if domain is not None:
+        return lambda rng, row, values: rng.choice(domain)
+    if data_type in ("DATE", "TIMESTAMP", "TIMESTAMP_NTZ", "TIMESTAMP_LTZ", "TIMESTAMP_TZ"):
+        timestamp = data_type != "DATE"
+        if spec.after is not None:
+            source, whole_year = spec.after, name == "expirationdate"
+
+            def later(rng, row, values):
+                start = values[source]
+                if start is None:
+                    return None
+                if whole_year:
+                    try:
+                        return start.replace(year=start.year + 1)
+                    except ValueError: # February 29th
+                        return start + timedelta(days=365)
+                return start + (timedelta(seconds=int(rng.random() * 400 * 86400)) if timestamp else timedelta(days=int(rng.random() * 400)))
+            return later
+        if name == "dateofbirth":
+            return lambda rng, row, values: date(1940, 1, 1) + timedelta(days=int(rng.random() * 65 * 365))
+        if timestamp:
+            return lambda rng, row, values: datetime(2018, 1, 1) + timedelta(seconds=int(rng.random() * _DATE_SPAN_DAYS * 86400))
+        return lambda rng, row, values: _EPOCH + timedelta(days=int(rng.random() * _DATE_SPAN_DAYS))
+    if data_type in ("DECIMAL", "NUMERIC", "FLOAT", "DOUBLE") or (data_type == "NUMBER" and "year" not in name):
+        if "deductible" in name:
+            return lambda rng, row, values: rng.choice((250, 500, 1000, 2500))
+        low, high = next(((low, high) for hint, (low, high) in (
+            ("premium", (200, 5000)), ("limit", (10000, 1000000)), ("insuredvalue", (5000, 750000)),
+            ("reserve", (0, 50000)), ("recovered", (0, 20000)), ("amount", (50, 25000)),
+        ) if hint in name), (0, 10000))
+        return lambda rng, row, values: round(rng.uniform(low, high), 2)
+    if data_type in ("INTEGER", "INT", "BIGINT", "NUMBER"):
+        if "year" in name:
+            return lambda rng, row, values: rng.randint(1995, 2025)
+        return lambda rng, row, values: rng.randint(1, 100)
+    if data_type == "BOOLEAN":
+        return lambda rng, row, values: rng.random() < 0.5
+    if "email" in name:
+        prefix = table_name.lower()
+        return lambda rng, row, values: f"{prefix}{row}@example.com"
+    if "phone" in name:
+        return lambda rng, row, values: f"({rng.randint(200, 999)})-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}"
+    if "zip" in name:
+        return lambda rng, row, values: f"{rng.randint(10000, 99999)}"
+    if "address" in name:
+        return lambda rng, row, values: f"{rng.randint(1, 9999)} {rng.choice(_STREETS)}"
+    if name == "username":
+        return lambda rng, row, values: f"{rng.choice(VALUE_DOMAINS['firstname'])}{rng.choice(VALUE_DOMAINS['lastname'])}{row}"
+    if name == "companyname":
+        return lambda rng, row, values: f"{rng.choice(VALUE_DOMAINS['lastname'])} {rng.choice(('Group', 'Corp', 'LLC', 'Holdings'))}"
+    label = spec.name
+    return lambda rng, row, values: f"{label} {row}"
+
+def _defect(spec):
+    """
+    Returns f(values, index) producing a defective value for the column, or None if the column is never
+    made dirty: a NULL, a negative amount, or a date before the one it should follow.
+    """
+    if spec.role != "value":
+        return None
+    if spec.after is not None:
+        source = spec.after
+        return lambda values, index: values[source] - timedelta(days=30) if values[source] is not None else None
+    if spec.data_type in ("DECIMAL", "NUMERIC", "FLOAT", "DOUBLE", "NUMBER"):
+        return lambda values, index: -values[index] if isinstance(values[index], (int, float)) and values[index] else None
+    return lambda values, index: None
+
+def iter_rows(plan, start, stop):
+    """
+    Yields the rows numbered start..stop-1 (1-based row numbers) of a table as lists. Values are
+    deterministic per chunk of rows, independent of which process generates them.
+    """
+    rng = random.Random(_salt(plan.seed, plan.name, str(start)))
+    generators = []
+    for index, spec in enumerate(plan.columns):
+        if spec.role == "value":
+            generators.append((index, _value_function(plan.name, spec)))
+    ordered = [g for g in generators if plan.columns[g[0]].after is None] + [g for g in generators if plan.columns[g[0]].after is not None]
+    defects = [(index, defect) for index, defect in enumerate(map(_defect, plan.columns)) if defect is not None]
+    keys = [(index, spec) for index, spec in enumerate(plan.columns) if spec.role != "value"]
+    dirty_fraction = plan.dirty_fraction
+    width = len(plan.columns)
+    for row in range(start, stop):
+        values = [None] * width
+        for index, spec in keys:
+            if spec.role == "pk":
+                values[index] = _format_key(spec.key_format, row)
+            else:
+                values[index] = _format_key(spec.key_format, spec.foreign_key.parent_row(row))
+        for index, generate in ordered:
+            values[index] = generate(rng, row, values)
+        if defects and dirty_fraction and rng.random() < dirty_fraction:
+            index, defect = rng.choice(defects)
+            values[index] = defect(values, index)
+        yield values
+
+_ARROW_TYPES = {
+    "INTEGER": "int64", "INT": "int64", "BIGINT": "int64", "NUMBER": "float64", "DECIMAL": "float64",
+    "NUMERIC": "float64", "FLOAT": "float64", "DOUBLE": "float64", "BOOLEAN": "bool_", "DATE": "date32",
+}
+
+def _arrow_schema(pyarrow, plan):
+    fields = []
+    for spec in plan.columns:
+        if spec.role != "value" and spec.key_format is None:
+            arrow_type = pyarrow.int64()
+        elif spec.role != "value":
+            arrow_type = pyarrow.string()
+        elif spec.data_type.startswith("TIMESTAMP"):
+            arrow_type = pyarrow.timestamp("s")
+        else:
+            arrow_type = getattr(pyarrow, _ARROW_TYPES.get(spec.data_type, "string"))()
+        fields.append(pyarrow.field(spec.name, arrow_type))
+    return pyarrow.schema(fields)
+
+def _write_chunk(task):
+    """
+    Worker entry point: writes rows start..stop-1 of a table to one file and returns its row count.
+    Memory stays bounded by one Parquet row group (or one CSV row) however large the table is.
+    """
+    plan, start, stop, path, file_format = task
+    tmp_path = f"{path}.tmp"
+    if file_format == "parquet":
+        import pyarrow
+        import pyarrow.parquet
+        schema = _arrow_schema(pyarrow, plan)
+        with pyarrow.parquet.ParquetWriter(tmp_path, schema) as writer:
+            batch = []
+            for values in iter_rows(plan, start, stop):
+                batch.append(values)
+                if len(batch) == 50_000:
+                    writer.write_table(pyarrow.Table.from_pylist([dict(zip(schema.names, v)) for v in batch], schema=schema))
+                    batch = []
+            if batch:
+                writer.write_table(pyarrow.Table.from_pylist([dict(zip(schema.names, v)) for v in batch], schema=schema))
+    else:
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow([spec.name for spec in plan.columns])
+            writer.writerows(iter_rows(plan, start, stop))
+    os.replace(tmp_path, path)
+    return stop - start
+
+# A bare DECIMAL is NUMBER(38,0) in Snowflake, which would drop the cents.
+_DDL_TYPES = {"DECIMAL": "NUMBER(18,2)", "NUMERIC": "NUMBER(18,2)"}
+
+def snowflake_load_script(manifest, stage_name="synthetic_data"):
+    """
+    Returns Snowflake SQL that creates the tables, uploads the files to an internal stage and loads them
+    with COPY INTO.
+    """
+    parquet = manifest["format"] == "parquet"
+    file_format = ("TYPE = PARQUET" if parquet else
+                   "TYPE = CSV SKIP_HEADER = 1 FIELD_OPTIONALLY_ENCLOSED_BY = '\"' NULL_IF = ('') EMPTY_FIELD_AS_NULL = TRUE")
+    lines = [f"-- Synthetic P&C data, scale factor {manifest['scale_factor']}, seed {manifest['seed']}",
+             f"CREATE OR REPLACE FILE FORMAT {stage_name}_format {file_format};",
+             f"CREATE STAGE IF NOT EXISTS {stage_name} FILE_FORMAT = {stage_name}_format;", ""]
+    directory = os.path.abspath(manifest["output_dir"])
+    for table, entry in manifest["tables"].items():
+        columns = ",\n    ".join(f"{name} {_DDL_TYPES.get(data_type, data_type)}" for name, data_type in entry["columns"])
+        lines += [
+            f"CREATE OR REPLACE TABLE {table} (\n    {columns}\n);",
+            f"PUT 'file://{os.path.join(directory, table)}/*' @{stage_name}/{table}/ AUTO_COMPRESS = TRUE PARALLEL = 8;",
+            f"COPY INTO {table} FROM @{stage_name}/{table}/ FILE_FORMAT = (FORMAT_NAME = {stage_name}_format)"
+            + (" MATCH_BY_COLUMN_NAME = CASE_INSENSITIVE;" if parquet else ";"),
+            "",
+        ]
+    return "\n".join(lines)
+
+def generate_dataset(output_dir, semantic_model_path=DEFAULT_SEMANTIC_MODEL_PATH, scale_factor=1, file_format="csv",
+                     workers=None, chunk_rows=100_000, seed=0, dirty_fraction=0.01):
+    """
+    Generates referentially consistent synthetic data for every table of the semantic model. Tables are
+    split into chunks of chunk_rows rows, one file each, generated in parallel by worker processes; foreign
+    keys are computed rather than looked up, so no process holds more than one chunk in flight.
+
+    Args:
+        output_dir (str): Directory receiving <Table>/<Table>_<chunk>.<csv|parquet>, manifest.json and
+                          load_snowflake.sql.
+        semantic_model_path (str): Semantic model YAML (tables, types, keys and relationships).
+        scale_factor (float): SF1 is about 50,000 rows in total; rows grow linearly with the scale factor.
+        file_format (str): "csv" or "parquet" (requires the optional pyarrow package).
+        workers (int): Worker processes; defaults to the CPU count. 1 generates in this process.
+        chunk_rows (int): Rows per output file.
+        seed (int): Seed; the same seed, scale factor and chunk_rows always give the same files.
+        dirty_fraction (float): Fraction of rows with a deliberate data-quality defect.
+
+    Returns:
+        dict: The manifest, or None if the semantic model cannot be loaded.
+    """
+    if file_format not in ("csv", "parquet"):
+        raise ValueError(f"Unsupported file format: {file_format!r} (expected 'csv' or 'parquet').")
+    if file_format == "parquet":
+        try:
+            import pyarrow.parquet # noqa: F401
+        except ImportError as e:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow); use file_format='csv'.") from e
+    semantic_model = load_semantic_model(semantic_model_path)
+    if semantic_model is None or not semantic_model.tables:
+        print(f"Error: Could not load a semantic model with tables from {semantic_model_path}.")
+        return None
+    plans = plan_tables(semantic_model, scale_factor=scale_factor, seed=seed, dirty_fraction=dirty_fraction)
+    chunk_rows = max(1, int(chunk_rows))
+    manifest = {"scale_factor": scale_factor, "seed": seed, "format": file_format, "output_dir": output_dir,
+                "semantic_model": os.path.abspath(semantic_model_path), "tables": {}}
+    tasks = []
+    for plan in plans:
+        os.makedirs(os.path.join(output_dir, plan.name), exist_ok=True)
+        files = []
+        for number, start in enumerate(range(1, plan.rows + 1, chunk_rows)):
+            relative_path = os.path.join(plan.name, f"{plan.name}_{number:05d}.{file_format}")
+            files.append(relative_path)
+            tasks.append((plan, start, min(start + chunk_rows, plan.rows + 1), os.path.join(output_dir, relative_path), file_format))
+        table = semantic_model.get_table(plan.name)
+        manifest["tables"][plan.name] = {"rows": plan.rows, "files": files,
+                                         "columns": [[c.name, (c.data_type or "VARCHAR").upper()] for c in table.columns]}
+
+    workers = max(1, int(workers or os.cpu_count() or 1))
+    total_rows = sum(plan.rows for plan in plans)
+    print(f"Synthetic data: generating {total_rows:,} rows in {len(tasks)} {file_format.upper()} files "
+          f"(scale factor {scale_factor}, {workers} worker process{'es' if workers > 1 else ''})...")
+    start_time = time.perf_counter()
+    if workers == 1 or len(tasks) == 1:
+        written = sum(_write_chunk(task) for task in tasks)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            written = sum(executor.map(_write_chunk, tasks))
+    elapsed = time.perf_counter() - start_time
+    with open(os.path.join(output_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+    with open(os.path.join(output_dir, "load_snowflake.sql"), "w") as f:
+        f.write(snowflake_load_script(manifest))
+    print(f"Synthetic data: wrote {written:,} rows to {output_dir} in {elapsed:.2f}s ({written / max(elapsed, 1e-9):,.0f} rows/s).")
+    return manifest
+
+def load_into_sqlite(output_dir, db_path, batch_rows=10_000):
+    """
+    Loads a generated dataset into a SQLite database (with the local backend's Snowflake type mapping),
+    streaming each file in batches. Point LocalSnowflakeBackend(database_path=db_path) at the result to run
+    generated queries against it locally.
+
+    Returns:
+        int: Rows loaded.
+    """
+    with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    db = sqlite3.connect(db_path)
+    loaded = 0
+    try:
+        for table, entry in manifest["tables"].items():
+            columns = ", ".join(f"{name} {data_type}" for name, data_type in entry["columns"])
+            db.execute(f"DROP TABLE IF EXISTS {table}")
+            db.execute(translate_snowflake_sql(f"CREATE TABLE {table} ({columns})", ddl=True))
+            names = [name for name, _ in entry["columns"]]
+            insert = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+            for relative_path in entry["files"]:
+                path = os.path.join(output_dir, relative_path)
+                if manifest["format"] == "parquet":
+                    import pyarrow.parquet
+                    for batch in pyarrow.parquet.ParquetFile(path).iter_batches(batch_size=batch_rows, columns=names):
+                        rows = [tuple(str(v) if isinstance(v, (date, datetime)) else v for v in row.values())
+                                for row in batch.to_pylist()]
+                        db.executemany(insert, rows)
+                        loaded += len(rows)
+                    continue
+                with open(path, newline="", encoding="utf-8") as f:
+                    reader = csv.reader(f)
+                    header = next(reader)
+                    positions = [header.index(name) for name in names]
+                    batch = []
+                    for record in reader:
+                        batch.append(tuple(record[p] if record[p] != "" else None for p in positions))
+                        if len(batch) == batch_rows:
+                            db.executemany(insert, batch)
+                            loaded += len(batch)
+                            batch = []
+                    db.executemany(insert, batch)
+                    loaded += len(batch)
+            db.commit()
+        db.execute("ANALYZE")
+    finally:
+        db.close()
+    print(f"Synthetic data: loaded {loaded:,} rows into {db_path}.")
+    return loaded
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate scale-factor synthetic data from a semantic model.")
+    parser.add_argument("--semantic-model", default=DEFAULT_SEMANTIC_MODEL_PATH, help="Semantic model YAML.")
+    parser.add_argument("--scale-factor", "--sf", type=float, default=1, help="SF1 is about 50,000 rows; rows grow linearly.")
+    parser.add_argument("--output-dir", "-o", default="synthetic_data", help="Directory for the generated files.")
+    parser.add_argument("--format", choices=("csv", "parquet"), default="csv", help="Output file format.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count).")
+    parser.add_argument("--chunk-rows", type=int, default=100_000, help="Rows per output file.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dirty-fraction", type=float, default=0.01, help="Fraction of rows with a data-quality defect.")
+    parser.add_argument("--sqlite", default=None, help="Also load the data into this SQLite database.")
+    args = parser.parse_args(argv)
+    manifest = generate_dataset(args.output_dir, semantic_model_path=args.semantic_model, scale_factor=args.scale_factor,
+                                file_format=args.format, workers=args.workers, chunk_rows=args.chunk_rows,
+                                seed=args.seed, dirty_fraction=args.dirty_fraction)
+    if manifest is None:
+        return 1
+    if args.sqlite:
+        load_into_sqlite(args.output_dir, args.sqlite)
+    return 0
+
+# --- Example Usage ---
+# python synthetic_data.py --sf 1 -o synthetic_sf1 --sqlite synthetic_sf1.sqlite
+# python synthetic_data.py --sf 100 --format parquet --chunk-rows 1000000 -o synthetic_sf100
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+# text_similarity.py
+
+import hashlib
+import re
+
+# Words that carry no meaning for matching test use cases: articles, prepositions and the
+# interchangeable "test verbs" Agent 1 likes to open a use case with.
+STOPWORDS = frozenset("""
+a an the and or of for to in on at by with from into via as is are be been being that this these those
+it its each every all any per their there which who whom whose what when where how than then so such
+can could should would will shall must may might do does did done
+verify check ensure validate test confirm make sure correct correctly accurate accuracy properly
+""".split())
+
+# Status and state values that tell otherwise identical checks apart ("active" vs "cancelled" policies).
+STATUS_TERMS = frozenset("""
+active inactive open opened closed reopened pending approved denied rejected declined cancelled canceled
+expired lapsed renewed suspended reinstated issued void voided paid unpaid settled outstanding draft
+new current future past overdue late early valid invalid
+""".split())
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_HASH_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+def normalize_text(text):
+    """
+    Lower-cases text and collapses punctuation and whitespace, e.g. for use as an exact-match key.
+    """
+    return _NON_ALNUM.sub(" ", (text or "").lower()).strip()
+
+def _stem(token):
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith("sses"):
+        return token[:-2] # addresses -> address
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+def tokenize(text):
+    """
+    Returns the meaningful, lightly stemmed tokens of a text in order.
+    """
+    return [_stem(t) for t in normalize_text(text).split() if t not in STOPWORDS]
+
+def shingles(text, size=1):
+    """
+    Returns the set of word shingles (n-grams of `size` tokens) of a text.
+    Short use cases are best compared on single tokens (size=1).
+    """
+    tokens = tokenize(text)
+    if size <= 1 or len(tokens) < size:
+        return set(tokens)
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+def conflicting_terms(text_a, text_b, protected_terms=()):
+    """
+    Returns the tokens found in only one of two texts that make them different checks rather than
+    rewordings: numbers, status values and any of `protected_terms` (e.g. schema_pruning.schema_terms),
+    such as "effective" vs "expiration" in "missing effective/expiration date".
+
+    Returns:
+        list: The conflicting tokens, sorted; empty if the texts differ only in other words.
+    """
+    tokens_a, tokens_b = set(tokenize(text_a)), set(tokenize(text_b))
+    return sorted(t for t in tokens_a ^ tokens_b if t.isdigit() or t in STATUS_TERMS or t in protected_terms)
+
+def jaccard(set_a, set_b):
+    """
+    Jaccard similarity of two sets.
+    """
+    if not set_a and not set_b:
+        return 1.0
+    union = len(set_a | set_b)
+    return len(set_a & set_b) / union if union else 0.0
+
+def _stable_hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+class MinHasher:
+    """
+    Computes MinHash signatures of shingle sets. Signatures of two sets agree in a fraction of
+    positions that estimates the Jaccard similarity of the sets.
+    """
+
+    def __init__(self, num_perm=64, seed=1):
+        self.num_perm = num_perm
+        params = []
+        state = seed
+        for _ in range(num_perm):
+            state = _stable_hash(f"{seed}:{state}")
+            a = (state % (_HASH_PRIME - 1)) + 1
+            state = _stable_hash(f"{seed}:{state}")
+            b = state % _HASH_PRIME
+            params.append((a, b))
+        self._params = params
+
+    def signature(self, shingle_set):
+        """
+        Returns the MinHash signature (a tuple of num_perm ints) of a shingle set.
+        """
+        if not shingle_set:
+            return tuple([_MAX_HASH] * self.num_perm)
+        hashed = [_stable_hash(s) for s in shingle_set]
+        return tuple(
+            min(((a * h + b) % _HASH_PRIME) & _MAX_HASH for h in hashed)
+            for a, b in self._params
+        )
+
+    @staticmethod
+    def estimate_similarity(signature_a, signature_b):
+        matches = sum(1 for x, y in zip(signature_a, signature_b) if x == y)
+        return matches / len(signature_a) if signature_a else 0.0
+
+class LSHIndex:
+    """
+    Locality-sensitive hashing index over MinHash signatures. Signatures are split into `bands`
+    bands; two keys become candidates when any band matches exactly. With 64 permutations and
+    16 bands, pairs above roughly 0.5 Jaccard similarity are very likely to collide.
+    """
+
+    def __init__(self, num_perm=64, bands=16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = {}
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            start = band * self.rows
+            yield band, signature[start:start + self.rows]
+
+    def add(self, key, signature):
+        if key in self._signatures:
+            self.remove(key)
+        self._signatures[key] = signature
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band].setdefault(band_key, set()).add(key)
+
+    def remove(self, key):
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band, band_key in self._band_keys(signature):
+            bucket = self._buckets[band].get(band_key)
+            if bucket:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band][band_key]
+
+    def query(self, signature):
+        """
+        Returns the set of keys that share at least one band with the signature.
+        """
+        candidates = set()
+        for band, band_key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(band_key, ()))
+        return candidates
+
+    def clear(self):
+        for bucket in self._buckets:
+            bucket.clear()
+        self._signatures.clear()
+
+    def __len__(self):
+        return len(self._signatures)
@@ -0,0 +1,140 @@
+# use_case_clustering.py
+
+from schema_pruning import schema_terms
+from text_similarity import normalize_text, shingles, jaccard, conflicting_terms, MinHasher, LSHIndex
+
+SHINGLE_SIZE = 2 # Word bigrams: rewordings share phrases, different checks that share most words do not
+
+class UseCaseClusters:
+    """
+    Groups of near-duplicate use cases. Each cluster is represented by its first member (in Agent 1's
+    order); only representatives are sent to Agent 2 and their SQL is fanned back out to every member.
+    """
+
+    def __init__(self, use_cases, clusters, similarity_threshold):
+        """
+        use_cases (list): The original use cases.
+        clusters (list): Lists of indices into use_cases, each sorted, ordered by first member.
+        similarity_threshold (float): Word-bigram Jaccard similarity used to build the clusters.
+        """
+        self.use_cases = use_cases
+        self.clusters = clusters
+        self.similarity_threshold = similarity_threshold
+        self.representatives = [use_cases[members[0]] for members in clusters]
+
+    @property
+    def calls_saved(self):
+        """
+        Number of SQL generation calls avoided by generating once per cluster.
+        """
+        return len(self.use_cases) - len(self.clusters)
+
+    def fan_out(self, representative_values):
+        """
+        Maps one value per representative (e.g. its generated SQL) back to every use case.
+
+        Returns:
+            list: Values aligned with the original use cases.
+        """
+        values = [None] * len(self.use_cases)
+        for members, value in zip(self.clusters, representative_values):
+            for index in members:
+                values[index] = value
+        return values
+
+    def members_of(self, representative_index):
+        """
+        Returns the use cases of the cluster at representative_index (representative first).
+        """
+        return [self.use_cases[i] for i in self.clusters[representative_index]]
+
+    def report(self):
+        return {
+            "use_cases": len(self.use_cases),
+            "clusters": len(self.clusters),
+            "generation_calls_saved": self.calls_saved,
+            "similarity_threshold": self.similarity_threshold,
+            "duplicates": [
+                {"representative": self.use_cases[members[0]], "members": [self.use_cases[i] for i in members[1:]]}
+                for members in self.clusters if len(members) > 1
+            ],
+        }
+
+def cluster_use_cases(use_cases, similarity_threshold=0.65, semantic_model=None, num_perm=64, bands=16):
+    """
+    Clusters near-duplicate use cases, e.g. two wordings of the same customer/order consistency check.
+
+    Use cases are compared on word bigrams of their meaningful tokens (stopwords and test verbs dropped).
+    MinHash/LSH proposes candidates, which are confirmed with exact Jaccard similarity, so the cost
+    stays close to linear in the number of use cases. A use case joins the cluster of its most similar
+    candidate only if it differs from none of that cluster's members in a word naming a table, column
+    or synonym of the semantic model, a status value or a number: "every active policy has a coverage"
+    and "every cancelled policy has a coverage" are different checks. Entries that are not non-empty
+    strings are left in clusters of their own for Agent 2 to reject as before.
+
+    Args:
+        use_cases (list): Use cases from Agent 1.
+        similarity_threshold (float): Minimum word-bigram Jaccard similarity for two use cases to be merged.
+        semantic_model (SemanticModel): Optional model whose table and column words keep checks apart.
+
+    Returns:
+        UseCaseClusters: The clusters in order of their first member.
+    """
+    protected_terms = schema_terms(semantic_model)
+    cluster_of = list(range(len(use_cases))) # Use case index -> index of its cluster's first member
+    members = {}
+    hasher = MinHasher(num_perm=num_perm)
+    index = LSHIndex(num_perm=num_perm, bands=bands)
+    by_text = {}
+    token_sets = {}
+    for i, use_case in enumerate(use_cases):
+        if not isinstance(use_case, str) or not use_case.strip():
+            continue
+        normalized = normalize_text(use_case)
+        if normalized in by_text:
+            cluster_of[i] = cluster_of[by_text[normalized]]
+            members[cluster_of[i]].append(i)
+            continue
+        by_text[normalized] = i
+        members[i] = [i]
+        tokens = shingles(use_case, size=SHINGLE_SIZE)
+        if not tokens:
+            continue
+        signature = hasher.signature(tokens)
+        scored = sorted(((jaccard(tokens, token_sets[candidate]), candidate) for candidate in index.query(signature)),
+                        key=lambda pair: (-pair[0], pair[1]))
+        for similarity, candidate in scored:
+            if similarity < similarity_threshold:
+                break
+            root = cluster_of[candidate]
+            if not any(conflicting_terms(use_case, use_cases[member], protected_terms) for member in members[root]):
+                del members[i]
+                cluster_of[i] = root
+                members[root].append(i)
+                break
+        token_sets[i] = tokens
+        index.add(i, signature)
+
+    groups = {}
+    for i in range(len(use_cases)):
+        groups.setdefault(cluster_of[i], []).append(i)
+    clusters = sorted(groups.values(), key=lambda group: group[0])
+    return UseCaseClusters(use_cases, clusters, similarity_threshold)
+
+# --- Example Usage ---
+if __name__ == "__main__":
+    use_cases = [
+        "Check for data consistency between the customers table and the orders table via customer IDs.",
+        "Verify that total premium equals the sum of coverage premiums for each policy.",
+        "Ensure data consistency between customers and orders tables via customer ID.",
+        "Validate that claim payments never exceed the claim reserve.",
+        "Check that the total premium equals the sum of the coverage premiums of each policy.",
+        "Check that every active policy has at least one coverage.",
+        "Check that every cancelled policy has at least one coverage.",
+    ]
+    clusters = cluster_use_cases(use_cases)
+    print(f"{len(use_cases)} use cases -> {len(clusters.representatives)} clusters, "
+          f"{clusters.calls_saved} generation calls saved")
+    for i, representative in enumerate(clusters.representatives):
+        print(f"- {representative} ({len(clusters.members_of(i))} member(s))")
+    print(clusters.fan_out([f"SQL {i}" for i in range(len(clusters.representatives))]))